@@ -1,11 +1,108 @@
 """
 Supabaseデータベースにサンプルデータを追加するスクリプト
+- Fan list に任意の件数のサンプルファンを追加（負荷試験用の大量投入にも使う）
+- 必要に応じて追加したファンごとにFanTestData（試験曲線）も追加
+- 登録は bulk_insert.py の一括登録（一定件数ずつ複数行INSERT、チャンクごとに1トランザクション）
 """
 
-import streamlit as st
-import uuid
+import json
+import time
 from datetime import date, timedelta
 
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from bulk_insert import DEFAULT_BATCH_SIZE, insert_rows
+
+SERIES_LIST = ["Series-A", "Series-B", "Series-C", "Series-D"]
+PRODUCT_TYPES = ["Axial", "Centrifugal", "Mixed Flow"]
+INNER_OUTER = ["Inner", "Outer"]
+DIAMETERS = [100, 120, 150, 200, 250]
+BELLMOUTHS = ["26Kbell", "28Kbell"]
+FAN_COLUMNS = ("series", "product_type", "innerouter", "diameter", "year", "fan_type")
+
+
+def sample_fans(count):
+    """
+    サンプルのファン（Fan list の行）を生成
+
+    Args:
+        count: 件数
+
+    戻り値: {列名: 値} の辞書のリスト
+    """
+    return [
+        {
+            "series": SERIES_LIST[i % len(SERIES_LIST)],
+            "product_type": PRODUCT_TYPES[i % len(PRODUCT_TYPES)],
+            "innerouter": INNER_OUTER[i % len(INNER_OUTER)],
+            "diameter": DIAMETERS[i % len(DIAMETERS)],
+            "year": 2020 + (i % 5),
+            "fan_type": "axial" if i % 2 == 0 else "centrifugal",
+        }
+        for i in range(count)
+    ]
+
+
+def _json_arrays(values, decimals):
+    """2次元配列の各行をJSON配列の文字列に変換（jsonb列に渡す値）"""
+    return [json.dumps(row) for row in np.round(values, decimals).tolist()]
+
+
+def sample_tests(fans, tests_per_fan, points, seed=None):
+    """
+    サンプルの試験データ（FanTestData の行）を生成
+
+    曲線は直径に応じた二次の静圧曲線に乱数を加えたもの（全試験分を配列演算でまとめて生成）
+
+    Args:
+        fans: 追加したファン（fanID・diameter を持つ辞書のリスト）
+        tests_per_fan: ファンごとの試験数
+        points: 曲線の測定点数
+        seed: 乱数のシード
+
+    戻り値: {列名: 値} の辞書のリスト
+    """
+    rng = np.random.default_rng(seed)
+    count = len(fans) * tests_per_fan
+    fan_positions = np.repeat(np.arange(len(fans)), tests_per_fan)
+    diameters = np.array([fan["diameter"] for fan in fans], dtype=float)[fan_positions]
+
+    # 最大風量・締切静圧は直径に比例（±10%のばらつき）
+    max_flow = diameters / 10.0 * rng.uniform(0.9, 1.1, count)
+    shutoff = diameters * 1.5 * rng.uniform(0.9, 1.1, count)
+    ratio = np.linspace(0.0, 1.0, points)
+    flow = max_flow[:, None] * ratio
+    pressure = shutoff[:, None] * (1.0 - ratio**2)
+    power = shutoff[:, None] * max_flow[:, None] / 60.0 * (0.8 + 0.6 * ratio) / 0.4
+    torque = power / (2 * np.pi * 3000 / 60) * 1000
+    spl = 40.0 + diameters[:, None] / 10.0 + 10.0 * ratio + rng.normal(0.0, 0.5, (count, points))
+
+    curves = {
+        "Q_[m3min]": _json_arrays(flow, 3),
+        "Ps_[Pa]": _json_arrays(pressure, 2),
+        "Torque_[mNm]": _json_arrays(torque, 2),
+        "Power_[W]": _json_arrays(power, 2),
+        "SPL_[dbA]": _json_arrays(spl, 1),
+    }
+    temperatures = np.round(rng.uniform(18.0, 30.0, (count, 2)), 1).tolist()
+    today = date.today()
+    return [
+        {
+            "fanID": str(fans[position]["fanID"]),
+            "FanName": f"sample-{i:06d}",
+            "TestDate": today - timedelta(days=i % 365),
+            "SingleFanTest": i % 2 == 0,
+            "bellmouth": BELLMOUTHS[i % len(BELLMOUTHS)],
+            "temp_o_[degC]": temperatures[i][0],
+            "temp_c_[defC]": temperatures[i][1],
+            **{column: values[i] for column, values in curves.items()},
+        }
+        for i, position in enumerate(fan_positions.tolist())
+    ]
+
+
 # Initialize connection
 conn = st.connection("postgresql", type="sql")
 
@@ -15,59 +112,63 @@ st.title("サンプルデータ追加ツール")
 current_count = conn.query('SELECT COUNT(*) as count FROM "Fan list";', ttl=0)
 st.write(f"現在のFan listレコード数: {current_count['count'][0]}")
 
+col1, col2 = st.columns(2)
+with col1:
+    fan_count = st.number_input("追加するファンの件数", min_value=1, max_value=1000000, value=20, step=100)
+    batch_size = st.number_input(
+        "1回に登録する行数", min_value=1, max_value=50000, value=DEFAULT_BATCH_SIZE, step=500
+    )
+with col2:
+    tests_per_fan = st.number_input("ファンごとの試験データ数（0なら追加しない）", min_value=0, max_value=100, value=0)
+    points = st.number_input("曲線の測定点数", min_value=2, max_value=200, value=10)
+
 # データ追加ボタン
-if st.button("サンプルデータを20件追加"):
+if st.button("サンプルデータを追加"):
+    progress_text = st.empty()
     try:
-        # Fan listに20件のサンプルデータを追加
-        series_list = ["Series-A", "Series-B", "Series-C", "Series-D"]
-        product_types = ["Axial", "Centrifugal", "Mixed Flow"]
-        inner_outer = ["Inner", "Outer"]
-        diameters = [100, 120, 150, 200, 250]
-        
-        insert_query = """
-        INSERT INTO "Fan list" (series, product_type, innerouter, diameter, year, fan_type)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING fanID, id;
-        """
-        
         with st.spinner("データを追加中..."):
-            inserted_fans = []
-            
-            # SQLAlchemyのexecute経由で挿入
-            for i in range(20):
-                series = series_list[i % len(series_list)]
-                product_type = product_types[i % len(product_types)]
-                io = inner_outer[i % len(inner_outer)]
-                diameter = diameters[i % len(diameters)]
-                year = 2020 + (i % 5)
-                fan_type = "axial" if i % 2 == 0 else "centrifugal"
-                
-                # conn.sessionを使って直接実行
-                result = conn.session.execute(
-                    insert_query,
-                    (series, product_type, io, diameter, year, fan_type)
+            started = time.perf_counter()
+            fans = sample_fans(int(fan_count))
+            returned = insert_rows(
+                conn.session,
+                "Fan list",
+                fans,
+                returning=("fanID", "id") + FAN_COLUMNS,
+                batch_size=int(batch_size),
+                progress=lambda done, elapsed: progress_text.info(f"Fan list: {done} / {len(fans)} 件登録"),
+            )
+            # 複数行INSERTのRETURNINGは入力順とは限らないため、表示・試験データ生成には返された行を使う
+            inserted_fans = returned
+            fan_elapsed = time.perf_counter() - started
+
+            test_count = 0
+            if tests_per_fan > 0:
+                tests = sample_tests(inserted_fans, int(tests_per_fan), int(points))
+                insert_rows(
+                    conn.session,
+                    "FanTestData",
+                    tests,
+                    batch_size=int(batch_size),
+                    progress=lambda done, elapsed: progress_text.info(f"FanTestData: {done} / {len(tests)} 件登録"),
                 )
-                conn.session.commit()
-                
-                row = result.fetchone()
-                inserted_fans.append({
-                    'fanID': row[0],
-                    'id': row[1],
-                    'series': series,
-                    'product_type': product_type
-                })
-                
-            st.success(f"{len(inserted_fans)}件のデータを追加しました！")
-            
-            # 追加されたデータを表示
-            st.subheader("追加されたデータ")
-            import pandas as pd
-            st.dataframe(pd.DataFrame(inserted_fans))
-            
-            # 更新後のレコード数を表示
-            new_count = conn.query('SELECT COUNT(*) as count FROM "Fan list";', ttl=0)
-            st.write(f"更新後のレコード数: {new_count['count'][0]}")
-            
+                test_count = len(tests)
+            elapsed = time.perf_counter() - started
+
+        progress_text.empty()
+        st.success(
+            f"{len(inserted_fans)}件のファン"
+            + (f"と{test_count}件の試験データ" if test_count else "")
+            + f"を追加しました！（{elapsed:.1f} 秒, Fan list {len(inserted_fans) / max(fan_elapsed, 1e-9):.0f} rows/s）"
+        )
+
+        # 追加されたデータを表示（大量の場合は先頭のみ）
+        st.subheader("追加されたデータ")
+        st.dataframe(pd.DataFrame(inserted_fans[:1000]))
+
+        # 更新後のレコード数を表示
+        new_count = conn.query('SELECT COUNT(*) as count FROM "Fan list";', ttl=0)
+        st.write(f"更新後のレコード数: {new_count['count'][0]}")
+
     except Exception as e:
         st.error(f"エラーが発生しました: {str(e)}")
         conn.session.rollback()
@@ -1,7 +1,14 @@
 import streamlit as st
 import os
-from pathlib import Path
-import streamlit.components.v1 as components
+
+from model_catalog import get_model_catalog, load_model_catalog
+from viewer_components import (
+    get_reset_token,
+    load_glb_model,
+    render_catalog_model_picker,
+    render_threejs_viewer,
+    request_camera_reset,
+)
 
 
 # ページ設定
@@ -13,26 +20,14 @@ st.set_page_config(
 st.title("3D Model Viewer with Three.js")
 st.markdown("**Streamlit + Three.js を使用した .glb ファイルビューア**")
 
-# .glb ファイルを検索
-def find_glb_files(base_path="./models"):
-    """指定されたディレクトリから.glbファイルを検索"""
-    glb_files = []
-    if os.path.exists(base_path):
-        for root, dirs, files in os.walk(base_path):
-            for file in files:
-                if file.endswith('.glb'):
-                    file_path = os.path.join(root, file)
-                    glb_files.append(file_path)
-    return glb_files
-
 # サイドバーでファイル選択
 st.sidebar.header("モデル選択")
 
-# .glbファイルのリストを取得
+# .glbファイルの件数をモデルカタログから取得（毎回の走査はせず、一覧はページ単位で取得）
 models_dir = "./models"
-glb_files = find_glb_files(models_dir)
+model_count = load_model_catalog(models_dir).count_models() if os.path.exists(models_dir) else 0
 
-if not glb_files:
+if model_count == 0:
     st.sidebar.warning(f"'{models_dir}' ディレクトリに .glb ファイルが見つかりません")
     st.info("""
     ### 使い方
@@ -45,24 +40,23 @@ if not glb_files:
     st.sidebar.info("サンプル: ./models/sample.glb")
     selected_file = None
 else:
-    # ファイル名のみ表示用リストを作成
-    file_names = [os.path.basename(f) for f in glb_files]
-    
-    # ファイル選択
-    selected_index = st.sidebar.selectbox(
-        "モデルを選択",
-        range(len(file_names)),
-        format_func=lambda i: file_names[i]
+    # ファイル選択（ファイル名のみ表示。検索・ページ単位でカタログから取得）
+    selected_path = render_catalog_model_picker(
+        models_dir,
+        key="model_picker",
+        label="モデルを選択",
+        container=st.sidebar,
+        format_func=os.path.basename,
     )
+    selected_file = str(selected_path) if selected_path else None
     
-    selected_file = glb_files[selected_index]
-    
-    # 選択されたファイルのパス表示
-    st.sidebar.success(f"選択中: {selected_file}")
-    
-    # ファイル情報表示
-    file_size = os.path.getsize(selected_file)
-    st.sidebar.metric("ファイルサイズ", f"{file_size / 1024:.2f} KB")
+    if selected_file:
+        # 選択されたファイルのパス表示
+        st.sidebar.success(f"選択中: {selected_file}")
+        
+        # ファイル情報表示
+        file_size = os.path.getsize(selected_file)
+        st.sidebar.metric("ファイルサイズ", f"{file_size / 1024:.2f} KB")
 
 # ビューア設定
 st.sidebar.header("ビューア設定")
@@ -76,38 +70,35 @@ auto_rotate = st.sidebar.checkbox("自動回転", False)
 col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("🔄 リセットビュー"):
-        st.rerun()
+        request_camera_reset("app01")
 with col2:
     if st.button("📷 スクリーンショット", help="右クリックで画像を保存できます"):
         st.info("ビューア上で右クリック → 画像を保存")
 with col3:
     if st.button("🔍 リロード"):
+        get_model_catalog(models_dir).refresh()
         st.rerun()
 
 # Three.jsビューアの埋め込み
 if selected_file:
-    # ファイルパスをBase64エンコードして埋め込むか、直接パスを使用
-    # ここではシンプルにファイルを読み込んでBase64エンコード
-    import base64
-    
-    with open(selected_file, 'rb') as f:
-        glb_data = f.read()
-        glb_base64 = base64.b64encode(glb_data).decode()
-
-    # Three.js + GLTFLoader を使用した3Dビューア
-    template = Path("three_html/viewer01.html").read_text(encoding="utf-8")
-    threejs_html = template.format(
-        bg_color=bg_color,
-        width=width,
-        height=height,
-        auto_rotate=str(auto_rotate).lower(),
-        show_grid=str(show_grid).lower(),
-        glb_base64=glb_base64,
-    )
+    # モデル本体はHTMLに埋め込まず、配信サーバーのURLを渡す
+    model_source, _ = load_glb_model(selected_file)
     
-    # Streamlitにビューアを埋め込み
+    # Streamlitにビューアを埋め込み（設定変更は差分のみ送信され、モデルは再読み込みしない）
     st.subheader("3D ビューア")
-    components.html(threejs_html, height=height + 20, scrolling=False)
+    if model_source:
+        render_threejs_viewer(
+            model_source,
+            {
+                'width': width,
+                'height': height,
+                'bg_color': bg_color,
+                'show_grid': show_grid,
+                'auto_rotate': auto_rotate,
+                'reset_token': get_reset_token("app01"),
+            },
+            key="app01_viewer",
+        )
     
     st.markdown("""
     ### 操作方法
@@ -7,6 +7,8 @@ DBからカラム1（上位包含）、カラム2（下位包含）のリスト
 
 import streamlit as st
 
+from fan_test_data import load_curve_store, test_metadata_query
+
 st.title("データベース検索")
 
 # Initialize connection.
@@ -140,9 +142,10 @@ if st.sidebar.checkbox("全データを表示"):
     st.dataframe(df, use_container_width=True)
 
 
-# 試験データリスト表示
+# 試験データリスト表示（一覧には曲線以外の列のみ取得）
 st.subheader("ファン試験データ")
-df = conn.query('SELECT * FROM "FanTestData";', ttl="10m")
+metadata_sql, metadata_params = test_metadata_query()
+df = conn.query(metadata_sql, params=metadata_params, ttl="10m")
 st.dataframe(df, use_container_width=True)
 
 # 結果プロット
@@ -151,7 +154,9 @@ st.subheader("データプロット")
 # FanTestDataからプロット用のデータを準備
 if len(df) > 0:
     import plotly.graph_objects as go
-    import json
+    
+    # 全試験の曲線はデータの版ごとに1回だけ解析され、全セッションで共有される
+    curve_store = load_curve_store(conn)
     
     # プロット対象の試験データを選択
     test_options = [f"ID: {row['id']} - {row.get('FanName', 'N/A')} ({row.get('TestDate', 'N/A')})" 
@@ -167,36 +172,25 @@ if len(df) > 0:
     if selected_tests:
         fig = go.Figure()
         
-        for idx in selected_tests:
-            row = df.iloc[idx]
+        selected_rows = df.iloc[selected_tests]
+        for test_id, test_no, fan_name in zip(
+            selected_rows['fantestdataID'], selected_rows['id'], selected_rows['FanName']
+        ):
+            # 解析済みの配列をスライスするだけ（JSONの再解析はしない）
+            q_values = curve_store.curve('Q_[m3min]', test_id)
+            ps_values = curve_store.curve('Ps_[Pa]', test_id)
+            if len(q_values) == 0 or len(ps_values) == 0:
+                st.warning(f"データID {test_no} の曲線データがありません")
+                continue
             
-            # JSONB配列をPythonリストに変換
-            try:
-                # PostgreSQLから返されるJSONBは文字列またはリストの可能性がある
-                q_data = row['Q_[m3min]']
-                ps_data = row['Ps_[Pa]']
-                
-                # 文字列の場合はJSON解析
-                if isinstance(q_data, str):
-                    q_values = json.loads(q_data)
-                else:
-                    q_values = q_data
-                
-                if isinstance(ps_data, str):
-                    ps_values = json.loads(ps_data)
-                else:
-                    ps_values = ps_data
-                
-                # プロット追加
-                fig.add_trace(go.Scatter(
-                    x=q_values,
-                    y=ps_values,
-                    mode='lines+markers',
-                    name=row.get('FanName', f"Test-{row['id']}"),
-                    hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
-                ))
-            except Exception as e:
-                st.warning(f"データID {row['id']} の解析エラー: {str(e)}")
+            # プロット追加
+            fig.add_trace(go.Scatter(
+                x=q_values,
+                y=ps_values,
+                mode='lines+markers',
+                name=fan_name or f"Test-{test_no}",
+                hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
+            ))
         
         # グラフレイアウト設定
         fig.update_layout(
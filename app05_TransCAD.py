@@ -1,157 +1,49 @@
 import streamlit as st
-import streamlit.components.v1 as components
-import trimesh
 import os
-import json
+import uuid
 from pathlib import Path
 from datetime import datetime
 
+from blob_store import converted_glb_path, find_converted, store_upload
+from conversion_jobs import STATUS_DONE, STATUS_ERROR, STATUS_RUNNING, get_conversion_queue
+from file_database import count_entries, get_entry, init_database, list_entries, save_to_database
+from glb_writer import ENCODING_DRACO, ENCODING_PLAIN, ENCODING_QUANTIZED
+from viewer_components import (
+    get_model_thumbnail,
+    load_glb_model,
+    render_threejs_viewer,
+    render_thumbnail_grid,
+)
+
 # ディレクトリ設定
 UPLOAD_DIR = Path("uploaded_files")
 GLB_DIR = Path("glb_files")
-DB_FILE = Path("file_database.json")
 
 # ディレクトリ作成
 UPLOAD_DIR.mkdir(exist_ok=True)
 GLB_DIR.mkdir(exist_ok=True)
 
-# 簡易データベース（JSON）初期化
-if not DB_FILE.exists():
-    with open(DB_FILE, 'w') as f:
-        json.dump([], f)
+# GLB出力形式の選択肢
+ENCODING_LABELS = {
+    ENCODING_QUANTIZED: "標準（頂点結合・量子化）",
+    ENCODING_DRACO: "Draco圧縮（最小サイズ・大きなモデル向け）",
+    ENCODING_PLAIN: "最適化なし",
+}
 
-def load_database():
-    """データベース読み込み"""
-    with open(DB_FILE, 'r') as f:
-        return json.load(f)
+# ファイル一覧の1ページあたりの件数候補
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
 
-def save_to_database(entry):
-    """データベースに保存"""
-    db = load_database()
-    db.append(entry)
-    with open(DB_FILE, 'w') as f:
-        json.dump(db, f, indent=2)
+# 一覧プレビュー用のビューア設定
+PREVIEW_SETTINGS = {
+    'width': 700,
+    'height': 400,
+    'bg_color': "#1a1a2e",
+    'show_grid': True,
+    'auto_rotate': False,
+}
 
-def convert_stl_to_glb(stl_path, glb_path):
-    """STLをGLBに変換"""
-    try:
-        mesh = trimesh.load(stl_path)
-        mesh.export(glb_path)
-        return True, "変換成功"
-    except Exception as e:
-        return False, f"変換エラー: {str(e)}"
-
-def create_threejs_viewer(glb_path):
-    """Three.jsビューアーHTML生成"""
-    # 相対パスに変換
-    glb_relative = glb_path.replace("\\", "/")
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ margin: 0; overflow: hidden; }}
-            canvas {{ display: block; }}
-            #loading {{ 
-                position: absolute; 
-                top: 50%; 
-                left: 50%; 
-                transform: translate(-50%, -50%);
-                color: white;
-                font-size: 20px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div id="loading">モデル読み込み中...</div>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js"></script>
-        <script>
-            const scene = new THREE.Scene();
-            scene.background = new THREE.Color(0x1a1a2e);
-            
-            const camera = new THREE.PerspectiveCamera(75, window.innerWidth / window.innerHeight, 0.1, 1000);
-            camera.position.set(5, 5, 5);
-            
-            const renderer = new THREE.WebGLRenderer({{ antialias: true }});
-            renderer.setSize(window.innerWidth, window.innerHeight);
-            document.body.appendChild(renderer.domElement);
-            
-            // ライト設定
-            const ambientLight = new THREE.AmbientLight(0xffffff, 0.6);
-            scene.add(ambientLight);
-            
-            const directionalLight = new THREE.DirectionalLight(0xffffff, 0.8);
-            directionalLight.position.set(10, 10, 10);
-            scene.add(directionalLight);
-            
-            // GLBローダー
-            const loader = new THREE.GLTFLoader();
-            loader.load(
-                '{glb_relative}',
-                function(gltf) {{
-                    const model = gltf.scene;
-                    
-                    // モデルをセンタリング
-                    const box = new THREE.Box3().setFromObject(model);
-                    const center = box.getCenter(new THREE.Vector3());
-                    model.position.sub(center);
-                    
-                    // スケール調整
-                    const size = box.getSize(new THREE.Vector3());
-                    const maxDim = Math.max(size.x, size.y, size.z);
-                    const scale = 4 / maxDim;
-                    model.scale.multiplyScalar(scale);
-                    
-                    scene.add(model);
-                    document.getElementById('loading').style.display = 'none';
-                }},
-                function(xhr) {{
-                    console.log((xhr.loaded / xhr.total * 100) + '% loaded');
-                }},
-                function(error) {{
-                    console.error('読み込みエラー:', error);
-                    document.getElementById('loading').innerText = '読み込み失敗';
-                }}
-            );
-            
-            // マウス操作（簡易版）
-            let isDragging = false;
-            let previousMousePosition = {{ x: 0, y: 0 }};
-            
-            renderer.domElement.addEventListener('mousedown', () => {{ isDragging = true; }});
-            renderer.domElement.addEventListener('mouseup', () => {{ isDragging = false; }});
-            renderer.domElement.addEventListener('mousemove', (e) => {{
-                if (isDragging) {{
-                    const deltaX = e.offsetX - previousMousePosition.x;
-                    const deltaY = e.offsetY - previousMousePosition.y;
-                    
-                    camera.position.x += deltaX * 0.01;
-                    camera.position.y -= deltaY * 0.01;
-                    camera.lookAt(scene.position);
-                }}
-                previousMousePosition = {{ x: e.offsetX, y: e.offsetY }};
-            }});
-            
-            // リサイズ対応
-            window.addEventListener('resize', () => {{
-                camera.aspect = window.innerWidth / window.innerHeight;
-                camera.updateProjectionMatrix();
-                renderer.setSize(window.innerWidth, window.innerHeight);
-            }});
-            
-            // アニメーション
-            function animate() {{
-                requestAnimationFrame(animate);
-                renderer.render(scene, camera);
-            }}
-            animate();
-        </script>
-        <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/loaders/GLTFLoader.js"></script>
-    </body>
-    </html>
-    """
-    return html
+# ファイル管理データベース初期化
+init_database()
 
 # ========== Streamlit UI ==========
 st.set_page_config(page_title="CAD変換・管理システム", layout="wide")
@@ -162,111 +54,204 @@ tab1, tab2 = st.tabs(["📤 ファイルアップロード", "📚 ファイル
 with tab1:
     st.header("STL/STEPファイルをアップロード")
     
-    uploaded_file = st.file_uploader(
+    encoding = st.selectbox(
+        "GLB出力形式",
+        list(ENCODING_LABELS),
+        format_func=ENCODING_LABELS.get,
+        help="これからアップロードするファイルに適用されます",
+    )
+    
+    uploaded_files = st.file_uploader(
         "ファイルを選択 (.stl, .step, .stp)",
-        type=['stl', 'step', 'stp']
+        type=['stl', 'step', 'stp'],
+        accept_multiple_files=True
     )
     
-    if uploaded_file:
+    queue = get_conversion_queue()
+    # 再実行のたびに同じファイルを再投入しないよう、投入済みのアップロードを記録
+    submitted_uploads = st.session_state.setdefault("submitted_uploads", set())
+    
+    for uploaded_file in uploaded_files or []:
+        upload_key = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None))
+        if upload_key in submitted_uploads:
+            continue
+        
         file_ext = uploaded_file.name.split('.')[-1].lower()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_name = uploaded_file.name.rsplit('.', 1)[0]
         
-        # ファイル保存
-        original_path = UPLOAD_DIR / f"{timestamp}_{uploaded_file.name}"
-        with open(original_path, 'wb') as f:
-            f.write(uploaded_file.getbuffer())
+        if file_ext != 'stl':  # step/stp
+            st.warning(f"⚠️ {uploaded_file.name}: STEP変換は次のステップで実装します（現在はSTLのみ対応）")
+            submitted_uploads.add(upload_key)
+            continue
         
-        st.success(f"✅ アップロード完了: {uploaded_file.name}")
+        # ファイル保存（内容のSHA-256で保存し、同じ内容のファイルは1つだけ持つ）
+        sha256, original_path, _ = store_upload(uploaded_file, UPLOAD_DIR, f".{file_ext}")
+        submitted_uploads.add(upload_key)
         
-        # 変換処理
-        with st.spinner("GLBに変換中..."):
-            glb_filename = f"{timestamp}_{base_name}.glb"
-            glb_path = GLB_DIR / glb_filename
-            
-            if file_ext == 'stl':
-                success, message = convert_stl_to_glb(str(original_path), str(glb_path))
-            else:  # step/stp
-                st.warning("⚠️ STEP変換は次のステップで実装します（現在はSTLのみ対応）")
-                success = False
-                message = "STEP変換未実装"
-            
-            if success:
-                st.success(f"✅ {message}")
-                
-                # データベースに登録
-                entry = {
-                    "id": timestamp,
-                    "original_name": uploaded_file.name,
-                    "original_path": str(original_path),
-                    "glb_path": str(glb_path),
-                    "file_type": file_ext,
-                    "upload_date": datetime.now().isoformat()
-                }
-                save_to_database(entry)
-                
-                # プレビュー表示
-                st.subheader("🎨 3Dプレビュー")
-                viewer_html = create_threejs_viewer(str(glb_path))
-                components.html(viewer_html, height=600)
-                
-                # ダウンロードボタン
-                col1, col2 = st.columns(2)
-                with col1:
-                    with open(original_path, 'rb') as f:
-                        st.download_button(
-                            label=f"📥 元ファイルをダウンロード ({file_ext.upper()})",
-                            data=f,
-                            file_name=uploaded_file.name,
-                            mime="application/octet-stream"
-                        )
-                with col2:
-                    with open(glb_path, 'rb') as f:
-                        st.download_button(
-                            label="📥 GLBをダウンロード",
-                            data=f,
-                            file_name=glb_filename,
-                            mime="model/gltf-binary"
-                        )
-            else:
-                st.error(f"❌ {message}")
+        # 同じ内容・同じ形式で変換済みなら、変換せずにこのアップロードの情報だけ登録
+        converted = find_converted(sha256, encoding)
+        if converted:
+            save_to_database({
+                "id": uuid.uuid4().hex,
+                "original_name": uploaded_file.name,
+                "original_path": str(original_path),
+                "glb_path": converted['glb_path'],
+                "file_type": file_ext,
+                "encoding": encoding,
+                "upload_date": datetime.now().isoformat(),
+                "source_sha256": sha256,
+            })
+            st.success(f"✅ アップロード完了（変換済みのGLBを再利用）: {uploaded_file.name}")
+            continue
+        
+        # 変換はバックグラウンドのワーカープロセスで実行（この画面はブロックしない）
+        glb_path = converted_glb_path(GLB_DIR, sha256, encoding)
+        queue.submit(uploaded_file.name, original_path, glb_path, file_type=file_ext, encoding=encoding,
+                     source_sha256=sha256)
+        st.success(f"✅ アップロード完了・変換ジョブ登録: {uploaded_file.name}")
+    
+    st.subheader("⚙️ 変換ジョブ")
+    
+    def render_job_status():
+        """変換ジョブの状態一覧を表示"""
+        jobs = queue.list_jobs(limit=20)
+        if not jobs:
+            st.info("変換ジョブはありません")
+            return
+        
+        status_labels = {
+            STATUS_DONE: "✅ 完了",
+            STATUS_ERROR: "❌ エラー",
+            STATUS_RUNNING: "🔄 変換中",
+        }
+        for job in jobs:
+            col1, col2 = st.columns([2, 3])
+            with col1:
+                st.write(f"**{job['original_name']}**")
+                st.caption(status_labels.get(job['status'], "⏳ 待機中"))
+            with col2:
+                st.progress(float(job['progress']), text=job['message'] or "")
+        
+        active = queue.active_count()
+        if active:
+            st.caption(f"実行待ち・変換中のジョブ: {active} 件（完了したファイルは「ファイル一覧」に登録されます）")
+    
+    # 対応バージョンでは一定間隔でジョブ状態のみを再描画（ポーリング）
+    fragment = getattr(st, "fragment", None)
+    if fragment is not None:
+        fragment(run_every=2)(render_job_status)()
+    else:
+        if st.button("🔄 状態を更新"):
+            st.rerun()
+        render_job_status()
+
+def reset_file_list_page():
+    """検索条件・表示件数の変更時に先頭ページへ戻す"""
+    st.session_state["file_list_page"] = 1
 
 with tab2:
     st.header("📚 登録済みファイル一覧")
     
-    db = load_database()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search = st.text_input("🔍 ファイル名で検索", key="file_list_search", on_change=reset_file_list_page).strip()
+    with col2:
+        page_size = st.selectbox("表示件数", PAGE_SIZE_OPTIONS, key="file_list_page_size",
+                                 on_change=reset_file_list_page)
     
-    if not db:
-        st.info("まだファイルが登録されていません")
+    # 件数・ページ内のエントリのみをDBから取得（全件は読み込まない）
+    total = count_entries(search)
+    
+    if total == 0:
+        if search:
+            st.info(f"「{search}」に一致するファイルはありません")
+        else:
+            st.info("まだファイルが登録されていません")
     else:
-        for entry in reversed(db):  # 新しい順
-            with st.expander(f"📄 {entry['original_name']} ({entry['upload_date'][:10]})"):
-                st.write(f"**ファイル形式**: {entry['file_type'].upper()}")
-                st.write(f"**アップロード日時**: {entry['upload_date']}")
+        page_count = (total + page_size - 1) // page_size
+        # 削除などで件数が減った場合も範囲内に収める
+        if st.session_state.get("file_list_page", 1) > page_count:
+            st.session_state["file_list_page"] = page_count
+        page = st.number_input(
+            f"ページ（全 {page_count} ページ / {total} 件）",
+            min_value=1,
+            max_value=page_count,
+            key="file_list_page",
+        )
+        entries = list_entries(search, limit=page_size, offset=(page - 1) * page_size)
+        
+        view_mode = st.radio("表示形式", ["🖼️ サムネイル", "📋 表"], horizontal=True, key="file_list_view")
+        if view_mode == "📋 表":
+            st.dataframe(
+                [
+                    {
+                        "ファイル名": entry['original_name'],
+                        "形式": entry['file_type'].upper(),
+                        "アップロード日時": entry['upload_date'],
+                        "GLB": "✅" if os.path.exists(entry['glb_path']) else "❌",
+                    }
+                    for entry in entries
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+        else:
+            # サムネイルは変換時に生成済み（旧エントリは初回表示時に生成してキャッシュ）
+            def select_entry(entry_id):
+                st.session_state["file_list_selected"] = entry_id
+            
+            render_thumbnail_grid(
+                [
+                    {
+                        'thumbnail': get_model_thumbnail(entry['glb_path']),
+                        'caption': f"{entry['original_name']} ({entry['upload_date'][:10]})",
+                        'value': entry['id'],
+                    }
+                    for entry in entries
+                ],
+                on_select=select_entry,
+                key_prefix="file_list",
+                button_label="🔍 プレビュー",
+            )
+        
+        # プレビュー・ダウンロードは選択された1件のみ作成する
+        labels = {entry['id']: f"{entry['original_name']} ({entry['upload_date'][:10]})" for entry in entries}
+        selected_id = st.selectbox(
+            "プレビューするファイル",
+            [None, *labels],
+            format_func=lambda entry_id: "選択してください" if entry_id is None else labels[entry_id],
+            key="file_list_selected",
+        )
+        
+        entry = get_entry(selected_id) if selected_id else None
+        if entry:
+            st.write(f"**ファイル形式**: {entry['file_type'].upper()}")
+            st.write(f"**アップロード日時**: {entry['upload_date']}")
+            if entry.get('encoding'):
+                st.write(f"**GLB出力形式**: {ENCODING_LABELS.get(entry['encoding'], entry['encoding'])}")
+            
+            if os.path.exists(entry['glb_path']):
+                model_source, _ = load_glb_model(entry['glb_path'])
+                if model_source:
+                    render_threejs_viewer(model_source, PREVIEW_SETTINGS, key="app05_preview")
                 
-                # プレビュー
-                if os.path.exists(entry['glb_path']):
-                    viewer_html = create_threejs_viewer(entry['glb_path'])
-                    components.html(viewer_html, height=400)
-                    
-                    # ダウンロード
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if os.path.exists(entry['original_path']):
-                            with open(entry['original_path'], 'rb') as f:
-                                st.download_button(
-                                    label=f"📥 {entry['file_type'].upper()}",
-                                    data=f,
-                                    file_name=entry['original_name'],
-                                    key=f"dl_orig_{entry['id']}"
-                                )
-                    with col2:
-                        with open(entry['glb_path'], 'rb') as f:
+                # ダウンロード
+                col1, col2 = st.columns(2)
+                with col1:
+                    if os.path.exists(entry['original_path']):
+                        with open(entry['original_path'], 'rb') as f:
                             st.download_button(
-                                label="📥 GLB",
+                                label=f"📥 {entry['file_type'].upper()}",
                                 data=f,
-                                file_name=os.path.basename(entry['glb_path']),
-                                key=f"dl_glb_{entry['id']}"
+                                file_name=entry['original_name'],
+                                key=f"dl_orig_{entry['id']}"
                             )
-                else:
-                    st.warning("GLBファイルが見つかりません")
\ No newline at end of file
+                with col2:
+                    with open(entry['glb_path'], 'rb') as f:
+                        st.download_button(
+                            label="📥 GLB",
+                            data=f,
+                            file_name=f"{Path(entry['original_name']).stem}.glb",
+                            key=f"dl_glb_{entry['id']}"
+                        )
+            else:
+                st.warning("GLBファイルが見つかりません")
@@ -8,10 +8,57 @@
 
 import streamlit as st
 from pathlib import Path
-import streamlit.components.v1 as components
+import warnings
 import pandas as pd
 import numpy as np
 
+from fan_queries import (
+    CATEGORY_COLUMNS,
+    METRIC_RANGE_COLUMNS,
+    RANGE_COLUMNS,
+    SORTABLE_COLUMNS,
+    fan_count_query,
+    fan_diameter_query,
+    fan_group_count_query,
+    fan_options_query,
+    fan_page_query,
+    fan_range_query,
+    metric_range_query,
+    related_test_query,
+)
+from curve_resampling import METHOD_LINEAR, METHOD_PCHIP, flow_grid, resample, resample_cached
+from curve_similarity import DEFAULT_METRICS, SIMILARITY_METRICS, get_similarity_index_cache
+from curve_store import CurveStore
+from fan_laws import STANDARD_TEMPERATURE, align_conditions, normalize_cached
+from fan_test_data import (
+    CURVE_COLUMNS,
+    METADATA_COLUMNS,
+    fetch_curves,
+    get_curve_cache,
+    load_curve_store,
+    select_list,
+    test_metadata_query,
+)
+from fan_test_metrics import refresh_metrics
+from operating_point import (
+    FLOW_METRIC,
+    PRESSURE_METRIC,
+    operating_point_frame,
+    parse_coefficients,
+    solve_operating_points_cached,
+)
+from model_catalog import get_model_catalog, load_model_catalog
+from model_resolution import MODEL_IDENTIFIER_COLUMNS, attach_model_paths
+from viewer_components import (
+    get_reset_token,
+    load_glb_model,
+    render_cache_stats,
+    render_model_selector,
+    render_threejs_viewer,
+    render_viewer_guide,
+    request_camera_reset,
+)
+
 st.set_page_config(
     page_title="ファンモデル検索ダッシュボード",
     page_icon="🔍",
@@ -99,123 +146,157 @@ except Exception as e:
 # =======================
 # データ取得とキャッシュ
 # =======================
+# 1ページあたりの件数候補
+FAN_PAGE_SIZE_OPTIONS = [25, 50, 100, 200]
+
 if DB_CONNECTED:
-    @st.cache_data(ttl=600)  # 10分キャッシュ
-    def load_fan_data():
+    # 絞り込み・並べ替え・ページングはSQLで行い、画面には1ページ分だけ取得する
+    # （SQL文・パラメータごとに10分キャッシュ。性能指標の更新時はこのキャッシュだけを破棄する）
+    @st.cache_data(ttl=600, show_spinner=False)
+    def query_fan_data(sql, params):
+        return conn.query(sql, params=params, ttl=0)
+
+    def run_fan_query(query, label="Fan list"):
+        sql, params = query
         try:
-            return conn.query('SELECT * FROM "Fan list";', ttl="10m")
+            return query_fan_data(sql, params)
         except Exception as e:
-            st.error(f"Fan listテーブルの読み込みエラー: {str(e)}")
+            st.error(f"{label}テーブルの読み込みエラー: {str(e)}")
             return pd.DataFrame()
 
+    # 試験データは一覧用のメタデータのみ取得し、曲線はプロットする試験の分だけ後から取得する
     @st.cache_data(ttl=600)
     def load_test_data():
-        try:
-            return conn.query('SELECT * FROM "FanTestData";', ttl="10m")
-        except Exception as e:
-            st.error(f"FanTestDataテーブルの読み込みエラー: {str(e)}")
-            return pd.DataFrame()
+        return run_fan_query(test_metadata_query(), label="FanTestData")
 
-    fan_df = load_fan_data()
+    fan_total_df = run_fan_query(fan_count_query({}))
+    fan_total = int(fan_total_df['count'].iloc[0]) if len(fan_total_df) > 0 else 0
     test_df = load_test_data()
 else:
     # DBなしモードではダミーデータ
-    fan_df = pd.DataFrame()
+    fan_total = 0
     test_df = pd.DataFrame()
     st.warning("データベース未接続のため、検索機能は利用できません。3Dビューア（直接モデル選択）のみ利用可能です。")
 
+def reset_fan_page():
+    """フィルター・並べ替え・表示件数の変更時に先頭ページへ戻す"""
+    st.session_state["fan_page"] = 1
+
 # =======================
 # 高度な検索フィルター UI
 # =======================
-if DB_CONNECTED and len(fan_df) > 0:
+# フィルター状態（SQLのWHERE句に変換される）
+fan_filters = {}
+
+if DB_CONNECTED and fan_total > 0:
     st.sidebar.header("🔍 検索フィルター")
-    
-    # フィルター状態の初期化
-    filtered_fans = fan_df.copy()
 
     # 1. テキスト検索
     with st.sidebar.expander("📝 テキスト検索", expanded=True):
-        search_text = st.text_input(
+        fan_filters['text'] = st.text_input(
             "キーワード検索",
             placeholder="シリーズ名、製品タイプなどを入力...",
-            help="すべての文字列カラムから検索します"
+            help="シリーズ・製品タイプ・内部/外部・ファン種別・fanIDから検索します",
+            on_change=reset_fan_page,
         )
-        if search_text:
-            text_columns = fan_df.select_dtypes(include=['object']).columns
-            mask = pd.Series([False] * len(fan_df))
-            for col in text_columns:
-                mask |= fan_df[col].astype(str).str.contains(search_text, case=False, na=False)
-            filtered_fans = filtered_fans[mask]
 
     # 2. カテゴリフィルター
+    category_labels = {
+        'series': "シリーズ",
+        'product_type': "製品タイプ",
+        'innerouter': "内部/外部",
+    }
     with st.sidebar.expander("📂 カテゴリフィルター", expanded=True):
-        # メーカー・シリーズフィルター
-        if 'series' in fan_df.columns:
-            series_options = ['すべて'] + sorted(fan_df['series'].dropna().unique().tolist())
-            selected_series = st.selectbox("シリーズ", series_options)
-            if selected_series != 'すべて':
-                filtered_fans = filtered_fans[filtered_fans['series'] == selected_series]
-        
-        # 製品タイプフィルター
-        if 'product_type' in fan_df.columns:
-            product_options = ['すべて'] + sorted(fan_df['product_type'].dropna().unique().tolist())
-            selected_product = st.selectbox("製品タイプ", product_options)
-            if selected_product != 'すべて':
-                filtered_fans = filtered_fans[filtered_fans['product_type'] == selected_product]
-        
-        # 内部・外部フィルター
-        if 'innerouter' in fan_df.columns:
-            innerouter_options = ['すべて'] + sorted(fan_df['innerouter'].dropna().unique().tolist())
-            selected_innerouter = st.selectbox("内部/外部", innerouter_options)
-            if selected_innerouter != 'すべて':
-                filtered_fans = filtered_fans[filtered_fans['innerouter'] == selected_innerouter]
+        for column in CATEGORY_COLUMNS:
+            options = run_fan_query(fan_options_query(column))
+            if column not in options.columns:
+                continue
+            selected = st.selectbox(
+                category_labels[column],
+                ['すべて'] + options[column].tolist(),
+                on_change=reset_fan_page,
+            )
+            if selected != 'すべて':
+                fan_filters[column] = selected
 
     # 3. 数値範囲フィルター
+    range_labels = {
+        'diameter': "直径範囲 (mm)",
+        'year': "年式範囲",
+    }
     with st.sidebar.expander("📊 スペック範囲フィルター", expanded=False):
-        # 直径フィルター
-        if 'diameter' in fan_df.columns:
-            diameter_values = fan_df['diameter'].dropna()
-            if len(diameter_values) > 0:
-                min_diameter = int(diameter_values.min())
-                max_diameter = int(diameter_values.max())
-                diameter_range = st.slider(
-                    "直径範囲 (mm)",
-                    min_value=min_diameter,
-                    max_value=max_diameter,
-                    value=(min_diameter, max_diameter)
-                )
-                filtered_fans = filtered_fans[
-                    (filtered_fans['diameter'] >= diameter_range[0]) &
-                    (filtered_fans['diameter'] <= diameter_range[1])
-                ]
-        
-        # 年式フィルター
-        if 'year' in fan_df.columns:
-            year_values = fan_df['year'].dropna()
-            if len(year_values) > 0:
-                min_year = int(year_values.min())
-                max_year = int(year_values.max())
-                year_range = st.slider(
-                    "年式範囲",
-                    min_value=min_year,
-                    max_value=max_year,
-                    value=(min_year, max_year)
-                )
-                filtered_fans = filtered_fans[
-                    (filtered_fans['year'] >= year_range[0]) &
-                    (filtered_fans['year'] <= year_range[1])
-                ]
+        bounds = run_fan_query(fan_range_query())
+        for column in RANGE_COLUMNS:
+            if len(bounds) == 0 or pd.isna(bounds[f"{column}_min"].iloc[0]):
+                continue
+            min_value = int(bounds[f"{column}_min"].iloc[0])
+            max_value = int(bounds[f"{column}_max"].iloc[0])
+            if min_value == max_value:
+                fan_filters[column] = (min_value, max_value)
+                continue
+            fan_filters[column] = st.slider(
+                range_labels[column],
+                min_value=min_value,
+                max_value=max_value,
+                value=(min_value, max_value),
+                on_change=reset_fan_page,
+            )
 
-    # 4. フィルターリセットボタン
+    # 4. 試験の性能指標による範囲フィルター（FanTestMetrics。範囲を狭めた指標だけ条件にする）
+    metric_labels = {
+        'max_flow': ("最大風量 (m³/min)", 1.0),
+        'shutoff_pressure': ("締切静圧 (Pa)", 1.0),
+        'peak_efficiency': ("最高静圧効率 (%)", 100.0),
+        'max_spl': ("最大騒音 (dBA)", 1.0),
+        'torque_at_peak_efficiency': ("最高効率点トルク (mNm)", 1.0),
+    }
+    with st.sidebar.expander("⚙️ 性能指標フィルター", expanded=False):
+        try:
+            metric_sql, metric_params = metric_range_query()
+            metric_bounds = query_fan_data(metric_sql, metric_params)
+        except Exception:
+            metric_bounds = pd.DataFrame()
+            st.caption("性能指標テーブル（FanTestMetrics）がありません。sample_data/fan_test_metrics.sql で作成してください")
+        for column in METRIC_RANGE_COLUMNS:
+            if len(metric_bounds) == 0 or pd.isna(metric_bounds[f"{column}_min"].iloc[0]):
+                continue
+            label, scale = metric_labels[column]
+            min_value = float(np.floor(metric_bounds[f"{column}_min"].iloc[0] * scale))
+            max_value = float(np.ceil(metric_bounds[f"{column}_max"].iloc[0] * scale))
+            if min_value == max_value:
+                continue
+            selected_range = st.slider(
+                label,
+                min_value=min_value,
+                max_value=max_value,
+                value=(min_value, max_value),
+                on_change=reset_fan_page,
+            )
+            if selected_range != (min_value, max_value):
+                fan_filters[column] = (selected_range[0] / scale, selected_range[1] / scale)
+        if st.button("性能指標を更新", help="未計算の試験の性能指標を計算してFanTestMetricsに保存します"):
+            try:
+                with st.spinner("性能指標を計算中..."):
+                    refreshed = refresh_metrics(conn.session)
+                # 性能指標の範囲・指標で絞り込んだ一覧のキャッシュだけを破棄（試験データ・曲線のキャッシュは残す）
+                query_fan_data.clear()
+                st.success(f"{refreshed}件の試験の性能指標を計算しました")
+            except Exception as e:
+                st.error(f"性能指標の更新エラー: {str(e)}")
+
+    # 5. フィルターリセットボタン
     if st.sidebar.button("🔄 フィルターリセット"):
         st.rerun()
+
+    filtered_count_df = run_fan_query(fan_count_query(fan_filters))
+    filtered_count = int(filtered_count_df['count'].iloc[0]) if len(filtered_count_df) > 0 else 0
 else:
-    filtered_fans = pd.DataFrame()  # DBが利用できない場合は空のDataFrame
+    filtered_count = 0  # DBが利用できない場合は0件
 
 # =======================
 # 検索結果表示エリア
 # =======================
-if DB_CONNECTED and len(fan_df) > 0:
+if DB_CONNECTED and fan_total > 0:
     col1, col2 = st.columns([2, 1])
 
     with col1:
@@ -224,26 +305,37 @@ if DB_CONNECTED and len(fan_df) > 0:
     with col2:
         st.metric(
             "該当モデル数", 
-            len(filtered_fans),
-            delta=len(filtered_fans) - len(fan_df) if len(fan_df) > 0 else 0
+            filtered_count,
+            delta=filtered_count - fan_total
         )
 
-    if len(filtered_fans) > 0:
-        # ソート機能
-        sort_col1, sort_col2 = st.columns(2)
+    if filtered_count > 0:
+        # ソート・ページング
+        sort_col1, sort_col2, sort_col3 = st.columns(3)
         with sort_col1:
-            sortable_columns = ['id', 'series', 'product_type', 'diameter', 'year']
-            available_sort_cols = [col for col in sortable_columns if col in filtered_fans.columns]
-            sort_by = st.selectbox("ソート基準", available_sort_cols, index=0)
+            sort_by = st.selectbox("ソート基準", SORTABLE_COLUMNS, index=0, on_change=reset_fan_page)
         
         with sort_col2:
-            sort_ascending = st.checkbox("昇順", value=True)
+            sort_ascending = st.checkbox("昇順", value=True, on_change=reset_fan_page)
         
-        # データソート
-        if sort_by in filtered_fans.columns:
-            filtered_fans_sorted = filtered_fans.sort_values(sort_by, ascending=sort_ascending)
-        else:
-            filtered_fans_sorted = filtered_fans
+        with sort_col3:
+            page_size = st.selectbox("表示件数", FAN_PAGE_SIZE_OPTIONS, index=1, on_change=reset_fan_page)
+        
+        page_count = (filtered_count + page_size - 1) // page_size
+        # データ更新で件数が減った場合も範囲内に収める
+        if st.session_state.get("fan_page", 1) > page_count:
+            st.session_state["fan_page"] = page_count
+        page = st.number_input(
+            f"ページ（全 {page_count} ページ / {filtered_count} 件）",
+            min_value=1,
+            max_value=page_count,
+            key="fan_page",
+        )
+        
+        # 現在のページのみをDBから取得
+        filtered_fans_sorted = run_fan_query(
+            fan_page_query(fan_filters, sort_by, sort_ascending, limit=page_size, offset=(page - 1) * page_size)
+        )
         
         # データテーブル表示
         st.dataframe(
@@ -264,36 +356,41 @@ if DB_CONNECTED and len(fan_df) > 0:
             }
         )
         
-        # 統計情報表示
+        # 統計情報表示（検索結果全体をDB側で集計）
         with st.expander("📊 検索結果統計", expanded=False):
             stat_col1, stat_col2, stat_col3 = st.columns(3)
             
             with stat_col1:
-                if 'product_type' in filtered_fans.columns:
-                    st.write("**製品タイプ分布**")
-                    product_counts = filtered_fans['product_type'].value_counts()
-                    st.bar_chart(product_counts)
+                st.write("**製品タイプ分布**")
+                product_counts = run_fan_query(fan_group_count_query(fan_filters, 'product_type'))
+                if len(product_counts) > 0:
+                    st.bar_chart(product_counts.dropna().set_index('product_type')['count'])
             
             with stat_col2:
-                if 'diameter' in filtered_fans.columns:
-                    st.write("**直径分布**")
-                    diameter_data = filtered_fans['diameter'].dropna()
-                    if len(diameter_data) > 0:
-                        import plotly.express as px
-                        fig = px.histogram(x=diameter_data, title="直径分布", labels={'x': '直径 (mm)', 'y': '件数'})
-                        fig.update_layout(height=300, showlegend=False)
-                        st.plotly_chart(fig, use_container_width=True, key="diameter_histogram")
+                st.write("**直径分布**")
+                diameter_counts = run_fan_query(fan_group_count_query(fan_filters, 'diameter')).dropna()
+                if len(diameter_counts) > 0:
+                    import plotly.express as px
+                    fig = px.histogram(
+                        x=diameter_counts['diameter'],
+                        y=diameter_counts['count'],
+                        histfunc="sum",
+                        title="直径分布",
+                        labels={'x': '直径 (mm)', 'y': '件数'},
+                    )
+                    fig.update_layout(height=300, showlegend=False)
+                    st.plotly_chart(fig, use_container_width=True, key="diameter_histogram")
             
             with stat_col3:
-                if 'series' in filtered_fans.columns:
-                    st.write("**シリーズ分布**")
-                    series_counts = filtered_fans['series'].value_counts()
-                    st.bar_chart(series_counts)
+                st.write("**シリーズ分布**")
+                series_counts = run_fan_query(fan_group_count_query(fan_filters, 'series'))
+                if len(series_counts) > 0:
+                    st.bar_chart(series_counts.dropna().set_index('series')['count'])
         
         # 詳細表示セクション
         st.subheader("📝 詳細情報")
         
-        # モデル選択
+        # モデル選択（表示中のページから）
         selected_model_index = st.selectbox(
             "詳細を表示するモデルを選択",
             options=range(len(filtered_fans_sorted)),
@@ -340,7 +437,7 @@ if DB_CONNECTED and len(test_df) > 0:
     st.header("🧪 ファン試験データ")
 
     # 選択されたファンモデルに関連する試験データのフィルタリング
-    if len(filtered_fans) > 0:
+    if filtered_count > 0:
         # ファンIDでの関連試験データ抽出
         related_test_data = test_df.copy()
         
@@ -358,11 +455,11 @@ if DB_CONNECTED and len(test_df) > 0:
             if 'TestDate' in test_df.columns:
                 date_filter = st.checkbox("日付範囲でフィルター", value=False)
         
-        if show_related_only and len(filtered_fans) > 0:
-            # 選択されたファンモデルのIDを取得
-            selected_fan_ids = filtered_fans['fanID'].dropna().tolist()
-            if selected_fan_ids:
-                related_test_data = test_df[test_df['fanID'].isin(selected_fan_ids)]
+        if show_related_only:
+            # 検索条件に一致するファンの試験データをDB側で抽出（ファンIDの一覧は取得しない）
+            related_test_data = run_fan_query(
+                related_test_query(fan_filters, columns=select_list(METADATA_COLUMNS)), label="FanTestData"
+            )
         
         df = related_test_data  # グローバル変数を更新（後続の処理で使用）
         
@@ -408,7 +505,6 @@ if DB_CONNECTED and len(test_df) > 0:
             st.subheader("📈 データプロット")
             if len(df) > 0:
                 import plotly.graph_objects as go
-                import json
                 
                 # プロット対象の試験データを選択
                 test_options = [f"ID: {row['id']} - {row.get('FanName', 'N/A')} ({row.get('TestDate', 'N/A')})" 
@@ -425,42 +521,251 @@ if DB_CONNECTED and len(test_df) > 0:
                 if selected_tests:
                     fig = go.Figure()
                     
-                    for idx in selected_tests:
-                        row = df.iloc[idx]
-                        
-                        # JSONB配列をPythonリストに変換
-                        try:
-                            # PostgreSQLから返されるJSONBは文字列またはリストの可能性がある
-                            q_data = row['Q_[m3min]']
-                            ps_data = row['Ps_[Pa]']
-                            
-                            # 文字列の場合はJSON解析
-                            if isinstance(q_data, str):
-                                q_values = json.loads(q_data)
-                            else:
-                                q_values = q_data
-                            
-                            if isinstance(ps_data, str):
-                                ps_values = json.loads(ps_data)
-                            else:
-                                ps_values = ps_data
+                    # 選択された試験の曲線のみ取得（取得済みの試験はキャッシュから）
+                    selected_rows = df.iloc[selected_tests]
+                    try:
+                        curve_store = fetch_curves(conn, selected_rows['fantestdataID'].tolist())
+                    except Exception as e:
+                        st.error(f"試験データの曲線の読み込みエラー: {str(e)}")
+                        curve_store = CurveStore.from_curves([], [], CURVE_COLUMNS)
+                    
+                    # 表示方法（補間・差分は全試験を共通の風量軸に一括補間して計算）
+                    plot_col1, plot_col2, plot_col3 = st.columns(3)
+                    with plot_col1:
+                        plot_mode = st.radio(
+                            "表示方法",
+                            ["実測値", "共通Q軸に補間", "基準との差分", "正規化"],
+                            horizontal=True,
+                            key="db_connected_plot_mode",
+                        )
+                    with plot_col2:
+                        interpolation_method = st.selectbox(
+                            "補間方法",
+                            [METHOD_LINEAR, METHOD_PCHIP],
+                            format_func=lambda m: {METHOD_LINEAR: "線形", METHOD_PCHIP: "単調3次（PCHIP）"}[m],
+                            disabled=plot_mode in ("実測値", "正規化"),
+                            key="db_connected_interpolation",
+                        )
+                    with plot_col3:
+                        show_band = st.checkbox(
+                            "表示中の全試験の分布（10〜90%・中央値）",
+                            value=False,
+                            disabled=plot_mode in ("実測値", "正規化"),
+                            help="表示中の試験データ全件を同じ風量軸に補間し、静圧の分布を重ねて表示",
+                            key="db_connected_plot_band",
+                        )
+                    
+                    fan_names = dict(zip(selected_rows['fantestdataID'].astype(str), selected_rows['FanName']))
+                    test_numbers = dict(zip(selected_rows['fantestdataID'].astype(str), selected_rows['id']))
+                    for test_id in selected_rows['fantestdataID'].astype(str):
+                        if len(curve_store.curve('Q_[m3min]', test_id)) == 0 or len(curve_store.curve('Ps_[Pa]', test_id)) == 0:
+                            st.warning(f"データID {test_numbers[test_id]} の曲線データがありません")
+                    
+                    if plot_mode == "実測値":
+                        for test_id in curve_store.test_ids:
+                            q_values = curve_store.curve('Q_[m3min]', test_id)
+                            ps_values = curve_store.curve('Ps_[Pa]', test_id)
+                            if len(q_values) == 0 or len(ps_values) == 0:
+                                continue
                             
                             # プロット追加
                             fig.add_trace(go.Scatter(
                                 x=q_values,
                                 y=ps_values,
                                 mode='lines+markers',
-                                name=row.get('FanName', f"Test-{row['id']}"),
+                                name=fan_names.get(test_id) or f"Test-{test_numbers[test_id]}",
                                 hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
                             ))
+                    elif plot_mode == "正規化":
+                        # 温度（空気密度）・羽根径・回転数を基準条件にそろえる（全試験を一括換算してキャッシュ）
+                        norm_col1, norm_col2, norm_col3 = st.columns(3)
+                        with norm_col1:
+                            reference_temperature = st.number_input(
+                                "基準温度 [°C]", value=STANDARD_TEMPERATURE, step=1.0, key="db_connected_reference_temperature"
+                            )
+                        with norm_col2:
+                            reference_diameter = st.number_input(
+                                "基準羽根径 [mm]（0: 換算しない）", min_value=0.0, value=0.0, step=10.0,
+                                key="db_connected_reference_diameter"
+                            )
+                        with norm_col3:
+                            reference_speed = st.number_input(
+                                "基準回転数 [rpm]（0: 換算しない）", min_value=0.0, value=0.0, step=100.0,
+                                help="各試験の回転数は電力とトルクから求める",
+                                key="db_connected_reference_speed"
+                            )
+                        
+                        normalized_store = None
+                        try:
+                            normalize_source = load_curve_store(conn)
                         except Exception as e:
-                            st.warning(f"データID {row['id']} の解析エラー: {str(e)}")
+                            st.error(f"全試験の曲線の読み込みエラー: {str(e)}")
+                        else:
+                            diameter_df = run_fan_query(fan_diameter_query()) if reference_diameter > 0 else pd.DataFrame()
+                            diameters = dict(zip(diameter_df['fanID'].astype(str), diameter_df['diameter'])) if len(diameter_df) > 0 else None
+                            conditions = align_conditions(normalize_source, test_df, diameters)
+                            normalized_store = normalize_cached(normalize_source, conditions, {
+                                "temperature": reference_temperature,
+                                "diameter": reference_diameter or None,
+                                "speed": reference_speed or None,
+                            })
+                        
+                        if normalized_store is not None:
+                            skipped = []
+                            for test_id in curve_store.test_ids:
+                                q_values = normalized_store.curve('Q_[m3min]', test_id)
+                                ps_values = normalized_store.curve('Ps_[Pa]', test_id)
+                                if len(q_values) == 0 or len(ps_values) == 0:
+                                    continue
+                                if np.isnan(q_values).all() or np.isnan(ps_values).all():
+                                    skipped.append(fan_names.get(test_id) or f"Test-{test_numbers[test_id]}")
+                                    continue
+                                fig.add_trace(go.Scatter(
+                                    x=q_values,
+                                    y=ps_values,
+                                    mode='lines+markers',
+                                    name=fan_names.get(test_id) or f"Test-{test_numbers[test_id]}",
+                                    hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
+                                ))
+                            if skipped:
+                                st.warning(f"羽根径・回転数が不明なため換算できない試験: {', '.join(map(str, skipped))}")
+                    else:
+                        full_store = None
+                        if show_band:
+                            try:
+                                full_store = load_curve_store(conn)
+                            except Exception as e:
+                                st.error(f"全試験の曲線の読み込みエラー: {str(e)}")
+                        # 分布を重ねる場合は全試験共通の軸にし、補間結果のキャッシュを選択によらず再利用する
+                        grid = flow_grid(full_store if full_store is not None else curve_store)
+                        resampled = resample(curve_store, grid, method=interpolation_method)
+                        
+                        reference = None
+                        if plot_mode == "基準との差分" and len(curve_store) > 0:
+                            reference_id = st.selectbox(
+                                "基準の試験",
+                                options=list(curve_store.test_ids),
+                                format_func=lambda t: fan_names.get(t) or f"Test-{test_numbers[t]}",
+                                key="db_connected_reference_test",
+                            )
+                            reference = resampled[curve_store.position(reference_id)]
+                        
+                        if full_store is not None and len(grid) > 0:
+                            positions = full_store.positions(df['fantestdataID'].tolist())
+                            band_curves = resample_cached(full_store, grid, method=interpolation_method)[positions[positions >= 0]]
+                            if reference is not None:
+                                band_curves = band_curves - reference
+                            # 全試験が範囲外の風量ではNaN（All-NaN の警告は出さない）
+                            with warnings.catch_warnings():
+                                warnings.simplefilter("ignore", RuntimeWarning)
+                                low, median, high = np.nanpercentile(band_curves, [10, 50, 90], axis=0)
+                            fig.add_trace(go.Scatter(x=grid, y=high, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+                            fig.add_trace(go.Scatter(
+                                x=grid, y=low, mode='lines', line=dict(width=0), fill='tonexty',
+                                fillcolor='rgba(128, 128, 128, 0.2)', name="10〜90%", hoverinfo='skip'
+                            ))
+                            fig.add_trace(go.Scatter(
+                                x=grid, y=median, mode='lines', line=dict(color='gray', dash='dash'), name="中央値",
+                                hovertemplate='Q: %{x:.2f} m³/min<br>中央値: %{y:.2f} Pa<extra></extra>'
+                            ))
+                        
+                        for test_id, values in zip(curve_store.test_ids, resampled):
+                            if reference is not None:
+                                values = values - reference
+                            if np.isnan(values).all():
+                                continue
+                            fig.add_trace(go.Scatter(
+                                x=grid,
+                                y=values,
+                                mode='lines',
+                                name=fan_names.get(test_id) or f"Test-{test_numbers[test_id]}",
+                                hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
+                            ))
+                    
+                    # 系の抵抗曲線（Ps = k·Q²）との動作点（全試験×全抵抗曲線を一括計算）
+                    operating_col1, operating_col2 = st.columns([1, 2])
+                    with operating_col1:
+                        show_operating_points = st.checkbox(
+                            "動作点を計算",
+                            value=False,
+                            disabled=plot_mode in ("基準との差分", "正規化"),
+                            help="系の抵抗曲線との交点（動作点）を表示中の全試験について計算",
+                            key="db_connected_operating_points",
+                        )
+                    with operating_col2:
+                        coefficient_text = st.text_input(
+                            "抵抗係数 k [Pa/(m³/min)²]（Ps = k·Q²、カンマ区切りで複数可）",
+                            value="0.3, 0.5, 1.0",
+                            disabled=not show_operating_points,
+                            key="db_connected_system_coefficients",
+                        )
+                    
+                    operating_table = None
+                    if show_operating_points and plot_mode not in ("基準との差分", "正規化"):
+                        try:
+                            coefficients = parse_coefficients(coefficient_text)
+                            operating_store = load_curve_store(conn)
+                        except ValueError as e:
+                            st.error(f"抵抗係数の指定エラー: {str(e)}")
+                            coefficients = np.empty(0)
+                        except Exception as e:
+                            st.error(f"全試験の曲線の読み込みエラー: {str(e)}")
+                            coefficients = np.empty(0)
+                        
+                        if len(coefficients) > 0:
+                            operating_points = solve_operating_points_cached(operating_store, coefficients)
+                            
+                            # 抵抗曲線（表示中の曲線の最大静圧まで）
+                            q_max = np.nanmax(curve_store.values[FLOW_METRIC], initial=0.0)
+                            ps_max = np.nanmax(curve_store.values[PRESSURE_METRIC], initial=0.0)
+                            for k in coefficients:
+                                q_end = min(q_max, np.sqrt(ps_max / k)) if k > 0 else q_max
+                                system_q = np.linspace(0.0, q_end, 50)
+                                fig.add_trace(go.Scatter(
+                                    x=system_q,
+                                    y=k * system_q ** 2,
+                                    mode='lines',
+                                    line=dict(color='black', width=1, dash='dot'),
+                                    name=f"抵抗曲線 k={k:g}",
+                                    hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
+                                ))
+                            
+                            # 選択した試験の動作点
+                            for test_id, position in zip(curve_store.test_ids, operating_store.positions(curve_store.test_ids)):
+                                if position < 0:
+                                    continue
+                                fig.add_trace(go.Scatter(
+                                    x=operating_points[FLOW_METRIC][position],
+                                    y=operating_points[PRESSURE_METRIC][position],
+                                    mode='markers',
+                                    marker=dict(symbol='x', size=10),
+                                    name=f"{fan_names.get(test_id) or f'Test-{test_numbers[test_id]}'} 動作点",
+                                    customdata=np.column_stack([
+                                        coefficients,
+                                        operating_points['Power_[W]'][position],
+                                        operating_points['SPL_[dbA]'][position],
+                                    ]),
+                                    hovertemplate=(
+                                        'k: %{customdata[0]:g}<br>Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa'
+                                        '<br>電力: %{customdata[1]:.1f} W<br>騒音: %{customdata[2]:.1f} dBA<extra></extra>'
+                                    )
+                                ))
+                            
+                            # 表示中の全試験の動作点一覧
+                            displayed = operating_store.positions(df['fantestdataID'].tolist())
+                            operating_table = operating_point_frame(
+                                operating_store, coefficients, operating_points, displayed[displayed >= 0]
+                            )
+                            operating_table.insert(
+                                1, "FanName",
+                                operating_table['fantestdataID'].map(dict(zip(df['fantestdataID'].astype(str), df['FanName'])))
+                            )
                     
                     # グラフレイアウト設定
                     fig.update_layout(
-                        title="ファンP-Q特性曲線",
+                        title="ファンP-Q特性曲線（基準条件に換算）" if plot_mode == "正規化" else "ファンP-Q特性曲線",
                         xaxis_title="風量 Q [m³/min]",
-                        yaxis_title="静圧 Ps [Pa]",
+                        yaxis_title="静圧差 ΔPs [Pa]" if plot_mode == "基準との差分" else "静圧 Ps [Pa]",
                         hovermode='closest',
                         template="plotly_white",
                         height=600,
@@ -475,8 +780,122 @@ if DB_CONNECTED and len(test_df) > 0:
                     
                     st.plotly_chart(fig, use_container_width=True, key="db_connected_pq_chart")
                     
+                    if operating_table is not None:
+                        st.write(f"**動作点一覧**（表示中の試験 {operating_table['fantestdataID'].nunique()} 件、列見出しで並べ替え）")
+                        table_col1, table_col2 = st.columns(2)
+                        with table_col1:
+                            table_coefficients = st.multiselect(
+                                "抵抗係数で絞り込み",
+                                options=list(coefficients),
+                                default=list(coefficients),
+                                format_func=lambda k: f"k={k:g}",
+                                key="db_connected_operating_filter",
+                            )
+                        with table_col2:
+                            selected_only = st.checkbox("選択した試験のみ", value=False, key="db_connected_operating_selected")
+                        operating_view = operating_table[operating_table['k'].isin(table_coefficients)]
+                        if selected_only:
+                            operating_view = operating_view[operating_view['fantestdataID'].isin(curve_store.test_ids)]
+                        st.dataframe(
+                            operating_view,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "k": st.column_config.NumberColumn("抵抗係数 k", format="%g"),
+                                FLOW_METRIC: st.column_config.NumberColumn("風量 Q [m³/min]", format="%.2f"),
+                                PRESSURE_METRIC: st.column_config.NumberColumn("静圧 Ps [Pa]", format="%.1f"),
+                                "Power_[W]": st.column_config.NumberColumn("電力 [W]", format="%.1f"),
+                                "SPL_[dbA]": st.column_config.NumberColumn("騒音 [dBA]", format="%.1f"),
+                            }
+                        )
+                    
+                    # 類似曲線検索（全試験の曲線ベクトルの索引から特性の近い試験を検索）
+                    st.write("**🔍 類似曲線検索**")
+                    similar_col1, similar_col2, similar_col3 = st.columns(3)
+                    with similar_col1:
+                        similar_base = st.selectbox(
+                            "基準の試験",
+                            options=list(curve_store.test_ids),
+                            format_func=lambda t: fan_names.get(t) or f"Test-{test_numbers[t]}",
+                            key="db_connected_similar_base",
+                        )
+                    with similar_col2:
+                        similar_metrics = st.multiselect(
+                            "比較する指標",
+                            SIMILARITY_METRICS,
+                            default=list(DEFAULT_METRICS),
+                            format_func=lambda m: {"Ps_[Pa]": "静圧", "Power_[W]": "電力", "SPL_[dbA]": "騒音"}[m],
+                            key="db_connected_similar_metrics",
+                        )
+                    with similar_col3:
+                        similar_count = st.slider("件数", min_value=1, max_value=50, value=10, key="db_connected_similar_count")
+                    find_similar = st.checkbox(
+                        "類似する試験を検索",
+                        value=False,
+                        disabled=similar_base is None or not similar_metrics,
+                        key="db_connected_find_similar",
+                    )
+                    
+                    if find_similar and similar_base is not None and similar_metrics:
+                        try:
+                            similar_store = load_curve_store(conn)
+                            with st.spinner("類似検索の索引を準備中..."):
+                                similar_index = get_similarity_index_cache().get(similar_store, similar_metrics)
+                            similar = similar_index.query(similar_base, k=similar_count)
+                        except Exception as e:
+                            st.error(f"類似曲線検索エラー: {str(e)}")
+                            similar = None
+                        
+                        if similar is not None and len(similar) > 0:
+                            test_info = test_df[['fantestdataID', 'id', 'FanName', 'TestDate']].assign(
+                                fantestdataID=test_df['fantestdataID'].astype(str)
+                            )
+                            similar = similar.merge(test_info, on='fantestdataID', how='left')
+                            similar_fig = go.Figure()
+                            for test_id, name, line in [(similar_base, fan_names.get(similar_base) or "基準", dict(width=4))] + [
+                                (row.fantestdataID, row.FanName or f"Test-{row.id}", dict(width=1)) for row in similar.itertuples()
+                            ]:
+                                similar_fig.add_trace(go.Scatter(
+                                    x=similar_store.curve('Q_[m3min]', test_id),
+                                    y=similar_store.curve('Ps_[Pa]', test_id),
+                                    mode='lines+markers',
+                                    line=line,
+                                    name=name,
+                                    hovertemplate='Q: %{x:.2f} m³/min<br>Ps: %{y:.2f} Pa<extra></extra>'
+                                ))
+                            similar_fig.update_layout(
+                                title="類似するP-Q特性曲線",
+                                xaxis_title="風量 Q [m³/min]",
+                                yaxis_title="静圧 Ps [Pa]",
+                                template="plotly_white",
+                                height=450,
+                            )
+                            st.plotly_chart(similar_fig, use_container_width=True, key="db_connected_similar_chart")
+                            st.dataframe(
+                                similar[['fantestdataID', 'id', 'FanName', 'TestDate', 'distance']],
+                                use_container_width=True,
+                                hide_index=True,
+                                column_config={
+                                    "distance": st.column_config.NumberColumn("距離", help="小さいほど特性が近い", format="%.3f"),
+                                }
+                            )
+                    
                     # データテーブル表示
                     with st.expander("選択した試験データの詳細"):
+                        # 曲線の統計（ストアの配列から一括計算）
+                        if len(curve_store) > 0:
+                            st.dataframe(
+                                pd.DataFrame({
+                                    "試験": [fan_names.get(test_id) or test_id for test_id in curve_store.test_ids],
+                                    "点数": curve_store.lengths('Q_[m3min]'),
+                                    "最大風量 Q [m³/min]": curve_store.reduce('Q_[m3min]', np.fmax),
+                                    "最大静圧 Ps [Pa]": curve_store.reduce('Ps_[Pa]', np.fmax),
+                                    "最大電力 [W]": curve_store.reduce('Power_[W]', np.fmax),
+                                    "最大騒音 [dBA]": curve_store.reduce('SPL_[dbA]', np.fmax),
+                                }),
+                                use_container_width=True,
+                                hide_index=True,
+                            )
                         for idx in selected_tests:
                             row = df.iloc[idx]
                             fan_name = row.get('FanName') or f"Test-{row['id']}"
@@ -507,21 +926,7 @@ else:
     selected_tests = []  # DBが利用できない場合の初期化
 
 def pick_model_identifier(row):
-    keys = [
-        "model",
-        "Model",
-        "model_name",
-        "ModelName",
-        "model_path",
-        "model_glb",
-        "FanModel",
-        "fan_model",
-        "fan_model_name",
-        "FanName",
-        "fanID",
-        "id",
-    ]
-    for key in keys:
+    for key in MODEL_IDENTIFIER_COLUMNS:
         if key in row and row.get(key):
             return str(row.get(key))
     return None
@@ -533,23 +938,13 @@ def resolve_glb_path(model_identifier, base_dir="models"):
         raise FileNotFoundError(f"モデルディレクトリ {base_path} が見つかりません。")
 
     raw = Path(model_identifier)
-    candidates = []
-
     if raw.is_absolute() and raw.exists():
         return raw
 
-    if raw.suffix.lower() == ".glb":
-        candidates.append(base_path / raw.name)
-        candidates.append(base_path / raw.name.lower())
-    else:
-        candidates.append(base_path / f"{raw.stem}.glb")
-        candidates.append(base_path / f"{raw.name}.glb")
-
-    candidates.extend(base_path.glob(f"{raw.stem}*.glb"))
-
-    for candidate in candidates:
-        if candidate.exists():
-            return candidate
+    # ディレクトリをglobせず、モデルカタログのインデックスで解決
+    record = load_model_catalog(base_dir).resolve(model_identifier)
+    if record is not None and record['file_path'].exists():
+        return record['file_path']
 
     raise FileNotFoundError(f"モデル {model_identifier} の.glbが {base_path} に見つかりません。")
 
@@ -572,12 +967,14 @@ auto_rotate = st.sidebar.checkbox("自動回転", False)
 col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("🔄 リセットビュー"):
-        st.rerun()
+        request_camera_reset("app06")
 with col2:
     if st.button("📷 スクリーンショット", help="右クリックで画像を保存できます"):
         st.info("ビューア上で右クリック → 画像を保存")
 with col3:
     if st.button("🔍 リロード"):
+        get_model_catalog("models").refresh()
+        get_curve_cache().clear()
         st.rerun()
 
 # 3Dビューア表示処理
@@ -592,6 +989,18 @@ if DB_CONNECTED and len(df) > 0:
         else:
             viewer_candidates = list(range(len(df)))
         
+        # 全行のモデルを一括解決（試験データ・カタログの版ごとにキャッシュ）
+        df_with_models, unresolved_tests = attach_model_paths(df, models_dir="models")
+        has_model = df_with_models['model_path'].notna().to_numpy()
+        viewer_candidates = [i for i in viewer_candidates if has_model[i]]
+        
+        if len(unresolved_tests) > 0:
+            with st.expander(f"⚠️ モデル未解決の試験データ: {len(unresolved_tests)} 件", expanded=False):
+                unresolved_columns = [c for c in ['id', 'FanName', 'fanID', 'model_identifier'] if c in unresolved_tests.columns]
+                st.dataframe(unresolved_tests[unresolved_columns], use_container_width=True, hide_index=True)
+        
+        viewer_model_path = None
+        
         if viewer_candidates:
             # test_optionsを定義
             test_options = [f"ID: {df.iloc[i]['id']} - {df.iloc[i].get('FanName', 'N/A')} ({df.iloc[i].get('TestDate', 'N/A')})" 
@@ -603,124 +1012,51 @@ if DB_CONNECTED and len(df) > 0:
                 format_func=lambda i: test_options[i] if i < len(test_options) else f"Test-{i}"
             )
             
-            target_row = df.iloc[viewer_index]
+            target_row = df_with_models.iloc[viewer_index]
             fan_name = target_row.get('FanName') or target_row.get('fanID') or f"Test-{target_row.get('id', viewer_index)}"
-            model_identifier = pick_model_identifier(target_row)
-            
-            viewer_model_path = None
-            
-            if not model_identifier:
-                st.warning("試験データにモデル識別子が見つかりません。代替モデルから選択してください。")
-            else:
-                try:
-                    viewer_model_path = resolve_glb_path(model_identifier, base_dir="models")
-                    st.success(f"モデルを自動解決: {model_identifier}")
-                except FileNotFoundError as exc:
-                    st.warning(f"自動解決失敗: {str(exc)}")
+            viewer_model_path = Path(target_row['model_path'])
+            st.success(f"モデルを自動解決: {target_row['model_identifier']}")
         else:
-            st.info("表示可能な試験データがありません。")
+            st.info("3Dモデルが見つかった試験データがありません。代替モデルから選択してください。")
     
     with viewer_tab2:
-        # 直接モデルファイル選択
-        models_dir = Path("models")
-        if models_dir.exists():
-            glb_files = list(models_dir.glob("*.glb"))
-            if glb_files:
-                manual_model_index = st.selectbox(
-                    "利用可能なモデルから選択",
-                    options=range(len(glb_files)),
-                    format_func=lambda i: glb_files[i].name
-                )
-                viewer_model_path = glb_files[manual_model_index]
-                fan_name = f"Manual: {glb_files[manual_model_index].stem}"
-            else:
-                st.error("modelsディレクトリに.glbファイルがありません")
-        else:
-            st.error("modelsディレクトリが見つかりません")
+        # 直接モデルファイル選択（モデルカタログから一覧を取得）
+        manual_model_path, manual_fan_name = render_model_selector("models", key_suffix="app06_manual")
+        if manual_model_path is not None:
+            viewer_model_path = manual_model_path
+            fan_name = manual_fan_name
 
 else:
     # DB未接続または試験データなしの場合は直接モデル選択のみ
     st.info("データベースが利用できないため、直接モデル選択機能のみ利用可能です。")
-    
-    models_dir = Path("models")
-    if models_dir.exists():
-        glb_files = list(models_dir.glob("*.glb"))
-        if glb_files:
-            manual_model_index = st.selectbox(
-                "利用可能なモデルから選択",
-                options=range(len(glb_files)),
-                format_func=lambda i: glb_files[i].name,
-                key="direct_model_select"
-            )
-            viewer_model_path = glb_files[manual_model_index]
-            fan_name = f"Manual: {glb_files[manual_model_index].stem}"
-        else:
-            st.error("modelsディレクトリに.glbファイルがありません")
-            viewer_model_path = None
-            fan_name = "No Model"
-    else:
-        st.error("modelsディレクトリが見つかりません")
-        viewer_model_path = None
-        fan_name = "No Model"
+    viewer_model_path, fan_name = render_model_selector("models", key_suffix="app06_direct")
 
 # 3Dビューア表示
 if 'viewer_model_path' in locals() and viewer_model_path and Path(viewer_model_path).exists():
-    try:
-        import base64
-        
-        with open(viewer_model_path, 'rb') as f:
-            glb_data = f.read()
-            glb_base64 = base64.b64encode(glb_data).decode()
+    # モデル本体は埋め込まず、配信サーバーのURLをビューアに渡す
+    model_source, file_size = load_glb_model(viewer_model_path)
+    
+    if model_source:
+        # ビューア情報表示
+        viewer_info_col1, viewer_info_col2 = st.columns([3, 1])
+        with viewer_info_col1:
+            st.write(f"**表示モデル**: {fan_name}")
+        with viewer_info_col2:
+            st.write(f"**ファイルサイズ**: {file_size / 1024:.1f} KB")
         
-        # Three.jsテンプレートファイルの確認
-        template_path = Path("three_html/viewer01.html")
-        if not template_path.exists():
-            st.error(f"Three.jsテンプレートファイル '{template_path}' が見つかりません。")
-        else:
-            template = template_path.read_text(encoding="utf-8")
-            threejs_html = template.format(
-                bg_color=bg_color,
-                width=width,
-                height=height,
-                auto_rotate=str(auto_rotate).lower(),
-                show_grid=str(show_grid).lower(),
-                glb_base64=glb_base64,
-            )
-            
-            # ビューア情報表示
-            viewer_info_col1, viewer_info_col2 = st.columns([3, 1])
-            with viewer_info_col1:
-                st.write(f"**表示モデル**: {fan_name}")
-            with viewer_info_col2:
-                st.write(f"**ファイルサイズ**: {len(glb_data) / 1024:.1f} KB")
-            
-            # Three.js ビューア埋め込み
-            components.html(threejs_html, height=height + 20, scrolling=False)
-            
-            # 操作ガイド
-            with st.expander("🕹️ ビューア操作方法", expanded=False):
-                st.markdown("""
-                ### マウス操作
-                - **左クリック + ドラッグ**: モデルを回転
-                - **右クリック + ドラッグ**: カメラ移動（パン）
-                - **マウスホイール**: ズームイン/アウト
-                
-                ### 表示設定
-                - **グリッド表示**: 基準となるグリッドの表示/非表示
-                - **自動回転**: モデルの自動回転機能
-                - **背景色**: ビューアの背景色変更
-                
-                ### パフォーマンス
-                - GPU加速レンダリング対応（WebGL 2.0）
-                - リアルタイム照明とシャドウ
-                - 高解像度モデル表示対応
-                """)
-            
+        # Three.js ビューア（設定変更は差分のみ送信され、モデルは再読み込みしない）
+        viewer_settings = {
+            'width': width,
+            'height': height,
+            'bg_color': bg_color,
+            'show_grid': show_grid,
+            'auto_rotate': auto_rotate,
+            'reset_token': get_reset_token("app06"),
+        }
+        if render_threejs_viewer(model_source, viewer_settings, key="app06_viewer"):
+            render_viewer_guide()
+            render_cache_stats()
             st.caption(f"📁 使用モデル: `{viewer_model_path}`")
-            
-    except Exception as e:
-        st.error(f"3Dモデルの読み込みエラー: {str(e)}")
-        st.exception(e)
 else:
     st.info("表示する3Dモデルを選択してください。")
 
@@ -0,0 +1,82 @@
+'''
+ファン試験データ取り込みページ
+- 試験機から出力したCSV（FanTestData_upload_v2.csv 形式）をアップロードして一括登録
+- 一定行数ずつ検証し、合格した行をCOPYで登録（ingest_fantestdata.py と同じ処理）
+- 不合格の行は理由付きのCSVとしてダウンロード可能
+
+'''
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import streamlit as st
+
+from fan_test_metrics import refresh_metrics
+from ingest_fantestdata import DEFAULT_BATCH_SIZE, ingest_csv
+
+st.set_page_config(page_title="試験データ取り込み", layout="wide")
+st.title("📥 ファン試験データ取り込み")
+
+conn = st.connection("postgresql", type="sql")
+
+st.write("試験機から出力したCSV（曲線はJSON配列のセル）を FanTestData に一括登録します。")
+
+uploaded_file = st.file_uploader("試験データCSV", type=["csv"])
+option_col1, option_col2 = st.columns(2)
+with option_col1:
+    batch_size = st.number_input(
+        "1回に検証・登録する行数", min_value=100, max_value=100000, value=DEFAULT_BATCH_SIZE, step=1000
+    )
+with option_col2:
+    update_metrics = st.checkbox("登録後に性能指標（FanTestMetrics）を更新", value=False)
+
+if uploaded_file is not None and st.button("取り込み開始", type="primary"):
+    progress_text = st.empty()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # アップロードを一時ファイルに書き出し、そこから一定行数ずつ読み込む（全体をメモリに展開しない）
+        source_path = Path(work_dir) / "upload.csv"
+        with open(source_path, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f)
+        rejected_path = Path(work_dir) / "rejected.csv"
+
+        try:
+            report = ingest_csv(
+                conn.engine,
+                source_path,
+                rejected_path=rejected_path,
+                batch_size=int(batch_size),
+                progress=lambda r: progress_text.info(
+                    f"{r['rows']} 行処理（登録 {r['loaded']}、不合格 {r['rejected']}、{r['rows_per_second']:.0f} rows/s）"
+                ),
+            )
+        except Exception as e:
+            st.error(f"取り込みエラー: {str(e)}")
+            st.stop()
+
+        progress_text.empty()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("読み込み行数", report["rows"])
+        col2.metric("登録行数", report["loaded"])
+        col3.metric("不合格行数", report["rejected"])
+        col4.metric("スループット", f"{report['rows_per_second']:.0f} rows/s")
+
+        if report["rejected_path"]:
+            st.warning(f"{report['rejected']} 行が検証で不合格になりました。理由は reject_reason 列を確認してください。")
+            st.download_button(
+                "不合格の行をダウンロード",
+                data=Path(report["rejected_path"]).read_bytes(),
+                file_name=f"{Path(uploaded_file.name).stem}_rejected.csv",
+                mime="text/csv",
+            )
+
+    if report["loaded"] > 0:
+        st.success(f"{report['loaded']} 行を登録しました")
+        if update_metrics:
+            try:
+                with st.spinner("性能指標を計算中..."):
+                    st.info(f"性能指標を {refresh_metrics(conn.session)} 件計算しました")
+            except Exception as e:
+                st.error(f"性能指標の更新エラー: {str(e)}")
+        # 一覧・曲線のキャッシュを破棄して新しい試験を表示できるようにする
+        st.cache_data.clear()
@@ -0,0 +1,168 @@
+"""
+STL → GLB 一括変換コマンド
+ディレクトリ内のSTLをプロセスプールで並列変換し、ファイルデータベースにまとめて登録する
+- 元ファイルのSHA-256と出力形式の組が登録済み（GLBが存在する）の場合は変換をスキップ
+- 処理後にスループット（files/s, MB/s）とファイルごとの処理時間を表示
+
+使い方:
+    python batch_convert.py                      # uploaded_files/ を変換
+    python batch_convert.py path/to/stl_dir -j 8 # ディレクトリ・並列数を指定
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from cad_conversion import convert_stl_to_glb
+from file_database import load_database, save_entries_to_database, update_source_hashes
+from glb_cache import file_sha256
+from glb_writer import ENCODING_PLAIN, ENCODING_QUANTIZED, ENCODINGS
+
+DEFAULT_SOURCE_DIR = Path("uploaded_files")
+DEFAULT_OUTPUT_DIR = Path("glb_files")
+
+
+def find_stl_files(source_dir, recursive=False):
+    """ディレクトリからSTLファイルを検索（ファイル名順）"""
+    pattern = "**/*" if recursive else "*"
+    return sorted(
+        path for path in Path(source_dir).glob(pattern)
+        if path.is_file() and path.suffix.lower() == ".stl"
+    )
+
+
+def known_source_hashes(db):
+    """
+    変換済み（GLBが存在する）元ファイルのSHA-256と出力形式の組を収集
+
+    ハッシュ未記録の既存エントリは元ファイルから計算し、次回から計算しないようデータベースに記録する
+    （blob_store.find_converted と同じく、形式の異なる変換は別物として扱う。
+    出力形式の記録がない旧エントリは最適化なし（plain）の変換として扱う）
+
+    戻り値: (SHA-256, encoding) のセット
+    """
+    hashes = set()
+    computed = {}
+    for entry in db:
+        if not os.path.exists(entry.get("glb_path", "")):
+            continue
+        sha256 = entry.get("source_sha256")
+        if sha256 is None and os.path.exists(entry.get("original_path", "")):
+            sha256 = file_sha256(entry["original_path"])
+            if entry.get("id"):
+                computed[entry["id"]] = sha256
+        if sha256:
+            hashes.add((sha256, entry.get("encoding") or ENCODING_PLAIN))
+    update_source_hashes(computed)
+    return hashes
+
+
+def _convert_one(stl_path, glb_path, encoding=ENCODING_QUANTIZED):
+    """ワーカープロセスで1ファイルを変換し、処理時間を計測"""
+    started = time.perf_counter()
+    success, message = convert_stl_to_glb(str(stl_path), str(glb_path), encoding=encoding)
+    return success, message, time.perf_counter() - started
+
+
+def run_batch(source_dir, output_dir, workers, recursive=False, encoding=ENCODING_QUANTIZED):
+    """
+    一括変換を実行
+
+    Args:
+        source_dir: STLファイルのディレクトリ
+        output_dir: GLBの出力ディレクトリ
+        workers: 並列プロセス数
+        recursive: サブディレクトリも対象にするか
+        encoding: GLBの出力形式（quantized / draco / plain）
+
+    戻り値: 失敗件数
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+
+    stl_files = find_stl_files(source_dir, recursive)
+    if not stl_files:
+        print(f"{source_dir} にSTLファイルがありません")
+        return 0
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # ハッシュ計算もワーカーで並列に行う
+        hashes = list(executor.map(file_sha256, stl_files, chunksize=8))
+        known = known_source_hashes(load_database())
+
+        jobs = {}
+        skipped = 0
+        for stl_path, sha256 in zip(stl_files, hashes):
+            if (sha256, encoding) in known:
+                skipped += 1
+                continue
+            known.add((sha256, encoding))  # 同じ内容のファイルはバッチ内でも1回だけ変換
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            glb_path = output_dir / f"{timestamp}_{sha256[:8]}_{stl_path.stem}.glb"
+            future = executor.submit(_convert_one, stl_path, glb_path, encoding)
+            jobs[future] = (stl_path, glb_path, sha256)
+
+        print(f"対象: {len(stl_files)} 件 / 変換: {len(jobs)} 件 / スキップ（変換済み）: {skipped} 件")
+
+        entries = []
+        failures = 0
+        converted_bytes = 0
+        for future in as_completed(jobs):
+            stl_path, glb_path, sha256 = jobs[future]
+            success, message, elapsed = future.result()
+            size_mb = stl_path.stat().st_size / 1024 / 1024
+            status = "OK " if success else "NG "
+            print(f"  {status} {stl_path.name:<40} {size_mb:8.2f} MB {elapsed:8.2f} s  {message}")
+            if not success:
+                failures += 1
+                continue
+            converted_bytes += stl_path.stat().st_size
+            entries.append({
+                "id": f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{sha256[:8]}",
+                "original_name": stl_path.name,
+                "original_path": str(stl_path),
+                "glb_path": str(glb_path),
+                "file_type": "stl",
+                "upload_date": datetime.now().isoformat(),
+                "source_sha256": sha256,
+                "encoding": encoding,
+            })
+
+    # 登録は最後に1回だけまとめて書き込む
+    save_entries_to_database(entries)
+
+    total_elapsed = time.perf_counter() - started
+    converted = len(entries)
+    print(
+        f"完了: {converted} 件成功 / {failures} 件失敗 / {total_elapsed:.2f} s "
+        f"({converted / total_elapsed:.2f} files/s, "
+        f"{converted_bytes / 1024 / 1024 / total_elapsed:.2f} MB/s)"
+    )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="STL → GLB 一括変換")
+    parser.add_argument("source_dir", nargs="?", default=str(DEFAULT_SOURCE_DIR),
+                        help="STLファイルのディレクトリ（既定: uploaded_files）")
+    parser.add_argument("-o", "--output-dir", default=str(DEFAULT_OUTPUT_DIR),
+                        help="GLBの出力ディレクトリ（既定: glb_files）")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="並列プロセス数（既定: CPUコア数）")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="サブディレクトリも対象にする")
+    parser.add_argument("-e", "--encoding", choices=ENCODINGS, default=ENCODING_QUANTIZED,
+                        help="GLBの出力形式（quantized: 頂点結合・量子化〔既定〕、draco: Draco圧縮、plain: 最適化なし）")
+    args = parser.parse_args(argv)
+
+    failures = run_batch(args.source_dir, args.output_dir, args.workers, args.recursive, args.encoding)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
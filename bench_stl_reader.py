@@ -0,0 +1,124 @@
+"""
+STL読み込みベンチマーク
+trimesh.load による読み込み・書き出しと、stl_reader（メモリマップ）による読み込み・書き出しを
+別プロセスで実行し、処理時間とピークメモリ（RSS）を比較する
+
+使い方:
+    python bench_stl_reader.py path/to/model.stl [--encoding quantized]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from glb_writer import ENCODING_QUANTIZED, ENCODINGS
+
+
+def _peak_rss_mb():
+    """現在のプロセスのピークRSS（MB）"""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # LinuxはKB、macOSはバイト単位
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        # Windowsでは resource がないため psutil を使う
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+
+def _run_trimesh(stl_path, glb_path, encoding):
+    import trimesh
+
+    from glb_writer import write_glb
+
+    mesh = trimesh.load(stl_path)
+    write_glb(mesh, glb_path, encoding)
+    return len(mesh.faces)
+
+
+def _run_stl_reader(stl_path, glb_path, encoding):
+    from glb_writer import weld_mesh, write_geometry_glb
+    from stl_reader import read_stl_triangles
+
+    triangles = read_stl_triangles(stl_path)
+    face_count = len(triangles)
+    geometry = weld_mesh(triangles)
+    del triangles
+    write_geometry_glb(geometry, glb_path, encoding)
+    return face_count
+
+
+RUNNERS = {
+    "trimesh": _run_trimesh,
+    "stl_reader": _run_stl_reader,
+}
+
+
+def _worker(name, stl_path, glb_path, encoding, queue):
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    face_count = RUNNERS[name](stl_path, glb_path, encoding)
+    elapsed = time.perf_counter() - start
+    queue.put((face_count, elapsed, baseline, _peak_rss_mb()))
+
+
+def run_benchmark(stl_path, encoding=ENCODING_QUANTIZED):
+    """
+    各読み込み方法を新しいプロセスで実行して計測
+
+    Args:
+        stl_path: 入力STLファイルのパス
+        encoding: 書き出すGLBの形式
+
+    戻り値: [{name, faces, seconds, baseline_mb, peak_mb, glb_size}]
+    """
+    # 前の計測のメモリが残らないよう、毎回spawnした子プロセスで実行する
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in RUNNERS:
+            glb_path = os.path.join(tmp_dir, f"{name}.glb")
+            queue = context.Queue()
+            process = context.Process(target=_worker, args=(name, str(stl_path), glb_path, encoding, queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"{name} の計測に失敗しました（終了コード {process.exitcode}）")
+            face_count, elapsed, baseline, peak = queue.get()
+            results.append({
+                "name": name,
+                "faces": face_count,
+                "seconds": elapsed,
+                "baseline_mb": baseline,
+                "peak_mb": peak,
+                "glb_size": os.path.getsize(glb_path),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="STL読み込み方法ごとの処理時間・ピークメモリを比較")
+    parser.add_argument("stl_path", type=Path, help="計測に使うSTLファイル")
+    parser.add_argument("-e", "--encoding", choices=ENCODINGS, default=ENCODING_QUANTIZED, help="書き出すGLBの形式")
+    args = parser.parse_args(argv)
+
+    size_mb = args.stl_path.stat().st_size / 1024 / 1024
+    print(f"{args.stl_path}（{size_mb:,.1f} MB）")
+    for result in run_benchmark(args.stl_path, args.encoding):
+        print(
+            f"  {result['name']:<10} {result['seconds']:7.2f} s  "
+            f"ピークRSS {result['peak_mb']:8,.0f} MB（起動時 {result['baseline_mb']:,.0f} MB）  "
+            f"{result['faces']:,} 面  GLB {result['glb_size'] / 1024:,.0f} KB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
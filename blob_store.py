@@ -0,0 +1,79 @@
+"""
+アップロード保存モジュール
+アップロードファイルを内容のSHA-256で保存する（コンテンツアドレス）
+- 一定サイズずつ書き込みながらハッシュを計算するため、ファイル全体をメモリに載せない
+- 同じ内容のファイルは1つだけ保存し、変換済みGLBも（形式ごとに）共有する
+- アップロードごとの情報（元のファイル名・日時）はファイルデータベースのエントリに残す
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from file_database import find_by_source_hash
+from glb_cache import HASH_CHUNK_SIZE
+
+BLOB_DIRNAME = "blobs"
+
+
+def blob_path(upload_dir, sha256, suffix):
+    """保存先のパス（<upload_dir>/blobs/<先頭2文字>/<SHA-256><拡張子>）"""
+    return Path(upload_dir) / BLOB_DIRNAME / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+
+def converted_glb_path(glb_dir, sha256, encoding):
+    """元ファイルのハッシュと出力形式から決まる変換後GLBのパス"""
+    return Path(glb_dir) / f"{sha256}_{encoding}.glb"
+
+
+def store_upload(source, upload_dir, suffix):
+    """
+    アップロードファイルを一定サイズずつ書き込みながらハッシュを計算して保存
+
+    Args:
+        source: 読み込み可能なファイルオブジェクト（StreamlitのUploadedFileなど）
+        upload_dir: アップロード保存ディレクトリ
+        suffix: 保存する拡張子（例: ".stl"）
+
+    戻り値: (SHA-256, 保存先パス, 新規保存ならTrue・既存の同一ファイルがあればFalse)
+    """
+    tmp_dir = Path(upload_dir) / BLOB_DIRNAME
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / f".upload.{os.getpid()}.{threading.get_ident()}.{uuid.uuid4().hex}.tmp"
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        sha256 = digest.hexdigest()
+        path = blob_path(upload_dir, sha256, suffix)
+        if path.exists():
+            return sha256, path, False
+        path.parent.mkdir(exist_ok=True)
+        # 同じ内容が並行して保存されても、置き換え後の内容は同一
+        tmp_path.replace(path)
+        return sha256, path, True
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def find_converted(sha256, encoding):
+    """
+    同じ元ファイルを同じ形式で変換済みのエントリを取得
+
+    Args:
+        sha256: 元ファイルのSHA-256
+        encoding: GLBの出力形式
+
+    戻り値: エントリ辞書（GLBが存在するもの。なければNone）
+    """
+    for entry in find_by_source_hash(sha256):
+        if entry.get("encoding") == encoding and os.path.exists(entry["glb_path"]):
+            return entry
+    return None
@@ -0,0 +1,60 @@
+"""
+一括登録モジュール
+多数の行を一定件数ずつまとめてINSERTする（サンプルデータ・負荷試験用データの投入）
+- 1チャンク = 1回の複数行INSERT（VALUES (...), (...), ...）＋ RETURNING = 1トランザクション
+- SQLAlchemyの executemany（insertmanyvalues）で複数行VALUESに展開し、行ごとの往復・コミットをなくす
+- 列名・テーブル名は識別子として引用される（"Fan list"、"temp_o_[degC]" など）
+"""
+
+import time
+
+from sqlalchemy import column, insert, table
+
+# 1回のINSERT・トランザクションで登録する行数
+DEFAULT_BATCH_SIZE = 1000
+# PostgreSQLの1文あたりのバインドパラメータ数の上限
+MAX_BIND_PARAMETERS = 65535
+
+
+def insert_rows(session, table_name, rows, returning=(), batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    行を batch_size 件ずつ複数行INSERTで登録（チャンクごとにコミット）
+
+    途中のチャンクで失敗した場合はそのチャンクをロールバックして例外を送出する（それ以前のチャンクは登録済み）
+
+    Args:
+        session: SQLAlchemyのセッション（st.connection の conn.session など）
+        table_name: テーブル名（例: "Fan list"）
+        rows: {列名: 値} の辞書のリスト（全行同じ列）
+        returning: RETURNINGで取得する列名
+        batch_size: 1チャンクの行数（パラメータ数の上限を超えないよう自動で調整）
+        progress: 進捗通知関数 progress(登録済み行数, 経過秒)（Noneなら通知しない）
+
+    戻り値: RETURNINGの結果（列名をキーとする辞書のリスト。rows と同じ順とは限らない。returning が空なら空リスト）
+    """
+    if not rows:
+        return []
+    columns = list(rows[0])
+    target = table(table_name, *(column(name) for name in dict.fromkeys(columns + list(returning))))
+    statement = insert(target)
+    if returning:
+        statement = statement.returning(*(target.c[name] for name in returning))
+    batch_size = max(1, min(int(batch_size), MAX_BIND_PARAMETERS // max(len(columns), 1)))
+
+    started = time.perf_counter()
+    returned = []
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        try:
+            result = session.execute(
+                statement.execution_options(insertmanyvalues_page_size=batch_size), chunk
+            )
+            if returning:
+                returned.extend(dict(row) for row in result.mappings())
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        if progress is not None:
+            progress(start + len(chunk), time.perf_counter() - started)
+    return returned
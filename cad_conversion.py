@@ -0,0 +1,100 @@
+"""
+CADファイル変換モジュール
+STL → GLB 変換処理とサムネイル・LOD生成（Streamlit UI・バックグラウンドジョブ・バッチ変換から共通利用）
+"""
+
+import os
+
+import trimesh
+
+from glb_writer import ENCODING_PLAIN, ENCODING_QUANTIZED, plain_glb_size, weld_mesh, write_geometry_glb, write_glb
+from model_lod import generate_lods
+from stl_reader import read_stl_triangles
+from thumbnails import ensure_thumbnail
+
+
+def _format_size(num_bytes):
+    return f"{num_bytes / 1024:,.0f} KB" if num_bytes < 1024 * 1024 else f"{num_bytes / 1024 / 1024:,.1f} MB"
+
+
+def convert_stl_to_glb(stl_path, glb_path, progress=None, encoding=ENCODING_QUANTIZED):
+    """
+    STLをGLBに変換（あわせてサムネイルと面数を減らしたLODを生成）
+
+    Args:
+        stl_path: 入力STLファイルのパス
+        glb_path: 出力GLBファイルのパス
+        progress: 進捗通知関数 progress(割合0〜1, メッセージ)（省略可）
+        encoding: 出力形式（quantized: 頂点結合・量子化、draco: Draco圧縮、plain: trimeshのまま）
+
+    戻り値: (成功/失敗のブール値, メッセージ)
+    """
+    def report(fraction, message):
+        if progress is not None:
+            progress(fraction, message)
+
+    try:
+        report(0.1, "STL読み込み中")
+        if encoding == ENCODING_PLAIN:
+            mesh = trimesh.load(stl_path)
+            report(0.4, "GLB書き出し中")
+            mesh.export(glb_path)
+            size_note = f"GLB {_format_size(os.path.getsize(glb_path))}"
+        else:
+            # バイナリSTLはメモリマップのまま結合処理に渡し、三角形データを複製しない
+            triangles = read_stl_triangles(stl_path)
+            report(0.2, "頂点結合・法線計算中")
+            geometry = weld_mesh(triangles)
+            del triangles
+            report(0.4, "GLB書き出し中")
+            write_geometry_glb(geometry, glb_path, encoding)
+            plain_size = plain_glb_size(len(geometry["welded_positions"]), len(geometry["welded_faces"]))
+            # LOD生成には位置だけで結合したメッシュを使う（法線による分割なし）
+            mesh = trimesh.Trimesh(
+                vertices=geometry["translation"] + geometry["welded_positions"] * geometry["scale"],
+                faces=geometry["welded_faces"],
+                process=False,
+            )
+            del geometry
+            # 最適化なしで書き出した場合のサイズ（三角形数から概算し、GLBを書き出して測らない）と比較して報告する
+            optimized_size = os.path.getsize(glb_path)
+            if optimized_size >= plain_size:
+                # 最適化しても小さくならないモデルは最適化なしで書き出す
+                mesh.export(glb_path)
+                size_note = (
+                    f"GLB {_format_size(os.path.getsize(glb_path))}（{encoding} では {_format_size(optimized_size)} "
+                    f"となり小さくならないため最適化なし、STL {_format_size(os.path.getsize(stl_path))}）"
+                )
+            else:
+                size_note = (
+                    f"GLB 約{_format_size(plain_size)} → {_format_size(optimized_size)}"
+                    f"（STL {_format_size(os.path.getsize(stl_path))}）"
+                )
+    except Exception as e:
+        return False, f"変換エラー: {str(e)}"
+
+    # LOD・サムネイルは表示を速くするための補助データのため、失敗しても変換自体は成功とする
+    lods = []
+    lod_note = ""
+    try:
+        lods = generate_lods(
+            mesh,
+            glb_path,
+            # LODは法線を書き出さず（折り目での頂点の分割をなくす）、ローダー側で求めさせる
+            writer=lambda lod_mesh, path: write_glb(lod_mesh, path, encoding, normals=False),
+            progress=lambda level, faces: report(0.4 + 0.2 * level, f"LOD{level}生成中（{faces:,} 面）"),
+        )
+        if lods:
+            lod_note = f"、LOD {len(lods)} 段階"
+    except Exception as e:
+        lod_note = f"、LOD生成スキップ: {str(e)}"
+
+    # サムネイルは最も粗いLODから描画（256pxでは見た目が変わらず、巨大モデルでもメモリを使わない）
+    report(0.9, "サムネイル生成中")
+    if lods:
+        ensure_thumbnail(glb_path, source_path=lods[-1][1])
+    else:
+        ensure_thumbnail(glb_path, triangles=mesh.triangles)
+
+    report(1.0, "変換成功")
+    return True, f"変換成功（{size_note}{lod_note}）"
@@ -0,0 +1,277 @@
+"""
+変換ジョブキューモジュール
+STL → GLB 変換をプロセスプールでバックグラウンド実行する
+- ジョブ状態はSQLiteに保存され、Streamlitを再起動しても未完了ジョブは再投入される
+- 変換中もUIはブロックされず、複数の変換がCPUコアをまたいで並列に進む
+- 同じ出力GLBへの変換が実行中なら新しいジョブは変換せず、その完了を待って結果を共有する
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import streamlit as st
+
+from cad_conversion import convert_stl_to_glb
+from file_database import save_to_database
+from glb_writer import ENCODING_QUANTIZED
+
+JOB_DB_FILE = Path("conversion_jobs.sqlite")
+MAX_WORKERS = int(os.environ.get("CONVERSION_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    original_name TEXT NOT NULL,
+    original_path TEXT NOT NULL,
+    glb_path TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    encoding TEXT,
+    source_sha256 TEXT,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    registered INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_glb_path ON jobs(glb_path);
+"""
+
+# 既存のジョブDBに後から追加した列（列名: 型）
+_ADDED_COLUMNS = {
+    "encoding": "TEXT",
+    "source_sha256": "TEXT",
+}
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _update_job(db_path, job_id, **fields):
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with closing(_connect(db_path)) as conn, conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def run_conversion_job(db_path, job_id, original_path, glb_path, encoding=ENCODING_QUANTIZED):
+    """
+    ワーカープロセスで実行される変換処理（進捗はジョブDBに直接書き込む）
+
+    Args:
+        db_path: ジョブDBのパス
+        job_id: ジョブID
+        original_path: 入力STLファイルのパス
+        glb_path: 出力GLBファイルのパス
+        encoding: GLBの出力形式
+
+    戻り値: (成功/失敗のブール値, メッセージ)
+    """
+    _update_job(db_path, job_id, status=STATUS_RUNNING, started_at=time.time(), progress=0.0)
+
+    def progress(fraction, message):
+        _update_job(db_path, job_id, progress=fraction, message=message)
+
+    success, message = convert_stl_to_glb(original_path, glb_path, progress=progress, encoding=encoding)
+    _update_job(
+        db_path,
+        job_id,
+        status=STATUS_DONE if success else STATUS_ERROR,
+        progress=1.0 if success else 0.0,
+        message=message,
+        finished_at=time.time(),
+    )
+    return success, message
+
+
+class ConversionJobQueue:
+    """
+    プロセスプールを使った変換ジョブキュー
+
+    Args:
+        db_path: ジョブ状態を保存するSQLiteファイル
+        max_workers: 並列変換数
+    """
+
+    def __init__(self, db_path=JOB_DB_FILE, max_workers=MAX_WORKERS):
+        self.db_path = Path(db_path)
+        # Streamlitはマルチスレッドのためforkではなくspawnでワーカーを起動
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._register_lock = threading.Lock()
+        # 投入と完了時の結果共有が行き違わないよう直列化（完了済みFutureのコールバックは同じスレッドで動くためRLock）
+        self._submit_lock = threading.RLock()
+        with closing(_connect(self.db_path)) as conn:
+            conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._recover()
+
+    def _recover(self):
+        """前回のプロセスで未完了だったジョブを再投入し、完了済みの未登録分を登録"""
+        with closing(_connect(self.db_path)) as conn:
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, progress = 0, message = '再投入' WHERE status = ?",
+                    (STATUS_QUEUED, STATUS_RUNNING),
+                )
+            queued = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at", (STATUS_QUEUED,)
+            ).fetchall()
+            finished = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND registered = 0", (STATUS_DONE,)
+            ).fetchall()
+
+        dispatched = set()
+        for job in queued:
+            # 同じ出力先のジョブは最初の1件だけ変換し、残りはその完了時に結果を共有
+            if job["glb_path"] in dispatched:
+                continue
+            dispatched.add(job["glb_path"])
+            self._dispatch(job["id"], job["original_path"], job["glb_path"], job["encoding"] or ENCODING_QUANTIZED)
+        for job in finished:
+            self._register(job["id"])
+
+    def _dispatch(self, job_id, original_path, glb_path, encoding):
+        future = self._executor.submit(
+            run_conversion_job, str(self.db_path), job_id, original_path, glb_path, encoding
+        )
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+
+    def _on_done(self, job_id, future):
+        exc = future.exception()
+        if exc is not None:
+            # ワーカープロセス自体の異常終了など
+            _update_job(
+                self.db_path,
+                job_id,
+                status=STATUS_ERROR,
+                message=f"変換エラー: {str(exc)}",
+                finished_at=time.time(),
+            )
+        else:
+            self._register(job_id)
+        self._finish_waiting(job_id)
+
+    def _finish_waiting(self, job_id):
+        """同じ出力GLBの完了を待っていたジョブに結果を反映"""
+        job = self.get(job_id)
+        with self._submit_lock:
+            with closing(_connect(self.db_path)) as conn:
+                waiting = conn.execute(
+                    "SELECT id FROM jobs WHERE glb_path = ? AND status = ? AND id != ?",
+                    (job["glb_path"], STATUS_QUEUED, job_id),
+                ).fetchall()
+            for row in waiting:
+                _update_job(
+                    self.db_path,
+                    row["id"],
+                    status=job["status"],
+                    progress=job["progress"],
+                    message=job["message"],
+                    finished_at=time.time(),
+                )
+                self._register(row["id"])
+
+    def _register(self, job_id):
+        """完了ジョブをファイルデータベースに登録（1ジョブにつき1回のみ）"""
+        with self._register_lock:
+            job = self.get(job_id)
+            if job is None or job["status"] != STATUS_DONE or job["registered"]:
+                return
+            save_to_database({
+                "id": job["id"],
+                "original_name": job["original_name"],
+                "original_path": job["original_path"],
+                "glb_path": job["glb_path"],
+                "file_type": job["file_type"],
+                "encoding": job["encoding"] or ENCODING_QUANTIZED,
+                "upload_date": datetime.fromtimestamp(job["created_at"]).isoformat(),
+                "source_sha256": job["source_sha256"],
+            })
+            _update_job(self.db_path, job_id, registered=1)
+
+    def submit(self, original_name, original_path, glb_path, file_type="stl", encoding=ENCODING_QUANTIZED,
+               source_sha256=None):
+        """
+        変換ジョブを登録して実行待ちに入れる
+
+        Args:
+            original_name: アップロード時のファイル名
+            original_path: 保存済み元ファイルのパス
+            glb_path: 出力GLBファイルのパス
+            file_type: 元ファイルの形式
+            encoding: GLBの出力形式（quantized / draco / plain）
+            source_sha256: 元ファイルのSHA-256（ファイルデータベースに記録）
+
+        戻り値: ジョブID
+        """
+        job_id = uuid.uuid4().hex
+        with self._submit_lock, closing(_connect(self.db_path)) as conn:
+            with conn:
+                running = conn.execute(
+                    "SELECT id FROM jobs WHERE glb_path = ? AND status IN (?, ?) LIMIT 1",
+                    (str(glb_path), *ACTIVE_STATUSES),
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO jobs (id, original_name, original_path, glb_path, file_type, encoding, "
+                    "source_sha256, status, progress, message, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                    (job_id, original_name, str(original_path), str(glb_path), file_type, encoding,
+                     source_sha256, STATUS_QUEUED, "同じファイルの変換待ち" if running else "待機中", time.time()),
+                )
+            if running is None:
+                self._dispatch(job_id, str(original_path), str(glb_path), encoding)
+        return job_id
+
+    def get(self, job_id):
+        """ジョブ情報を取得（見つからなければNone）"""
+        with closing(_connect(self.db_path)) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, limit=50):
+        """新しい順にジョブ一覧を取得"""
+        with closing(_connect(self.db_path)) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def active_count(self):
+        """待機中・実行中のジョブ数"""
+        with closing(_connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ).fetchone()
+        return row["n"]
+
+
+@st.cache_resource
+def get_conversion_queue():
+    """プロセス共通の変換ジョブキューを取得（初回に未完了ジョブを再投入）"""
+    return ConversionJobQueue()
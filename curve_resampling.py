@@ -0,0 +1,226 @@
+"""
+曲線リサンプリングモジュール
+曲線ストアの全試験の曲線を、共通の風量（Q）軸上の値に一括で補間する
+- 線形補間と単調3次補間（PCHIP、Fritsch–Carlson法。測定点の間で行き過ぎ・振動しない）
+- 点数の異なる曲線もまとめて処理し、試験ごとのループは行わない
+- 測定点はQの昇順に並べ替え、同じQの点は平均する（Qが単調でない測定値にも対応）
+- 各試験の測定範囲の外は補間しない（NaN）
+- 共通の軸だけでなく、試験ごとに異なる横軸の値（動作点の風量など）でも補間できる
+- 結果は（曲線ストアの内容, 軸, 指標, 補間方法）ごとにキャッシュし、重ね描き・差分・統計で共有する
+"""
+
+import numpy as np
+import streamlit as st
+
+# 補間方法
+METHOD_LINEAR = "linear"
+METHOD_PCHIP = "pchip"
+METHODS = (METHOD_LINEAR, METHOD_PCHIP)
+
+DEFAULT_X_METRIC = "Q_[m3min]"
+DEFAULT_Y_METRIC = "Ps_[Pa]"
+DEFAULT_GRID_POINTS = 100
+
+
+def prepare_segments(store, x_metric=DEFAULT_X_METRIC, y_metric=DEFAULT_Y_METRIC):
+    """
+    補間用に曲線を整理（xの昇順に並べ替え、欠損値を除き、同じxの点を平均）
+
+    xとyの点数が異なる試験は、短い方の点数までを使う
+
+    Args:
+        store: CurveStore
+        x_metric: 横軸の指標
+        y_metric: 縦軸の指標
+
+    戻り値: 辞書
+        x, y: 全試験分を連結した点（試験ごとにxの昇順）
+        test: 各点の試験番号（storeの並び順）
+        starts, counts: 試験ごとの先頭位置と点数
+    """
+    test_count = len(store)
+    x_offsets = store.offsets[x_metric]
+    y_offsets = store.offsets[y_metric]
+    counts = np.minimum(np.diff(x_offsets), np.diff(y_offsets))
+
+    test = np.repeat(np.arange(test_count), counts)
+    local = np.arange(len(test)) - np.repeat(np.cumsum(counts) - counts, counts)
+    x = store.values[x_metric][x_offsets[:-1][test] + local]
+    y = store.values[y_metric][y_offsets[:-1][test] + local]
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    test, x, y = test[finite], x[finite], y[finite]
+    order = np.lexsort((x, test))
+    test, x, y = test[order], x[order], y[order]
+
+    # 同じ試験・同じxの点は平均して1点にする
+    if len(x):
+        first = np.r_[True, (test[1:] != test[:-1]) | (x[1:] != x[:-1])]
+        group_start = np.flatnonzero(first)
+        group_size = np.diff(np.r_[group_start, len(x)])
+        y = np.add.reduceat(y, group_start) / group_size
+        test, x = test[group_start], x[group_start]
+
+    counts = np.bincount(test, minlength=test_count)
+    starts = np.cumsum(counts) - counts
+    return {"x": x, "y": y, "test": test, "starts": starts, "counts": counts}
+
+
+def _pchip_slopes(segments):
+    """各点の接線の傾き（Fritsch–Carlson法。端点は形状を保つ3点公式）"""
+    x, y, test = segments["x"], segments["y"], segments["test"]
+    slopes = np.zeros(len(x))
+    if len(x) < 2:
+        return slopes
+
+    h = np.diff(x)
+    same_test = test[1:] == test[:-1]
+    delta = np.zeros(len(h))
+    np.divide(np.diff(y), h, out=delta, where=same_test)
+
+    # 内部の点: 両隣の区間の傾きの重み付き調和平均（符号が変わる点・平らな区間の隣は0）
+    interior = np.flatnonzero(np.r_[False, same_test] & np.r_[same_test, False])
+    prev_delta, next_delta = delta[interior - 1], delta[interior]
+    prev_h, next_h = h[interior - 1], h[interior]
+    w1 = 2 * next_h + prev_h
+    w2 = next_h + 2 * prev_h
+    monotone = prev_delta * next_delta > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = (w1 + w2) / (w1 / prev_delta + w2 / next_delta)
+    slopes[interior] = np.where(monotone, harmonic, 0.0)
+
+    # 端点: 2点だけの曲線は直線、3点以上は端の2区間から推定して形状を保つよう制限
+    starts, counts = segments["starts"], segments["counts"]
+    two = counts == 2
+    slopes[starts[two]] = delta[starts[two]]
+    slopes[starts[two] + 1] = delta[starts[two]]
+
+    many = counts >= 3
+    first = starts[many]
+    last = first + counts[many] - 1
+    for point, near, far in ((first, first, first + 1), (last, last - 1, last - 2)):
+        h0, h1 = h[near], h[far]
+        d0, d1 = delta[near], delta[far]
+        slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        slope = np.where(np.sign(slope) != np.sign(d0), 0.0, slope)
+        overshoot = (np.sign(d0) != np.sign(d1)) & (np.abs(slope) > 3 * np.abs(d0))
+        slopes[point] = np.where(overshoot, 3 * d0, slope)
+    return slopes
+
+
+def interpolate(segments, queries, method=METHOD_LINEAR):
+    """
+    試験ごとに異なる横軸の値で一括補間
+
+    Args:
+        segments: prepare_segments の戻り値
+        queries: (試験数, 問い合わせ数) の横軸の値（NaNは補間しない）
+        method: 補間方法（linear / pchip）
+
+    戻り値: (試験数, 問い合わせ数) のfloat64配列（測定範囲外・点数2未満の試験はNaN）
+    """
+    if method not in METHODS:
+        raise ValueError(f"未対応の補間方法です: {method}")
+    counts = segments["counts"]
+    queries = np.asarray(queries, dtype=np.float64)
+    result = np.full(queries.shape, np.nan)
+
+    tests = np.flatnonzero(counts >= 2)
+    if len(tests) == 0 or queries.shape[1] == 0:
+        return result
+    queries = queries[tests]
+
+    x, y = segments["x"], segments["y"]
+    start = segments["starts"][tests]
+    end = start + counts[tests] - 1
+    x_lo, x_hi = x[start], x[end]
+    span = x_hi - x_lo
+
+    # 試験番号＋試験内で正規化したx（0〜0.5）を全体で単調なキーにし、1回の二分探索で区間を求める
+    # （点が1つだけの試験のキーは試験番号そのもの。問い合わせ対象にならないので単調性だけ保てばよい）
+    test_lo = np.zeros(len(counts))
+    test_span = np.ones(len(counts))
+    test_lo[tests] = x_lo
+    test_span[tests] = span
+    point_test = segments["test"]
+    keys = point_test + np.clip((x - test_lo[point_test]) / test_span[point_test], 0.0, 1.0) * 0.5
+
+    normalized = np.clip((queries - x_lo[:, None]) / span[:, None], 0.0, 1.0)
+    left = np.searchsorted(keys, tests[:, None] + normalized * 0.5, side="right") - 1
+    left = np.clip(left, start[:, None], end[:, None] - 1)
+
+    x0, x1 = x[left], x[left + 1]
+    y0, y1 = y[left], y[left + 1]
+    h = x1 - x0
+    t = np.clip((queries - x0) / h, 0.0, 1.0)
+
+    if method == METHOD_LINEAR:
+        values = y0 + t * (y1 - y0)
+    else:
+        slopes = _pchip_slopes(segments)
+        t2 = t * t
+        t3 = t2 * t
+        values = (
+            (2 * t3 - 3 * t2 + 1) * y0
+            + (t3 - 2 * t2 + t) * h * slopes[left]
+            + (-2 * t3 + 3 * t2) * y1
+            + (t3 - t2) * h * slopes[left + 1]
+        )
+
+    inside = (queries >= x_lo[:, None]) & (queries <= x_hi[:, None])
+    result[tests] = np.where(inside, values, np.nan)
+    return result
+
+
+def resample(store, grid, x_metric=DEFAULT_X_METRIC, y_metric=DEFAULT_Y_METRIC, method=METHOD_LINEAR):
+    """
+    全試験の曲線を共通の軸上に一括補間
+
+    Args:
+        store: CurveStore
+        grid: 共通の軸（横軸の値の昇順配列）
+        x_metric: 横軸の指標
+        y_metric: 縦軸の指標
+        method: 補間方法（linear / pchip）
+
+    戻り値: (試験数, 軸の点数) のfloat64配列（storeの並び順。測定範囲外・点数2未満の試験はNaN）
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    segments = prepare_segments(store, x_metric, y_metric)
+    return interpolate(segments, np.broadcast_to(grid, (len(store), len(grid))), method)
+
+
+def flow_grid(store, points=DEFAULT_GRID_POINTS, x_metric=DEFAULT_X_METRIC):
+    """
+    全試験の測定範囲を覆う等間隔の軸
+
+    Args:
+        store: CurveStore
+        points: 軸の点数
+        x_metric: 横軸の指標
+
+    戻り値: 軸の配列（測定値がなければ空配列）
+    """
+    values = store.values[x_metric]
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.empty(0)
+    return np.linspace(values.min(), values.max(), points)
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _resample_cached(_store, store_key, grid_bytes, x_metric, y_metric, method):
+    result = resample(_store, np.frombuffer(grid_bytes), x_metric, y_metric, method)
+    # 全セッションで共有するため書き換え不可にする
+    result.flags.writeable = False
+    return result
+
+
+def resample_cached(store, grid, x_metric=DEFAULT_X_METRIC, y_metric=DEFAULT_Y_METRIC, method=METHOD_LINEAR):
+    """
+    resample の結果を（曲線ストアの内容, 軸, 指標, 補間方法）ごとにキャッシュして取得
+
+    戻り値: (試験数, 軸の点数) の読み取り専用float64配列
+    """
+    grid = np.ascontiguousarray(grid, dtype=np.float64)
+    return _resample_cached(store, store.key, grid.tobytes(), x_metric, y_metric, method)
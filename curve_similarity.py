@@ -0,0 +1,224 @@
+"""
+曲線類似検索モジュール
+試験の曲線を固定長のベクトルに変換し、指定した試験に特性が近い試験を全試験から検索する
+- 静圧（必要に応じて電力・騒音）を共通の風量軸に補間し、指標ごとの尺度でそろえて連結したベクトルにする
+- 各試験の測定範囲外の点はマスクし、距離は2試験で共通の測定範囲の点だけで求めた二乗平均平方根
+- 全試験との距離を行列ベクトル積（BLAS）数回で求め、上位の候補だけを部分ソートで取り出して距離を計算し直す
+- 索引はプロセス全体で共有し、データが変わったときは追加・変更された試験のベクトルだけを計算して更新する
+  （風量軸・尺度が変わるほどデータの範囲が動いた場合は作り直す）
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from curve_resampling import DEFAULT_X_METRIC, flow_grid, resample
+
+SIMILARITY_METRICS = ("Ps_[Pa]", "Power_[W]", "SPL_[dbA]")
+DEFAULT_METRICS = ("Ps_[Pa]",)
+# ベクトル化に使う風量軸の点数
+VECTOR_GRID_POINTS = 32
+# 基準の試験の測定点のうち、この割合以上を共有する試験だけを比較する
+MIN_SHARED_FRACTION = 0.5
+# 距離を直接計算し直す候補数（取得件数の倍数・最低限の追加数）
+REFINE_FACTOR = 4
+REFINE_MIN_EXTRA = 32
+# 差分更新で尺度がこの割合を超えて変わった場合は索引を作り直す
+SCALE_TOLERANCE = 0.1
+
+
+class CurveIndex:
+    """
+    試験の曲線ベクトルの索引（総当たりの最近傍検索）
+
+    Args:
+        test_ids: 試験IDの配列
+        vectors: (試験数, 次元) のfloat32配列（測定範囲外は0）
+        mask: vectors と同じ形の測定範囲内かどうか（1/0のfloat32配列）
+        grid: ベクトル化に使った風量軸
+        metrics: ベクトル化した指標
+        scales: 指標ごとの尺度（値をこの値で割ってからベクトルにする）
+        row_keys: 試験ごとの曲線の内容のキー（CurveStore.row_keys）
+        store_key: 作成元の曲線ストアのキー
+    """
+
+    def __init__(self, test_ids, vectors, mask, grid, metrics, scales, row_keys, store_key=None):
+        self.test_ids = np.asarray(test_ids, dtype=object)
+        self.vectors = vectors
+        self.mask = mask
+        self.squares = vectors * vectors
+        self.grid = grid
+        self.metrics = tuple(metrics)
+        self.scales = scales
+        self.row_keys = row_keys
+        self.store_key = store_key
+        self._positions = {test_id: i for i, test_id in enumerate(self.test_ids)}
+
+    @staticmethod
+    def _key_metrics(metrics):
+        """試験の変更の判定に使う指標（風量軸とベクトル化する指標）"""
+        return tuple(dict.fromkeys((DEFAULT_X_METRIC,) + tuple(metrics)))
+
+    @staticmethod
+    def _scales(store, metrics):
+        """指標ごとの代表的な大きさ（外れ値の影響を受けないよう95パーセンタイル）"""
+        scales = {}
+        for metric in metrics:
+            values = np.abs(store.values[metric][np.isfinite(store.values[metric])])
+            scale = float(np.percentile(values, 95)) if len(values) else 1.0
+            scales[metric] = scale if scale > 0 else 1.0
+        return scales
+
+    @staticmethod
+    def _vectorize(store, grid, metrics, scales):
+        """
+        曲線ストアの全試験をベクトルに変換
+
+        戻り値: (ベクトル, マスク)（測定範囲外の点はベクトルを0、マスクを0にする）
+        """
+        blocks = []
+        for metric in metrics:
+            blocks.append(resample(store, grid, y_metric=metric) / scales[metric])
+        if not blocks:
+            empty = np.empty((len(store), 0), dtype=np.float32)
+            return empty, empty
+        values = np.hstack(blocks)
+        measured = np.isfinite(values)
+        return np.where(measured, values, 0.0).astype(np.float32), measured.astype(np.float32)
+
+    @classmethod
+    def build(cls, store, metrics=DEFAULT_METRICS, points=VECTOR_GRID_POINTS):
+        """
+        曲線ストアの全試験から索引を作成
+
+        Args:
+            store: CurveStore
+            metrics: ベクトル化する指標
+            points: 風量軸の点数
+
+        戻り値: CurveIndex
+        """
+        grid = flow_grid(store, points)
+        scales = cls._scales(store, metrics)
+        vectors, mask = cls._vectorize(store, grid, metrics, scales)
+        return cls(
+            store.test_ids, vectors, mask, grid, metrics, scales, store.row_keys(cls._key_metrics(metrics)), store.key
+        )
+
+    def update(self, store):
+        """
+        曲線ストアの変更を反映した索引を作成（内容が同じ試験のベクトルは再利用し、追加・変更分だけ計算）
+
+        削除された試験は除く。データの範囲が動いて風量軸が変わる場合・尺度が SCALE_TOLERANCE を超えて
+        変わる場合は、全試験から作り直す（異なる軸・尺度のベクトルを混ぜない）
+
+        戻り値: CurveIndex（store と同じ並び順）
+        """
+        grid = flow_grid(store, len(self.grid))
+        scales = self._scales(store, self.metrics)
+        if not np.array_equal(grid, self.grid) or any(
+            abs(scales[metric] / self.scales[metric] - 1.0) > SCALE_TOLERANCE for metric in self.metrics
+        ):
+            return CurveIndex.build(store, self.metrics, len(self.grid))
+
+        row_keys = store.row_keys(self._key_metrics(self.metrics))
+        existing = np.fromiter(
+            (self._positions.get(test_id, -1) for test_id in store.test_ids), dtype=np.int64, count=len(store)
+        )
+        kept = existing >= 0
+        kept[kept] = self.row_keys[existing[kept]] == row_keys[kept]
+        vectors = np.empty((len(store), self.vectors.shape[1]), dtype=np.float32)
+        mask = np.empty_like(vectors)
+        vectors[kept] = self.vectors[existing[kept]]
+        mask[kept] = self.mask[existing[kept]]
+        if not kept.all():
+            changed = store.subset(store.test_ids[~kept])
+            vectors[~kept], mask[~kept] = self._vectorize(changed, self.grid, self.metrics, self.scales)
+        return CurveIndex(store.test_ids, vectors, mask, self.grid, self.metrics, self.scales, row_keys, store.key)
+
+    def __len__(self):
+        return len(self.test_ids)
+
+    def __contains__(self, test_id):
+        return str(test_id) in self._positions
+
+    def query(self, test_id, k=10):
+        """
+        指定した試験に近い試験を検索
+
+        距離は共通の測定範囲の点での差の二乗平均平方根。基準の試験の測定点の MIN_SHARED_FRACTION 以上を
+        共有しない試験は対象外
+
+        Args:
+            test_id: 基準の試験ID
+            k: 取得件数（基準の試験自身は含まない）
+
+        戻り値: DataFrame（fantestdataID, distance。距離の昇順）
+        """
+        position = self._positions.get(str(test_id))
+        if position is None:
+            raise KeyError(f"索引にない試験です: {test_id}")
+        vector = self.vectors[position]
+        mask = self.mask[position]
+        # 共通の点だけの Σ(x - q)² = Σ m_q·x² + Σ m_x·q² - 2Σ x·q（x・q は範囲外が0。行列ベクトル積3回で全試験分）
+        shared = self.mask @ mask
+        squared = self.squares @ mask + self.mask @ (vector * vector) - 2.0 * (self.vectors @ vector)
+        comparable = shared >= max(1.0, MIN_SHARED_FRACTION * float(mask.sum()))
+        comparable[position] = False
+        distances = np.full(len(self), np.inf)
+        distances[comparable] = np.maximum(squared[comparable], 0.0) / shared[comparable]
+        k = min(k, int(comparable.sum()))
+        if k <= 0:
+            return pd.DataFrame({"fantestdataID": [], "distance": []})
+        # 展開式はfloat32の桁落ちで近い試験どうしの順位が入れ替わりうるため、多めに取った候補だけ直接計算し直す
+        candidates = min(int(comparable.sum()), max(REFINE_FACTOR * k, k + REFINE_MIN_EXTRA))
+        nearest = np.argpartition(distances, candidates - 1)[:candidates]
+        both = self.mask[nearest] * mask
+        difference = (self.vectors[nearest].astype(np.float64) - vector) * both
+        distances = np.einsum("ij,ij->i", difference, difference) / both.sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return pd.DataFrame({
+            "fantestdataID": self.test_ids[nearest[order]],
+            "distance": np.sqrt(distances[order]),
+        })
+
+
+class SimilarityIndexCache:
+    """曲線ストアの版に追従する類似検索索引（指標の組み合わせごとに1つ保持）"""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, store, metrics=DEFAULT_METRICS):
+        """
+        曲線ストアに対応する索引を取得（ストアが変わっていれば差分だけ更新）
+
+        Args:
+            store: CurveStore（全試験）
+            metrics: ベクトル化する指標
+
+        戻り値: CurveIndex
+        """
+        metrics = tuple(metrics)
+        with self._lock:
+            index = self._indexes.get(metrics)
+            if index is None:
+                index = CurveIndex.build(store, metrics)
+            elif index.store_key != store.key:
+                index = index.update(store)
+            self._indexes[metrics] = index
+            return index
+
+    def clear(self):
+        """索引を破棄（次回は全試験から作り直す）"""
+        with self._lock:
+            self._indexes.clear()
+
+
+@st.cache_resource
+def get_similarity_index_cache():
+    """プロセス共通の類似検索索引を取得"""
+    return SimilarityIndexCache()
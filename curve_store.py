@@ -0,0 +1,209 @@
+"""
+曲線ストアモジュール
+試験ごとの曲線（風量・静圧・トルク・電力・騒音の配列）を指標ごとに列指向で保持する
+- 指標ごとに全試験の値を1本のfloat64配列に連結し、試験ごとの区切り位置（offsets）を持つ（長さの異なる曲線をそのまま保持）
+- jsonb文字列の解析は作成時に1回だけ行い、プロット・統計・解析は配列のスライスで済ませる
+- DBには依存しない（取得は fan_test_data.py）
+"""
+
+import hashlib
+import json
+from itertools import chain
+
+import numpy as np
+
+
+def parse_curve(value):
+    """jsonb配列（文字列またはリスト）をfloat64配列に変換（値がない・解析できない場合は空配列）"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return np.empty(0)
+    try:
+        if isinstance(value, (str, bytes)):
+            value = json.loads(value)
+        return np.asarray(value, dtype=np.float64).reshape(-1)
+    except (ValueError, TypeError):
+        return np.empty(0)
+
+
+def _flatten(values):
+    """
+    1指標分の値（jsonb文字列・リスト・None）を連結配列と区切り位置に変換
+
+    文字列は1つのJSON配列にまとめて1回で解析し、解析できない値があれば1件ずつの解析に切り替える
+    """
+    values = list(values)
+    text_positions = [i for i, value in enumerate(values) if isinstance(value, (str, bytes))]
+    if text_positions:
+        texts = [values[i].decode() if isinstance(values[i], bytes) else values[i] for i in text_positions]
+        try:
+            for i, parsed in zip(text_positions, json.loads("[" + ",".join(texts) + "]")):
+                values[i] = parsed
+        except ValueError:
+            for i in text_positions:
+                values[i] = parse_curve(values[i])
+
+    lists = [value if isinstance(value, (list, tuple, np.ndarray)) else () for value in values]
+    lengths = np.fromiter((len(value) for value in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    try:
+        flat = np.fromiter(chain.from_iterable(lists), dtype=np.float64, count=int(offsets[-1]))
+    except (ValueError, TypeError):
+        # 数値以外の要素（null など）を含む場合は1件ずつ変換（nullはNaN）
+        return _flatten([parse_curve(list(value)) for value in lists])
+    return flat, offsets
+
+
+class CurveStore:
+    """
+    試験ごとの曲線を指標ごとに連結配列＋区切り位置で保持
+
+    Args:
+        test_ids: 試験IDの配列（並び順が各指標の区切りの順序）
+        values: {指標: 全試験分を連結したfloat64配列}
+        offsets: {指標: 区切り位置 int64配列（長さ 試験数+1）}
+    """
+
+    def __init__(self, test_ids, values, offsets):
+        self.test_ids = np.asarray([str(test_id) for test_id in test_ids], dtype=object)
+        self.values = values
+        self.offsets = offsets
+        self._positions = {test_id: i for i, test_id in enumerate(self.test_ids)}
+        self._key = None
+
+    @classmethod
+    def from_frame(cls, frame, id_column, metrics):
+        """
+        試験ID列と曲線列を持つDataFrameから作成
+
+        Args:
+            frame: DataFrame（曲線列はjsonb文字列またはリスト）
+            id_column: 試験IDの列名
+            metrics: 曲線の列名
+
+        戻り値: CurveStore
+        """
+        values = {}
+        offsets = {}
+        for metric in metrics:
+            column = frame[metric] if metric in frame.columns else [None] * len(frame)
+            values[metric], offsets[metric] = _flatten(column)
+        return cls(frame[id_column].tolist(), values, offsets)
+
+    @classmethod
+    def from_curves(cls, test_ids, curves, metrics):
+        """
+        試験ごとの {指標: 配列} 辞書のリストから作成
+
+        Args:
+            test_ids: 試験IDのリスト
+            curves: test_idsと同じ順の {指標: float64配列} のリスト
+            metrics: 曲線の列名
+
+        戻り値: CurveStore
+        """
+        values = {}
+        offsets = {}
+        for metric in metrics:
+            arrays = [curve[metric] for curve in curves]
+            offsets[metric] = np.zeros(len(arrays) + 1, dtype=np.int64)
+            np.cumsum([len(array) for array in arrays], out=offsets[metric][1:])
+            values[metric] = np.concatenate(arrays) if arrays else np.empty(0)
+        return cls(test_ids, values, offsets)
+
+    def __len__(self):
+        return len(self.test_ids)
+
+    def __contains__(self, test_id):
+        return str(test_id) in self._positions
+
+    @property
+    def metrics(self):
+        return tuple(self.values)
+
+    @property
+    def nbytes(self):
+        """保持している配列の合計バイト数"""
+        return sum(array.nbytes for array in self.values.values()) + sum(
+            array.nbytes for array in self.offsets.values()
+        )
+
+    @property
+    def key(self):
+        """内容から求めたキー（試験ID・値・区切り位置のハッシュ。キャッシュのキーに使う）"""
+        if self._key is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update("\0".join(self.test_ids).encode())
+            for metric in self.metrics:
+                digest.update(metric.encode())
+                digest.update(np.ascontiguousarray(self.values[metric]).tobytes())
+                digest.update(np.ascontiguousarray(self.offsets[metric]).tobytes())
+            self._key = digest.hexdigest()
+        return self._key
+
+    def row_keys(self, metrics=None):
+        """
+        試験ごとの内容のキー（指定した指標の値のハッシュ。差分更新で変わった試験を見つけるのに使う）
+
+        Args:
+            metrics: 対象の指標（Noneなら全指標）
+
+        戻り値: 試験ごとのキー（16進文字列）の配列（store と同じ並び順）
+        """
+        metrics = self.metrics if metrics is None else tuple(metrics)
+        keys = np.empty(len(self), dtype=object)
+        for position in range(len(self)):
+            digest = hashlib.blake2b(digest_size=16)
+            for metric in metrics:
+                offsets = self.offsets[metric]
+                digest.update(np.int64(offsets[position + 1] - offsets[position]).tobytes())
+                digest.update(self.values[metric][offsets[position]:offsets[position + 1]].tobytes())
+            keys[position] = digest.hexdigest()
+        return keys
+
+    def position(self, test_id):
+        """試験IDの位置（見つからなければNone）"""
+        return self._positions.get(str(test_id))
+
+    def positions(self, test_ids):
+        """複数の試験IDの位置（見つからない試験は-1）"""
+        return np.fromiter(
+            (self._positions.get(str(test_id), -1) for test_id in test_ids), dtype=np.int64, count=len(test_ids)
+        )
+
+    def curve(self, metric, test_id):
+        """1試験分の曲線（連結配列のビュー。見つからなければ空配列）"""
+        position = self.position(test_id)
+        if position is None:
+            return np.empty(0)
+        offsets = self.offsets[metric]
+        return self.values[metric][offsets[position]:offsets[position + 1]]
+
+    def lengths(self, metric):
+        """試験ごとの点数"""
+        return np.diff(self.offsets[metric])
+
+    def reduce(self, metric, ufunc, empty=np.nan):
+        """
+        試験ごとの集計値（例: np.fmax で最大値）を一括計算
+
+        Args:
+            metric: 指標
+            ufunc: 二項ufunc（np.fmax, np.fmin, np.add など。fmax・fminはNaNを無視する）
+            empty: 点数0の試験の値
+
+        戻り値: 試験ごとの値 float64配列
+        """
+        offsets = self.offsets[metric]
+        result = np.full(len(self), empty, dtype=np.float64)
+        nonempty = offsets[1:] > offsets[:-1]
+        if nonempty.any():
+            result[nonempty] = ufunc.reduceat(self.values[metric], offsets[:-1][nonempty])
+        return result
+
+    def subset(self, test_ids):
+        """指定した試験だけのストア（存在しない試験は除く）"""
+        keys = [str(test_id) for test_id in test_ids if str(test_id) in self._positions]
+        return CurveStore.from_curves(
+            keys, [{metric: self.curve(metric, key) for metric in self.metrics} for key in keys], self.metrics
+        )
@@ -0,0 +1,186 @@
+"""
+相似則による正規化モジュール
+測定条件（空気温度・羽根径・回転数）の異なる試験の曲線を、基準条件での値に一括換算する
+- 空気密度は吸込温度から理想気体として求める（標準大気圧）
+- 相似則: Q ∝ N·D³、Ps ∝ ρ·N²·D²、トルク ∝ ρ·N²·D⁵、電力 ∝ ρ·N³·D⁵、騒音 +50·log(N比)+70·log(D比)+20·log(ρ比)
+- 回転数は電力とトルクから求める（N = 電力 / トルク。測定点ごとの値の中央値）
+- 試験ごとの係数を全試験分まとめて計算し、連結配列に一括で掛ける
+- 結果は（曲線ストアの内容, 測定条件, 基準条件）ごとにキャッシュする
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from curve_store import CurveStore
+
+GAS_CONSTANT_AIR = 287.05  # J/(kg·K)
+STANDARD_PRESSURE = 101325.0  # Pa
+STANDARD_TEMPERATURE = 20.0  # °C
+
+# 試験データの温度列（吸込温度を優先し、なければ吐出温度）
+TEMPERATURE_COLUMNS = ("temp_c_[defC]", "temp_o_[degC]")
+
+# 基準条件の既定値（None の項目は換算しない）
+DEFAULT_REFERENCE = {
+    "temperature": STANDARD_TEMPERATURE,  # °C
+    "diameter": None,  # mm
+    "speed": None,  # rpm
+}
+
+
+def air_density(temperature, pressure=STANDARD_PRESSURE):
+    """空気密度 [kg/m³]（温度 [°C] の配列に対応）"""
+    return pressure / (GAS_CONSTANT_AIR * (np.asarray(temperature, dtype=np.float64) + 273.15))
+
+
+def test_speed(store):
+    """
+    試験ごとの回転数 [rpm]（電力 [W] / トルク [mNm] から求めた測定点ごとの値の中央値）
+
+    戻り値: 試験ごとの回転数 float64配列（求められない試験はNaN）
+    """
+    if "Power_[W]" not in store.metrics or "Torque_[mNm]" not in store.metrics:
+        return np.full(len(store), np.nan)
+    power_offsets = store.offsets["Power_[W]"]
+    torque_offsets = store.offsets["Torque_[mNm]"]
+    counts = np.minimum(np.diff(power_offsets), np.diff(torque_offsets))
+    test = np.repeat(np.arange(len(store)), counts)
+    local = np.arange(len(test)) - np.repeat(np.cumsum(counts) - counts, counts)
+    power = store.values["Power_[W]"][power_offsets[:-1][test] + local]
+    torque = store.values["Torque_[mNm]"][torque_offsets[:-1][test] + local]
+
+    valid = np.isfinite(power) & np.isfinite(torque) & (torque > 0) & (power > 0)
+    speed = power[valid] / (torque[valid] / 1000.0) * 60.0 / (2 * np.pi)
+    test = test[valid]
+
+    # 試験ごとの中央値（試験・値の順に並べ、中央の1点または2点の平均）
+    order = np.lexsort((speed, test))
+    speed = speed[order]
+    counts = np.bincount(test, minlength=len(store))
+    starts = np.cumsum(counts) - counts
+    result = np.full(len(store), np.nan)
+    has_points = counts > 0
+    low = starts[has_points] + (counts[has_points] - 1) // 2
+    high = starts[has_points] + counts[has_points] // 2
+    result[has_points] = (speed[low] + speed[high]) / 2
+    return result
+
+
+def align_conditions(store, frame, diameters=None):
+    """
+    試験データのメタデータから、ストアの並び順の測定条件を作成
+
+    Args:
+        store: CurveStore
+        frame: 試験ID（fantestdataID）・温度列・fanIDを持つDataFrame
+        diameters: {fanID(文字列): 羽根径 [mm]}（Noneなら羽根径なし）
+
+    戻り値: {"temperature": 温度 [°C], "diameter": 羽根径 [mm], "speed": 回転数 [rpm]}（各float64配列、不明はNaN）
+    """
+    rows = (
+        frame.assign(fantestdataID=frame["fantestdataID"].astype(str))
+        .drop_duplicates("fantestdataID")
+        .set_index("fantestdataID")
+        .reindex(store.test_ids)
+    )
+
+    temperature = np.full(len(store), np.nan)
+    for column in reversed(TEMPERATURE_COLUMNS):
+        if column in rows.columns:
+            values = pd.to_numeric(rows[column], errors="coerce").to_numpy(dtype=np.float64)
+            temperature = np.where(np.isfinite(values), values, temperature)
+
+    diameter = np.full(len(store), np.nan)
+    if diameters is not None and "fanID" in rows.columns:
+        diameter = pd.to_numeric(rows["fanID"].astype(str).map(diameters), errors="coerce").to_numpy(dtype=np.float64)
+
+    return {"temperature": temperature, "diameter": diameter, "speed": test_speed(store)}
+
+
+def scale_factors(conditions, reference):
+    """
+    試験ごとの換算係数
+
+    Args:
+        conditions: align_conditions の戻り値
+        reference: 基準条件（DEFAULT_REFERENCE と同じキー。None の項目は換算しない）
+
+    戻り値: {"density": ρ比, "speed": N比, "diameter": D比}（各float64配列。条件が不明で換算できない試験はNaN）
+    """
+    count = len(conditions["temperature"])
+    factors = {}
+    if reference.get("temperature") is None:
+        factors["density"] = np.ones(count)
+    else:
+        # 温度が不明な試験は基準温度で測定したものとみなす
+        temperature = np.where(np.isfinite(conditions["temperature"]), conditions["temperature"], reference["temperature"])
+        factors["density"] = air_density(reference["temperature"]) / air_density(temperature)
+    for name in ("speed", "diameter"):
+        if reference.get(name) is None:
+            factors[name] = np.ones(count)
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                factors[name] = reference[name] / conditions[name]
+            factors[name][~np.isfinite(factors[name]) | (factors[name] <= 0)] = np.nan
+    return factors
+
+
+def normalize(store, conditions, reference=None):
+    """
+    全試験の曲線を基準条件に換算
+
+    Args:
+        store: CurveStore
+        conditions: align_conditions の戻り値
+        reference: 基準条件（Noneなら DEFAULT_REFERENCE）
+
+    戻り値: 換算後の CurveStore（換算できない試験の曲線はNaN）
+    """
+    reference = {**DEFAULT_REFERENCE, **(reference or {})}
+    factors = scale_factors(conditions, reference)
+    density, speed, diameter = factors["density"], factors["speed"], factors["diameter"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_test = {
+            "Q_[m3min]": speed * diameter ** 3,
+            "Ps_[Pa]": density * speed ** 2 * diameter ** 2,
+            "Torque_[mNm]": density * speed ** 2 * diameter ** 5,
+            "Power_[W]": density * speed ** 3 * diameter ** 5,
+        }
+        spl_offset = 50 * np.log10(speed) + 70 * np.log10(diameter) + 20 * np.log10(density)
+
+    values = {}
+    for metric in store.metrics:
+        lengths = store.lengths(metric)
+        if metric == "SPL_[dbA]":
+            values[metric] = store.values[metric] + np.repeat(spl_offset, lengths)
+        elif metric in per_test:
+            values[metric] = store.values[metric] * np.repeat(per_test[metric], lengths)
+        else:
+            values[metric] = store.values[metric].copy()
+    return CurveStore(store.test_ids, values, store.offsets)
+
+
+def _conditions_key(conditions):
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(conditions):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(conditions[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _normalize_cached(_store, store_key, _conditions, conditions_key, reference_items):
+    result = normalize(_store, _conditions, dict(reference_items))
+    # 全セッションで共有するため書き換え不可にする
+    for values in result.values.values():
+        values.flags.writeable = False
+    return result
+
+
+def normalize_cached(store, conditions, reference=None):
+    """normalize の結果を（曲線ストアの内容, 測定条件, 基準条件）ごとにキャッシュして取得"""
+    reference = {**DEFAULT_REFERENCE, **(reference or {})}
+    return _normalize_cached(store, store.key, conditions, _conditions_key(conditions), tuple(sorted(reference.items())))
@@ -0,0 +1,175 @@
+"""
+ファン検索クエリモジュール
+app06のサイドバーのフィルター状態をパラメータ化したSQL（WHERE / ORDER BY / LIMIT / OFFSET）に変換する
+- 絞り込み・並べ替え・ページングはDB側で行い、画面には1ページ分だけ取得する
+- 列名・並び順は許可リストから選ぶため、入力値がSQL文に埋め込まれることはない
+- 対応する索引は sample_data/fan_search_indexes.sql
+"""
+
+FAN_TABLE = '"Fan list"'
+TEST_TABLE = '"FanTestData"'
+METRICS_TABLE = '"FanTestMetrics"'
+
+# カテゴリフィルター（完全一致）の列
+CATEGORY_COLUMNS = ("series", "product_type", "innerouter")
+# 数値範囲フィルターの列
+RANGE_COLUMNS = ("diameter", "year")
+# 試験の性能指標による範囲フィルターの列（FanTestMetrics。1つの試験が全条件を満たすファンに絞り込む）
+METRIC_RANGE_COLUMNS = ("max_flow", "shutoff_pressure", "peak_efficiency", "max_spl", "torque_at_peak_efficiency")
+# キーワード検索の対象列（部分一致・大文字小文字を区別しない）
+TEXT_SEARCH_COLUMNS = ("series", "product_type", "innerouter", "fan_type")
+# 並べ替えに使える列
+SORTABLE_COLUMNS = ("id", "series", "product_type", "diameter", "year")
+
+
+def _quote(column):
+    """列名を識別子として引用"""
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _like_pattern(text):
+    """部分一致用のLIKEパターン（%・_・\\ はエスケープ）"""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def build_fan_filter(filters):
+    """
+    フィルター状態からWHERE句を作成
+
+    Args:
+        filters: フィルター状態の辞書
+            text: キーワード（空なら条件なし）
+            series / product_type / innerouter: 選択値（Noneなら条件なし）
+            diameter / year: (最小, 最大) の範囲（Noneなら条件なし）
+            max_flow などの性能指標: (最小, 最大) の範囲（Noneなら条件なし）
+
+    戻り値: (WHERE句の文字列（条件がなければ空文字）, パラメータ辞書)
+    """
+    clauses = []
+    params = {}
+
+    text = (filters.get("text") or "").strip()
+    if text:
+        params["text"] = _like_pattern(text)
+        columns = [_quote(column) for column in TEXT_SEARCH_COLUMNS] + ['CAST("fanID" AS text)']
+        clauses.append("(" + " OR ".join(f"{column} ILIKE :text" for column in columns) + ")")
+
+    for column in CATEGORY_COLUMNS:
+        value = filters.get(column)
+        if value is not None:
+            params[column] = value
+            clauses.append(f"{_quote(column)} = :{column}")
+
+    for column in RANGE_COLUMNS:
+        value_range = filters.get(column)
+        if value_range is not None:
+            params[f"{column}_min"], params[f"{column}_max"] = value_range
+            clauses.append(f"{_quote(column)} BETWEEN :{column}_min AND :{column}_max")
+
+    metric_clauses = []
+    for column in METRIC_RANGE_COLUMNS:
+        value_range = filters.get(column)
+        if value_range is not None:
+            params[f"{column}_min"], params[f"{column}_max"] = value_range
+            metric_clauses.append(f"{_quote(column)} BETWEEN :{column}_min AND :{column}_max")
+    if metric_clauses:
+        clauses.append(
+            f'"fanID" IN (SELECT "fanID" FROM {METRICS_TABLE} WHERE ' + " AND ".join(metric_clauses) + ")"
+        )
+
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+def fan_count_query(filters):
+    """条件に一致するファン件数を取得するクエリ（列名: count）"""
+    where, params = build_fan_filter(filters)
+    return f"SELECT COUNT(*) AS count FROM {FAN_TABLE} {where};", params
+
+
+def fan_page_query(filters, sort_by="id", ascending=True, limit=50, offset=0):
+    """
+    条件に一致するファンを1ページ分取得するクエリ
+
+    Args:
+        filters: フィルター状態の辞書（build_fan_filter参照）
+        sort_by: 並べ替えの列（SORTABLE_COLUMNSのいずれか）
+        ascending: 昇順ならTrue
+        limit: 取得件数
+        offset: 先頭から読み飛ばす件数
+
+    戻り値: (SQL文, パラメータ辞書)
+    """
+    if sort_by not in SORTABLE_COLUMNS:
+        raise ValueError(f"並べ替えできない列です: {sort_by}")
+    where, params = build_fan_filter(filters)
+    direction = "ASC" if ascending else "DESC"
+    # 同じ値の行の順序がページ間で入れ替わらないよう、idを第2キーにする
+    # （NULLの位置はPostgreSQLの既定のままにし、(列, id) の索引を昇順・降順どちらでも使えるようにする）
+    order = f"{_quote(sort_by)} {direction}"
+    if sort_by != "id":
+        order += f", id {direction}"
+    params.update(limit=int(limit), offset=int(offset))
+    return f"SELECT * FROM {FAN_TABLE} {where} ORDER BY {order} LIMIT :limit OFFSET :offset;", params
+
+
+def fan_options_query(column):
+    """カテゴリフィルターの選択肢を取得するクエリ"""
+    if column not in CATEGORY_COLUMNS:
+        raise ValueError(f"カテゴリフィルターの列ではありません: {column}")
+    quoted = _quote(column)
+    return f"SELECT DISTINCT {quoted} FROM {FAN_TABLE} WHERE {quoted} IS NOT NULL ORDER BY {quoted};", {}
+
+
+def fan_range_query():
+    """数値範囲フィルターの最小・最大を取得するクエリ（列名: <列>_min, <列>_max）"""
+    bounds = ", ".join(
+        f"MIN({_quote(column)}) AS {column}_min, MAX({_quote(column)}) AS {column}_max"
+        for column in RANGE_COLUMNS
+    )
+    return f"SELECT {bounds} FROM {FAN_TABLE};", {}
+
+
+def metric_range_query():
+    """性能指標の範囲フィルターの最小・最大を取得するクエリ（列名: <列>_min, <列>_max）"""
+    bounds = ", ".join(
+        f"MIN({_quote(column)}) AS {column}_min, MAX({_quote(column)}) AS {column}_max"
+        for column in METRIC_RANGE_COLUMNS
+    )
+    return f"SELECT {bounds} FROM {METRICS_TABLE};", {}
+
+
+def fan_diameter_query():
+    """羽根径が登録されているファンの羽根径を取得するクエリ（列名: fanID, diameter）"""
+    return f'SELECT "fanID", diameter FROM {FAN_TABLE} WHERE diameter IS NOT NULL;', {}
+
+
+def fan_group_count_query(filters, column):
+    """条件に一致するファンを列の値ごとに数えるクエリ（列名: <列>, count）"""
+    if column not in CATEGORY_COLUMNS + RANGE_COLUMNS:
+        raise ValueError(f"集計できない列です: {column}")
+    where, params = build_fan_filter(filters)
+    quoted = _quote(column)
+    return (
+        f"SELECT {quoted}, COUNT(*) AS count FROM {FAN_TABLE} {where} "
+        f"GROUP BY {quoted} ORDER BY {quoted};",
+        params,
+    )
+
+
+def related_test_query(filters, columns="*"):
+    """
+    条件に一致するファンの試験データを取得するクエリ（ファンの絞り込みは副問い合わせでDB側に任せる）
+
+    Args:
+        filters: フィルター状態の辞書（build_fan_filter参照）
+        columns: 取得する列（SELECT句）
+
+    戻り値: (SQL文, パラメータ辞書)
+    """
+    where, params = build_fan_filter(filters)
+    return (
+        f'SELECT {columns} FROM {TEST_TABLE} '
+        f'WHERE "fanID" IN (SELECT "fanID" FROM {FAN_TABLE} {where});',
+        params,
+    )
@@ -0,0 +1,203 @@
+"""
+ファン試験データ取得モジュール
+FanTestDataを一覧用のメタデータ（スカラー列）と曲線（jsonb配列）に分けて取得する
+- 一覧・絞り込み・選択肢にはメタデータだけを取得し、配列列は転送しない
+- 曲線は選択された試験の分だけ "fantestdataID" = ANY(...) でまとめて取得する
+- 取得した曲線は試験IDごとにプロセス全体でキャッシュし、プロットに1件追加しても取得するのはその1件だけ
+- 全試験を対象にする解析向けには、全曲線をデータの版ごとに1回だけ解析した曲線ストアを共有する
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from curve_store import CurveStore, parse_curve
+from fan_queries import TEST_TABLE
+
+TEST_ID_COLUMN = "fantestdataID"
+# 曲線（jsonb配列）の列
+CURVE_COLUMNS = (
+    "Q_[m3min]",
+    "Ps_[Pa]",
+    "Torque_[mNm]",
+    "Power_[W]",
+    "SPL_[dbA]",
+)
+# 一覧・絞り込みに使うスカラー列
+METADATA_COLUMNS = (
+    TEST_ID_COLUMN,
+    "id",
+    "fanID",
+    "FanName",
+    "created_at",
+    "TestDate",
+    "tested_at",
+    "test_facillity",
+    "comment",
+    "SingleFanTest",
+    "bellmouth",
+    "Unit",
+    "Hako",
+    "Hex",
+    "temp_o_[degC]",
+    "temp_c_[defC]",
+)
+
+# 曲線キャッシュに保持する試験数の上限（環境変数で上書き可能）
+CURVE_CACHE_MAX_TESTS = int(os.environ.get("CURVE_CACHE_MAX_TESTS", "10000"))
+
+
+def select_list(columns):
+    """列名のタプルをSELECT句に変換"""
+    return ", ".join('"' + column.replace('"', '""') + '"' for column in columns)
+
+
+def test_metadata_query():
+    """試験データのメタデータ（曲線以外の列）を取得するクエリ"""
+    return f"SELECT {select_list(METADATA_COLUMNS)} FROM {TEST_TABLE} ORDER BY id;", {}
+
+
+def curve_query(test_ids):
+    """
+    指定した試験の曲線をまとめて取得するクエリ
+
+    Args:
+        test_ids: 試験ID（fantestdataID）のリスト
+
+    戻り値: (SQL文, パラメータ辞書)
+    """
+    return (
+        f"SELECT {select_list((TEST_ID_COLUMN,) + CURVE_COLUMNS)} FROM {TEST_TABLE} "
+        f'WHERE "{TEST_ID_COLUMN}" = ANY(CAST(:ids AS uuid[]));',
+        {"ids": [str(test_id) for test_id in test_ids]},
+    )
+
+
+def all_curves_query():
+    """全試験の曲線を取得するクエリ"""
+    return f"SELECT {select_list((TEST_ID_COLUMN,) + CURVE_COLUMNS)} FROM {TEST_TABLE} ORDER BY id;", {}
+
+
+def curve_version_query():
+    """
+    曲線ストアの版を判定するクエリ（件数・最大id・曲線列のチェックサム）
+
+    FanTestDataには更新日時の列がないため、各行の曲線列のmd5をid順に連結したmd5を計算し、
+    行の追加・削除だけでなく曲線のUPDATEでも版が変わるようにする（返すのは1行のみ）
+    """
+    row = "ROW(" + select_list((TEST_ID_COLUMN,) + CURVE_COLUMNS) + ")::text"
+    return (
+        f"SELECT COUNT(*) AS count, MAX(id) AS max_id, "
+        f"md5(string_agg(md5({row}), '' ORDER BY id)) AS checksum FROM {TEST_TABLE};",
+        {},
+    )
+
+
+class CurveCache:
+    """
+    試験IDをキーとする曲線のLRUキャッシュ
+
+    Args:
+        max_tests: 保持する試験数の上限
+    """
+
+    def __init__(self, max_tests=CURVE_CACHE_MAX_TESTS):
+        self.max_tests = max_tests
+        self._curves = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, test_ids, fetch):
+        """
+        複数の試験の曲線を取得（未取得の試験だけを1回の fetch でまとめて取得）
+
+        Args:
+            test_ids: 試験IDのリスト
+            fetch: 取得関数 fetch(試験IDのリスト) → 試験ID列と曲線列を持つDataFrame
+
+        戻り値: {試験ID(文字列): {曲線列名: float64配列}}（DBに存在しない試験は含まない）
+        """
+        keys = list(dict.fromkeys(str(test_id) for test_id in test_ids))
+        with self._lock:
+            missing = [key for key in keys if key not in self._curves]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        fetched = {}
+        if missing:
+            rows = fetch(missing)
+            fetched = {
+                str(row[TEST_ID_COLUMN]): {column: parse_curve(row.get(column)) for column in CURVE_COLUMNS}
+                for row in rows.to_dict("records")
+            }
+
+        result = {}
+        with self._lock:
+            self._curves.update(fetched)
+            for key in keys:
+                curves = self._curves.get(key, fetched.get(key))
+                if curves is not None:
+                    self._curves[key] = curves
+                    self._curves.move_to_end(key)
+                    result[key] = curves
+            # 上限を超えた分は最も古く使われたものから破棄（今回の結果は返した後も有効）
+            while len(self._curves) > self.max_tests:
+                self._curves.popitem(last=False)
+        return result
+
+    def clear(self):
+        """キャッシュを破棄（DBの曲線を更新した場合など）"""
+        with self._lock:
+            self._curves.clear()
+
+    def stats(self):
+        """キャッシュの統計情報"""
+        with self._lock:
+            return {"tests": len(self._curves), "hits": self.hits, "misses": self.misses}
+
+
+@st.cache_resource
+def get_curve_cache():
+    """プロセス共通の曲線キャッシュを取得"""
+    return CurveCache()
+
+
+def fetch_curves(conn, test_ids):
+    """
+    選択された試験の曲線を取得（キャッシュにない試験だけを1回のクエリでDBから取得）
+
+    Args:
+        conn: st.connection("postgresql", type="sql")
+        test_ids: 試験ID（fantestdataID）のリスト
+
+    戻り値: CurveStore（DBに存在する試験のみ、指定順）
+    """
+    def fetch(ids):
+        sql, params = curve_query(ids)
+        return conn.query(sql, params=params, ttl=0)
+
+    curves = get_curve_cache().get_many(test_ids, fetch)
+    return CurveStore.from_curves(list(curves), list(curves.values()), CURVE_COLUMNS)
+
+
+@st.cache_resource(max_entries=2, show_spinner="試験データの曲線を読み込み中...")
+def _load_curve_store(_conn, version):
+    sql, params = all_curves_query()
+    return CurveStore.from_frame(_conn.query(sql, params=params, ttl=0), TEST_ID_COLUMN, CURVE_COLUMNS)
+
+
+def load_curve_store(conn):
+    """
+    全試験の曲線ストアを取得（データの版ごとに1回だけ取得・解析し、全セッションで共有）
+
+    Args:
+        conn: st.connection("postgresql", type="sql")
+
+    戻り値: CurveStore
+    """
+    sql, params = curve_version_query()
+    version = tuple(str(value) for value in conn.query(sql, params=params, ttl=60).iloc[0])
+    return _load_curve_store(conn, version)
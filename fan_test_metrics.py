@@ -0,0 +1,180 @@
+"""
+試験性能指標モジュール
+FanTestDataの曲線から試験ごとの性能指標を計算し、FanTestMetricsテーブルに保存する
+- 指標: 最大風量・締切静圧・最高静圧効率・最大騒音・最高効率点のトルク
+- 全試験分の曲線を曲線ストアにまとめ、試験ごとのループなしで一括計算する
+- 更新は差分のみ（FanTestMetricsに行のない試験だけを一定件数ずつ計算して追加）
+- テーブル・索引の定義は sample_data/fan_test_metrics.sql
+
+使い方:
+    python fan_test_metrics.py                 # 未計算の試験の指標を追加
+    python fan_test_metrics.py --full          # 全試験の指標を計算し直す
+    python fan_test_metrics.py --batch-size 5000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+from curve_resampling import prepare_segments
+from curve_store import CurveStore
+from fan_queries import METRIC_RANGE_COLUMNS, METRICS_TABLE, TEST_TABLE
+from fan_test_data import CURVE_COLUMNS, TEST_ID_COLUMN
+
+METRIC_COLUMNS = METRIC_RANGE_COLUMNS
+# 1回のクエリ・トランザクションで処理する試験数
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _aligned_points(store, metrics):
+    """
+    複数の指標の測定点を点番号でそろえて取り出す（点数は指標のうち最も短いものに合わせる）
+
+    戻り値: (各点の試験番号, 各点の試験内の点番号, {指標: 値の配列})
+    """
+    counts = np.min([store.lengths(metric) for metric in metrics], axis=0)
+    test = np.repeat(np.arange(len(store)), counts)
+    local = np.arange(len(test)) - np.repeat(np.cumsum(counts) - counts, counts)
+    values = {metric: store.values[metric][store.offsets[metric][:-1][test] + local] for metric in metrics}
+    return test, local, values
+
+
+def compute_metrics(store):
+    """
+    全試験の性能指標を一括計算
+
+    Args:
+        store: CurveStore（CURVE_COLUMNS の指標を持つ）
+
+    戻り値: DataFrame（fantestdataID・point_count・METRIC_COLUMNS。計算できない指標はNaN）
+    """
+    # 締切静圧: 最小風量の測定点の静圧
+    segments = prepare_segments(store, "Q_[m3min]", "Ps_[Pa]")
+    shutoff_pressure = np.full(len(store), np.nan)
+    measured = segments["counts"] > 0
+    shutoff_pressure[measured] = segments["y"][segments["starts"][measured]]
+
+    # 静圧効率: 空気動力 (Q/60)·Ps / 軸動力。試験ごとに最大の点を求める
+    test, local, values = _aligned_points(store, ("Q_[m3min]", "Ps_[Pa]", "Power_[W]"))
+    power = values["Power_[W]"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiency = values["Q_[m3min]"] / 60.0 * values["Ps_[Pa]"] / power
+    valid = np.isfinite(efficiency) & (power > 0)
+    test, local, efficiency = test[valid], local[valid], efficiency[valid]
+    order = np.lexsort((efficiency, test))
+    test, local, efficiency = test[order], local[order], efficiency[order]
+    last = np.flatnonzero(np.r_[test[1:] != test[:-1], True]) if len(test) else np.empty(0, dtype=np.int64)
+    peak_tests = test[last]
+    peak_efficiency = np.full(len(store), np.nan)
+    peak_efficiency[peak_tests] = efficiency[last]
+
+    # 最高効率点のトルク（トルクの点数が足りない試験はNaN）
+    torque_at_peak = np.full(len(store), np.nan)
+    peak_local = local[last]
+    has_torque = peak_local < store.lengths("Torque_[mNm]")[peak_tests]
+    torque_offsets = store.offsets["Torque_[mNm]"]
+    torque_at_peak[peak_tests[has_torque]] = store.values["Torque_[mNm]"][
+        torque_offsets[peak_tests[has_torque]] + peak_local[has_torque]
+    ]
+
+    return pd.DataFrame({
+        TEST_ID_COLUMN: store.test_ids,
+        "point_count": segments["counts"],
+        "max_flow": store.reduce("Q_[m3min]", np.fmax),
+        "shutoff_pressure": shutoff_pressure,
+        "peak_efficiency": peak_efficiency,
+        "max_spl": store.reduce("SPL_[dbA]", np.fmax),
+        "torque_at_peak_efficiency": torque_at_peak,
+    })
+
+
+def pending_tests_query(limit):
+    """性能指標が未計算の試験の曲線を取得するクエリ（id順に最大 limit 件）"""
+    columns = ", ".join(f't."{column}"' for column in (TEST_ID_COLUMN, "fanID") + CURVE_COLUMNS)
+    return (
+        f"SELECT {columns} FROM {TEST_TABLE} t "
+        f'WHERE NOT EXISTS (SELECT 1 FROM {METRICS_TABLE} m WHERE m."{TEST_ID_COLUMN}" = t."{TEST_ID_COLUMN}") '
+        f"ORDER BY t.id LIMIT :limit;",
+        {"limit": int(limit)},
+    )
+
+
+def upsert_metrics_sql():
+    """性能指標を1試験1行で追加・上書きするSQL（executemany 用）"""
+    columns = ("point_count",) + METRIC_COLUMNS
+    return (
+        f'INSERT INTO {METRICS_TABLE} ("{TEST_ID_COLUMN}", "fanID", {", ".join(columns)}) '
+        f"VALUES (:test_id, :fan_id, {', '.join(':' + column for column in columns)}) "
+        f'ON CONFLICT ("{TEST_ID_COLUMN}") DO UPDATE SET '
+        + ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+        + ', "fanID" = EXCLUDED."fanID", computed_at = CURRENT_TIMESTAMP;'
+    )
+
+
+def refresh_metrics(session, batch_size=DEFAULT_BATCH_SIZE, full=False, progress=None):
+    """
+    未計算の試験の性能指標を計算してFanTestMetricsに保存（batch_size件ごとに1トランザクション）
+
+    曲線がない・解析できない試験も指標をNULLとして保存し、次回以降は対象にしない
+
+    Args:
+        session: SQLAlchemyのセッション（st.connection の conn.session など）
+        batch_size: 1回に処理する試験数
+        full: Trueなら既存の指標を削除して全試験を計算し直す
+        progress: 進捗通知関数 progress(処理済み件数)（Noneなら通知しない）
+
+    戻り値: 計算した試験数
+    """
+    if full:
+        session.execute(text(f"DELETE FROM {METRICS_TABLE};"))
+        session.commit()
+
+    sql, params = pending_tests_query(batch_size)
+    total = 0
+    while True:
+        result = session.execute(text(sql), params)
+        rows = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        if len(rows) == 0:
+            break
+        metrics = compute_metrics(CurveStore.from_frame(rows, TEST_ID_COLUMN, CURVE_COLUMNS))
+        metrics = metrics.rename(columns={TEST_ID_COLUMN: "test_id"})
+        metrics["fan_id"] = rows["fanID"].astype(str).to_numpy()
+        records = metrics.astype(object).where(metrics.notna(), None).to_dict("records")
+        try:
+            session.execute(text(upsert_metrics_sql()), records)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        total += len(rows)
+        if progress is not None:
+            progress(total)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FanTestDataの性能指標をFanTestMetricsに計算・保存")
+    parser.add_argument("--full", action="store_true", help="既存の指標を削除して全試験を計算し直す")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1トランザクションで処理する試験数")
+    parser.add_argument("--url", default=None, help="データベースURL（省略時は .streamlit/secrets.toml の postgresql 接続）")
+    args = parser.parse_args(argv)
+
+    conn = st.connection("postgresql", type="sql", **({"url": args.url} if args.url else {}))
+    started = time.perf_counter()
+    count = refresh_metrics(
+        conn.session,
+        batch_size=args.batch_size,
+        full=args.full,
+        progress=lambda done: print(f"  {done} 件計算済み", flush=True),
+    )
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"性能指標を {count} 件計算しました（{elapsed:.1f} 秒, {rate:.0f} tests/s）")
+
+
+if __name__ == "__main__":
+    main()
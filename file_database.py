@@ -0,0 +1,206 @@
+"""
+ファイル管理データベースモジュール
+アップロード・変換済みファイルの登録情報を管理する（SQLite）
+- WALモードのため、一覧表示中でも変換ジョブの登録がブロックされない
+- id・登録日時・ファイル名・元ファイルハッシュにインデックスを張り、件数が増えても一覧・検索・追加が速い
+- 旧形式の file_database.json があれば初回に一度だけ取り込む
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+DB_FILE = Path("file_database.sqlite")
+LEGACY_JSON_FILE = Path("file_database.json")
+
+# 専用列を持つ項目（それ以外の項目は extra 列にJSONで保持）
+ENTRY_COLUMNS = (
+    "id",
+    "original_name",
+    "original_path",
+    "glb_path",
+    "file_type",
+    "upload_date",
+    "source_sha256",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    original_name TEXT NOT NULL COLLATE NOCASE,
+    original_path TEXT NOT NULL,
+    glb_path TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    upload_date TEXT NOT NULL,
+    source_sha256 TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_upload_date ON files(upload_date);
+CREATE INDEX IF NOT EXISTS idx_files_original_name ON files(original_name);
+CREATE INDEX IF NOT EXISTS idx_files_source_sha256 ON files(source_sha256);
+"""
+
+# 同一プロセス内の初期化・移行処理を直列化
+_db_lock = threading.Lock()
+_initialized = False
+
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _to_row(entry):
+    """エントリ辞書をINSERT用のタプルに変換"""
+    extra = {key: value for key, value in entry.items() if key not in ENTRY_COLUMNS}
+    return (
+        *(entry.get(column) for column in ENTRY_COLUMNS),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def _to_entry(row):
+    """DBの行をエントリ辞書に変換（従来のJSONと同じ形）"""
+    entry = {column: row[column] for column in ENTRY_COLUMNS if row[column] is not None}
+    if row["extra"]:
+        entry.update(json.loads(row["extra"]))
+    return entry
+
+
+def _insert(conn, entries):
+    placeholders = ", ".join("?" * (len(ENTRY_COLUMNS) + 1))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO files ({', '.join(ENTRY_COLUMNS)}, extra) "
+        f"VALUES ({placeholders})",
+        [_to_row(entry) for entry in entries],
+    )
+
+
+def _migrate_legacy_json(conn):
+    """旧 file_database.json を取り込み、取り込み済みの印としてリネーム"""
+    if not LEGACY_JSON_FILE.exists():
+        return
+    with open(LEGACY_JSON_FILE, 'r') as f:
+        entries = json.load(f)
+    with conn:
+        _insert(conn, entries)
+    LEGACY_JSON_FILE.rename(LEGACY_JSON_FILE.with_name(LEGACY_JSON_FILE.name + ".migrated"))
+
+
+def init_database():
+    """データベース初期化（テーブル作成と旧JSONからの移行。プロセスごとに1回のみ）"""
+    global _initialized
+    if _initialized:
+        return
+    with _db_lock:
+        if _initialized:
+            return
+        with closing(_connect()) as conn:
+            conn.executescript(_SCHEMA)
+            _migrate_legacy_json(conn)
+        _initialized = True
+
+
+def load_database():
+    """データベース読み込み（全件を登録順に返す）"""
+    init_database()
+    with closing(_connect()) as conn:
+        rows = conn.execute("SELECT * FROM files ORDER BY rowid").fetchall()
+    return [_to_entry(row) for row in rows]
+
+
+def save_to_database(entry):
+    """データベースに保存"""
+    save_entries_to_database([entry])
+
+
+def save_entries_to_database(entries):
+    """データベースに複数件をまとめて保存（1トランザクション）"""
+    if not entries:
+        return
+    init_database()
+    with closing(_connect()) as conn, conn:
+        _insert(conn, entries)
+
+
+def update_source_hashes(hashes):
+    """
+    既存エントリの元ファイルのSHA-256をまとめて記録（1トランザクション）
+
+    Args:
+        hashes: {エントリID: SHA-256}
+    """
+    if not hashes:
+        return
+    init_database()
+    with closing(_connect()) as conn, conn:
+        conn.executemany(
+            "UPDATE files SET source_sha256 = ? WHERE id = ?",
+            [(sha256, entry_id) for entry_id, sha256 in hashes.items()],
+        )
+
+
+def _search_clause(search):
+    if not search:
+        return "", ()
+    return "WHERE original_name LIKE ? ESCAPE '\\'", (
+        "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",
+    )
+
+
+def count_entries(search=None):
+    """
+    登録件数を取得
+
+    Args:
+        search: ファイル名の部分一致検索文字列（大文字小文字を区別しない）
+
+    戻り値: 件数
+    """
+    init_database()
+    where, params = _search_clause(search)
+    with closing(_connect()) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM files {where}", params).fetchone()[0]
+
+
+def list_entries(search=None, limit=50, offset=0):
+    """
+    新しい順にエントリを取得（ページ単位）
+
+    Args:
+        search: ファイル名の部分一致検索文字列（大文字小文字を区別しない）
+        limit: 取得件数
+        offset: 先頭から読み飛ばす件数
+
+    戻り値: エントリ辞書のリスト
+    """
+    init_database()
+    where, params = _search_clause(search)
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM files {where} ORDER BY upload_date DESC, rowid DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        ).fetchall()
+    return [_to_entry(row) for row in rows]
+
+
+def get_entry(entry_id):
+    """IDでエントリを取得（見つからなければNone）"""
+    init_database()
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM files WHERE id = ?", (entry_id,)).fetchone()
+    return _to_entry(row) if row else None
+
+
+def find_by_source_hash(sha256):
+    """元ファイルのSHA-256で登録済みエントリを取得（新しい順）"""
+    init_database()
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT * FROM files WHERE source_sha256 = ? ORDER BY upload_date DESC", (sha256,)
+        ).fetchall()
+    return [_to_entry(row) for row in rows]
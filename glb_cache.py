@@ -0,0 +1,150 @@
+"""
+GLBペイロードキャッシュモジュール
+プロセス全体（全セッション共通）でモデルファイルの内容を1つだけ保持する
+- 内容のSHA-256をキーにするため、同じモデルを見る複数ユーザーでも保持は1つ
+- バイト上限を超えた場合は最も古く使われたものから破棄（LRU）
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+# キャッシュ上限（環境変数で上書き可能、既定512MB）
+GLB_CACHE_MAX_BYTES = int(os.environ.get("GLB_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class GlbPayload:
+    """キャッシュされたモデル内容"""
+    sha256: str
+    data: bytes
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def etag(self):
+        return f'"{self.sha256}"'
+
+
+def file_sha256(path):
+    """ファイルのSHA-256をチャンク単位で計算"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GlbPayloadCache:
+    """
+    SHA-256をキーとするLRUキャッシュ
+
+    ファイル → SHA-256 の対応は (パス, mtime, サイズ) で記録し、
+    ファイルが更新されない限り再ハッシュしない
+    """
+
+    def __init__(self, max_bytes=GLB_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._payloads = OrderedDict()
+        self._digests = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def digest_for(self, path, stat_result=None):
+        """ファイルのSHA-256を取得（mtime・サイズが変わっていなければ再計算しない）"""
+        path = Path(path).resolve()
+        stat_result = stat_result or path.stat()
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+
+        with self._lock:
+            cached = self._digests.get(str(path))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        sha256 = file_sha256(path)
+        with self._lock:
+            self._digests[str(path)] = (version, sha256)
+        return sha256
+
+    def get(self, path):
+        """
+        モデル内容を取得（キャッシュになければ読み込んで登録）
+
+        Args:
+            path: GLBファイルのパス
+
+        戻り値: GlbPayload
+        """
+        path = Path(path).resolve()
+        stat_result = path.stat()
+        sha256 = self.digest_for(path, stat_result)
+
+        with self._lock:
+            payload = self._payloads.get(sha256)
+            if payload is not None:
+                self._payloads.move_to_end(sha256)
+                self.hits += 1
+                return payload
+            self.misses += 1
+
+        with open(path, "rb") as f:
+            data = f.read()
+        payload = GlbPayload(sha256=sha256, data=data)
+
+        # 上限を超える単一ファイルはキャッシュしない
+        if payload.size > self.max_bytes:
+            return payload
+
+        with self._lock:
+            if sha256 not in self._payloads:
+                self._payloads[sha256] = payload
+                self._total_bytes += payload.size
+                self._evict_locked()
+            else:
+                payload = self._payloads[sha256]
+        return payload
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._payloads:
+            _, evicted = self._payloads.popitem(last=False)
+            self._total_bytes -= evicted.size
+            self.evictions += 1
+
+    def clear(self):
+        """キャッシュを全削除（統計はリセットしない）"""
+        with self._lock:
+            self._payloads.clear()
+            self._digests.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """キャッシュ統計を取得"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._payloads),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
+
+
+# プロセス全体で共有するキャッシュ（モデル配信サーバーのスレッドからも参照する）
+_glb_cache = GlbPayloadCache()
+
+
+def get_glb_cache():
+    """プロセス共通のGLBペイロードキャッシュを取得"""
+    return _glb_cache
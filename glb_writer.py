@@ -0,0 +1,503 @@
+"""
+最適化GLB書き出しモジュール
+STL由来の三角形メッシュを、頂点結合・折り目角による法線再計算をしたうえで書き出す
+- quantized: 量子化（KHR_mesh_quantization）。拡張に対応した標準的なローダーでそのまま読める
+  - 位置: 16bit符号なし整数（ノードの平行移動・一様スケールで元の座標に戻す）
+  - 法線: 8bit符号付き正規化整数
+  - 位置の量子化誤差はモデルの最大寸法の 1/131070 以下
+- draco: Draco圧縮（KHR_draco_mesh_compression）。最も小さいが、表示側にDracoデコーダーが必要
+- plain: trimesh の書き出しそのまま
+- 法線なし（normals=False）では位置だけで結合した頂点をそのまま書き出し、法線はローダー側で求める（LOD向け）
+- 最適化した結果が plain（頂点数・三角形数からの概算）より大きくなる場合は plain で書き出す（write_glb）
+"""
+
+import json
+import struct
+
+import numpy as np
+
+# 出力形式
+ENCODING_PLAIN = "plain"
+ENCODING_QUANTIZED = "quantized"
+ENCODING_DRACO = "draco"
+ENCODINGS = (ENCODING_QUANTIZED, ENCODING_DRACO, ENCODING_PLAIN)
+
+# Draco圧縮の設定（位置・法線の量子化ビット数と圧縮レベル0〜10）
+DRACO_POSITION_BITS = 14
+DRACO_NORMAL_BITS = 10
+DRACO_COMPRESSION_LEVEL = 7
+# Dracoの属性種別（draco::GeometryAttribute::Type）
+DRACO_ATTRIBUTE_POSITION = 0
+DRACO_ATTRIBUTE_NORMAL = 1
+
+# 隣接面との角度がこれ未満なら滑らかに、以上なら角として法線を分ける（度）
+DEFAULT_CREASE_ANGLE = 30.0
+# 法線計算で一度に評価する（頂点を共有する角のペア）数の上限
+MAX_CORNER_PAIRS = 1_000_000
+
+POSITION_LEVELS = 65535
+# 頂点結合で一度に浮動小数点へ展開する三角形数（メモリマップした巨大STLでも全体を複製しない）
+WELD_CHUNK_TRIANGLES = 1_000_000
+
+# 最適化なしGLB（trimeshの書き出し）のヘッダー・JSONチャンクのバイト数の下限
+# （STLから読み込んだメッシュはメタデータの分だけ大きい。下限で見積もり、plain より大きいGLBを書き出さない）
+PLAIN_GLB_OVERHEAD_BYTES = 680
+
+GLB_MAGIC = 0x46546C67  # "glTF"
+GLB_CHUNK_JSON = 0x4E4F534A  # "JSON"
+GLB_CHUNK_BIN = 0x004E4942  # "BIN"
+
+# glTFのcomponentType
+BYTE = 5120
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+
+def _pad4(data, fill=b"\x00"):
+    return data + fill * (-len(data) % 4)
+
+
+def _iter_chunks(triangles, chunk_size=WELD_CHUNK_TRIANGLES):
+    """三角形配列を一定数ずつfloat64の (k, 3, 3) 配列として取り出す"""
+    for start in range(0, len(triangles), chunk_size):
+        yield start, np.asarray(triangles[start:start + chunk_size], dtype=np.float64)
+
+
+def quantization_frame(triangles):
+    """
+    16bit量子化の基準（全軸で同じスケール。非一様スケールは法線を歪めるため使わない）
+
+    戻り値: (平行移動 (3,), スケール)。座標 = 平行移動 + 量子化値 * スケール
+    """
+    lo = np.full(3, np.inf)
+    hi = np.full(3, -np.inf)
+    for _, chunk in _iter_chunks(triangles):
+        corners = chunk.reshape(-1, 3)
+        lo = np.minimum(lo, corners.min(axis=0))
+        hi = np.maximum(hi, corners.max(axis=0))
+    extent = float((hi - lo).max())
+    return lo, (extent / POSITION_LEVELS if extent > 0 else 1.0)
+
+
+def crease_normals(corner_vertices, face_normals, face_weights, crease_angle=DEFAULT_CREASE_ANGLE):
+    """
+    各三角形の角（コーナー）の法線を計算
+
+    同じ頂点を共有する面のうち、自分の面との角度が折り目角未満のものだけを面積で重み付けして平均する
+
+    Args:
+        corner_vertices: 角ごとの頂点番号 (3F,)
+        face_normals: 単位面法線 (F, 3)
+        face_weights: 面積重み付きの面法線 (F, 3)
+        crease_angle: 折り目角（度）
+
+    戻り値: 角ごとの単位法線 (3F, 3)
+    """
+    cos_crease = np.cos(np.radians(crease_angle))
+    corner_count = len(corner_vertices)
+
+    # 角の数に比例する配列は巨大メッシュでメモリを占めるため int32 で持つ
+    order = np.argsort(corner_vertices, kind="stable").astype(np.int32)
+    sorted_vertices = corner_vertices[order]
+    group_start = np.flatnonzero(np.r_[True, sorted_vertices[1:] != sorted_vertices[:-1]]).astype(np.int32)
+    del sorted_vertices
+    group_size = np.diff(np.r_[group_start, corner_count]).astype(np.int32)
+    # 並べ替え後の各角が属するグループの先頭位置と大きさ
+    corner_group = np.repeat(np.arange(len(group_start), dtype=np.int32), group_size)
+    corner_start = group_start[corner_group]
+    corner_degree = group_size[corner_group]
+    del corner_group
+
+    normals = np.zeros((corner_count, 3), dtype=np.float32)
+    pair_count = np.cumsum(corner_degree, dtype=np.int64)
+    begin = 0
+    while begin < corner_count:
+        # ペア数が上限を超えないよう角の範囲を区切って処理
+        limit = (pair_count[begin - 1] if begin else 0) + MAX_CORNER_PAIRS
+        end = max(begin + 1, int(np.searchsorted(pair_count, limit, side="right")))
+        degrees = corner_degree[begin:end]
+
+        own = np.repeat(np.arange(begin, end), degrees)
+        offsets = np.arange(len(own)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        partner = corner_start[own] + offsets
+
+        own_face = order[own] // 3
+        partner_face = order[partner] // 3
+        smooth = np.einsum("ij,ij->i", face_normals[own_face], face_normals[partner_face]) >= cos_crease
+
+        weights = face_weights[partner_face[smooth]]
+        targets = order[own[smooth]]
+        for axis in range(3):
+            normals[:, axis] += np.bincount(targets, weights=weights[:, axis], minlength=corner_count)
+        begin = end
+
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def weld_mesh(triangles, crease_angle=DEFAULT_CREASE_ANGLE, normals=True):
+    """
+    三角形配列の頂点を結合し、折り目角で法線を計算
+
+    入力は一定数ずつ処理するため、メモリマップした配列（stl_reader）を渡しても全体の複製は作らない
+
+    Args:
+        triangles: (F, 3, 3) の頂点座標配列（STLのように頂点が共有されていなくてよい）
+        crease_angle: 法線を分ける折り目角（度）
+        normals: Falseなら法線を計算せず、位置だけで結合した頂点をそのまま出力頂点にする
+            （折り目での頂点の分割がなくなり小さくなる。法線はローダー側で求める）
+
+    戻り値: 辞書
+        positions: 量子化座標 uint16 (V, 3)（座標 = translation + positions * scale）
+        translation, scale: 量子化の平行移動・スケール
+        normals: 量子化法線 int8 (V, 3)（法線 = normals / 127。normals=False ならNone）
+        indices: 三角形の頂点番号 (F' * 3,)
+        welded_positions, welded_faces: 位置だけで結合したメッシュ（LOD生成など法線で分割しない用途向け）
+        input_vertices, welded_vertices: 入力の頂点数、位置だけで結合した頂点数
+    """
+    face_count = len(triangles)
+    translation, scale = quantization_frame(triangles)
+
+    # 量子化した座標を1つの整数キーにまとめ、同じ格子点になる頂点を結合
+    keys = np.empty(face_count * 3, dtype=np.int64)
+    face_weights = np.empty((face_count, 3), dtype=np.float32)
+    for start, chunk in _iter_chunks(triangles):
+        quantized = np.rint((chunk.reshape(-1, 3) - translation) / scale).clip(0, POSITION_LEVELS).astype(np.int64)
+        keys[start * 3:(start + len(chunk)) * 3] = quantized[:, 0] << 32 | quantized[:, 1] << 16 | quantized[:, 2]
+        face_weights[start:start + len(chunk)] = np.cross(chunk[:, 1] - chunk[:, 0], chunk[:, 2] - chunk[:, 0])
+    unique_keys, corner_vertices = np.unique(keys, return_inverse=True)
+    del keys
+    welded = np.stack([unique_keys >> 32, (unique_keys >> 16) & 0xFFFF, unique_keys & 0xFFFF], axis=1).astype(np.uint16)
+    corner_vertices = corner_vertices.reshape(-1).astype(np.int32)
+
+    # 結合で潰れた三角形を除去
+    faces = corner_vertices.reshape(-1, 3)
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    faces = faces[keep]
+    face_weights = face_weights[keep]
+    corner_vertices = faces.reshape(-1)
+
+    if not normals:
+        return {
+            "positions": welded,
+            "translation": translation,
+            "scale": scale,
+            "normals": None,
+            "indices": corner_vertices,
+            "welded_positions": welded,
+            "welded_faces": faces,
+            "input_vertices": face_count * 3,
+            "welded_vertices": len(welded),
+        }
+
+    lengths = np.linalg.norm(face_weights, axis=1, keepdims=True)
+    face_normals = np.divide(face_weights, lengths, out=np.zeros_like(face_weights), where=lengths > 0)
+    normals = crease_normals(corner_vertices, face_normals, face_weights, crease_angle)
+    normals_q = np.rint(normals * 127).astype(np.int8)
+    del normals
+
+    # 出力頂点 = (結合後の頂点, 量子化法線) の組み合わせ
+    keys = (
+        corner_vertices.astype(np.int64) << 24
+        | (normals_q[:, 0].astype(np.int64) + 128) << 16
+        | (normals_q[:, 1].astype(np.int64) + 128) << 8
+        | (normals_q[:, 2].astype(np.int64) + 128)
+    )
+    _, first_corner, indices = np.unique(keys, return_index=True, return_inverse=True)
+
+    return {
+        "positions": welded[corner_vertices[first_corner]],
+        "translation": translation,
+        "scale": scale,
+        "normals": normals_q[first_corner],
+        "indices": indices.reshape(-1),
+        "welded_positions": welded,
+        "welded_faces": faces,
+        "input_vertices": face_count * 3,
+        "welded_vertices": len(welded),
+    }
+
+
+def _base_gltf(primitive, extension, node=None):
+    """1メッシュ・1ノードのglTF JSONの共通部分"""
+    return {
+        "asset": {"version": "2.0", "generator": "3dmodelwebviewer glb_writer"},
+        "extensionsUsed": [extension],
+        "extensionsRequired": [extension],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [dict(node or {}, mesh=0)],
+        "meshes": [{"primitives": [dict(primitive, material=0)]}],
+        "materials": [{
+            "pbrMetallicRoughness": {
+                "baseColorFactor": [0.8, 0.8, 0.8, 1.0],
+                "metallicFactor": 0.1,
+                "roughnessFactor": 0.6,
+            },
+        }],
+    }
+
+
+def _pack_glb(gltf, binary):
+    """glTF JSONとバイナリをGLBコンテナにまとめる"""
+    json_chunk = _pad4(json.dumps(gltf, separators=(",", ":")).encode("utf-8"), b" ")
+    binary = _pad4(binary)
+    total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    return b"".join([
+        struct.pack("<III", GLB_MAGIC, 2, total),
+        struct.pack("<II", len(json_chunk), GLB_CHUNK_JSON),
+        json_chunk,
+        struct.pack("<II", len(binary), GLB_CHUNK_BIN),
+        binary,
+    ])
+
+
+def _stats(geometry, glb):
+    return {
+        "input_vertices": geometry["input_vertices"],
+        "welded_vertices": geometry["welded_vertices"],
+        "output_vertices": len(geometry["positions"]),
+        "triangles": len(geometry["indices"]) // 3,
+        "bytes": len(glb),
+    }
+
+
+def pack_quantized_glb(geometry):
+    """weld_meshの結果から量子化GLB（KHR_mesh_quantization）を作成"""
+    vertex_count = len(geometry["positions"])
+
+    # 頂点属性は4バイト境界に揃える（byteStrideは4の倍数が必須）
+    positions = np.zeros((vertex_count, 4), dtype=np.uint16)
+    positions[:, :3] = geometry["positions"]
+    has_normals = geometry["normals"] is not None
+    index_type = UNSIGNED_SHORT if vertex_count <= 65535 else UNSIGNED_INT
+    index_data = geometry["indices"].astype(np.uint16 if index_type == UNSIGNED_SHORT else np.uint32)
+
+    blobs = [positions.tobytes(), index_data.tobytes()]
+    if has_normals:
+        normal_data = np.zeros((vertex_count, 4), dtype=np.int8)
+        normal_data[:, :3] = geometry["normals"]
+        blobs.append(normal_data.tobytes())
+    offsets = []
+    binary = b""
+    for blob in blobs:
+        offsets.append(len(binary))
+        binary = _pad4(binary + blob)
+
+    scale = geometry["scale"]
+    attributes = {"POSITION": 0, "NORMAL": 2} if has_normals else {"POSITION": 0}
+    gltf = _base_gltf(
+        {"attributes": attributes, "indices": 1},
+        "KHR_mesh_quantization",
+        node={"translation": geometry["translation"].tolist(), "scale": [scale, scale, scale]},
+    )
+    buffer_views = [
+        {"buffer": 0, "byteOffset": offsets[0], "byteLength": len(blobs[0]),
+         "byteStride": 8, "target": ARRAY_BUFFER},
+        {"buffer": 0, "byteOffset": offsets[1], "byteLength": len(blobs[1]),
+         "target": ELEMENT_ARRAY_BUFFER},
+    ]
+    accessors = [
+        {"bufferView": 0, "componentType": UNSIGNED_SHORT, "count": vertex_count, "type": "VEC3",
+         "min": positions[:, :3].min(axis=0).tolist(), "max": positions[:, :3].max(axis=0).tolist()},
+        {"bufferView": 1, "componentType": index_type, "count": len(index_data), "type": "SCALAR"},
+    ]
+    if has_normals:
+        buffer_views.append(
+            {"buffer": 0, "byteOffset": offsets[2], "byteLength": len(blobs[2]),
+             "byteStride": 4, "target": ARRAY_BUFFER}
+        )
+        accessors.append(
+            {"bufferView": 2, "componentType": BYTE, "normalized": True, "count": vertex_count, "type": "VEC3"}
+        )
+    gltf.update({
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": buffer_views,
+        "accessors": accessors,
+    })
+
+    return _pack_glb(gltf, binary)
+
+
+def pack_draco_glb(geometry):
+    """weld_meshの結果からDraco圧縮GLB（KHR_draco_mesh_compression）を作成"""
+    try:
+        import DracoPy
+    except ImportError as e:
+        raise ImportError("Draco圧縮には DracoPy が必要です（pip install DracoPy）") from e
+
+    positions = geometry["translation"] + geometry["positions"] * geometry["scale"]
+    has_normals = geometry["normals"] is not None
+    faces = geometry["indices"].reshape(-1, 3).astype(np.uint32)
+
+    normal_options = {}
+    if has_normals:
+        normal_options = {
+            "normals": geometry["normals"].astype(np.float64) / 127,
+            "normal_quantization_bits": DRACO_NORMAL_BITS,
+        }
+    encoded = DracoPy.encode(
+        positions,
+        faces,
+        quantization_bits=DRACO_POSITION_BITS,
+        compression_level=DRACO_COMPRESSION_LEVEL,
+        **normal_options,
+    )
+    # 属性ID・頂点数・座標範囲はエンコード結果から取得（Dracoは頂点を並べ替え・結合する）
+    decoded = DracoPy.decode(encoded)
+    attribute_ids = {attribute["attribute_type"]: attribute["unique_id"] for attribute in decoded.attributes}
+    points = np.asarray(decoded.points)
+    vertex_count = len(points)
+    index_count = len(np.asarray(decoded.faces).reshape(-1))
+
+    attributes = {"POSITION": 0}
+    draco_attributes = {"POSITION": attribute_ids[DRACO_ATTRIBUTE_POSITION]}
+    accessors = [
+        {"componentType": FLOAT, "count": vertex_count, "type": "VEC3",
+         "min": points.min(axis=0).tolist(), "max": points.max(axis=0).tolist()},
+        {"componentType": UNSIGNED_SHORT if vertex_count <= 65535 else UNSIGNED_INT,
+         "count": index_count, "type": "SCALAR"},
+    ]
+    if has_normals:
+        attributes["NORMAL"] = 2
+        draco_attributes["NORMAL"] = attribute_ids[DRACO_ATTRIBUTE_NORMAL]
+        accessors.append({"componentType": FLOAT, "count": vertex_count, "type": "VEC3"})
+    gltf = _base_gltf(
+        {
+            "attributes": attributes,
+            "indices": 1,
+            "extensions": {
+                "KHR_draco_mesh_compression": {
+                    "bufferView": 0,
+                    "attributes": draco_attributes,
+                },
+            },
+        },
+        "KHR_draco_mesh_compression",
+    )
+    gltf.update({
+        "buffers": [{"byteLength": len(_pad4(encoded))}],
+        "bufferViews": [{"buffer": 0, "byteOffset": 0, "byteLength": len(encoded)}],
+        "accessors": accessors,
+    })
+
+    return _pack_glb(gltf, encoded)
+
+
+def write_geometry_glb(geometry, glb_path, encoding=ENCODING_QUANTIZED):
+    """
+    weld_meshの結果をGLBとして書き出す
+
+    戻り値: 統計情報の辞書（頂点数・三角形数・バイト数）
+    """
+    glb = pack_draco_glb(geometry) if encoding == ENCODING_DRACO else pack_quantized_glb(geometry)
+    with open(glb_path, "wb") as f:
+        f.write(glb)
+    return _stats(geometry, glb)
+
+
+def plain_glb_size(vertex_count, triangle_count):
+    """
+    最適化なし（trimeshの書き出し: float32の位置＋uint32のインデックス）で書き出した場合のGLBサイズの概算
+
+    Args:
+        vertex_count: 頂点数
+        triangle_count: 三角形数
+
+    戻り値: バイト数
+    """
+    return vertex_count * 12 + triangle_count * 3 * 4 + PLAIN_GLB_OVERHEAD_BYTES
+
+
+def write_glb(mesh, glb_path, encoding=ENCODING_QUANTIZED, normals=True):
+    """
+    指定した出力形式でGLBを書き出す（最適化した結果が plain より大きい場合は plain で書き出す）
+
+    Args:
+        mesh: trimesh.Trimesh
+        glb_path: 出力GLBファイルのパス
+        encoding: ENCODINGS のいずれか
+        normals: Falseなら最適化GLBに法線を書き出さない（LODなど。法線はローダー側で求める）
+
+    戻り値: 実際に書き出した出力形式
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"未対応の出力形式です: {encoding}")
+    if encoding != ENCODING_PLAIN:
+        geometry = weld_mesh(mesh.triangles, normals=normals)
+        glb = pack_draco_glb(geometry) if encoding == ENCODING_DRACO else pack_quantized_glb(geometry)
+        # plain のサイズは頂点数・三角形数から概算する（比較のためだけに書き出さない）
+        if len(glb) < plain_glb_size(len(mesh.vertices), len(mesh.faces)):
+            with open(glb_path, "wb") as f:
+                f.write(glb)
+            return encoding
+    mesh.export(glb_path, file_type="glb")
+    return ENCODING_PLAIN
+
+
+def read_glb(path):
+    """
+    GLBファイルのJSONとバイナリチャンクを読み込む
+
+    戻り値: (glTF JSONの辞書, バイナリチャンクのバイト列)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, _version, _length = struct.unpack_from("<III", data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError("GLBファイルではありません")
+    gltf, binary = None, b""
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == GLB_CHUNK_JSON:
+            gltf = json.loads(chunk.decode("utf-8"))
+        elif chunk_type == GLB_CHUNK_BIN:
+            binary = chunk
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise ValueError("GLBのJSONチャンクが見つかりません")
+    return gltf, binary
+
+
+def read_draco_triangles(path):
+    """
+    Draco圧縮GLBを展開して三角形配列を取得（trimeshはDraco圧縮を読めないため）
+
+    ノード変換は考慮しない（本モジュールで書き出すDraco GLBはノード変換を持たない）
+
+    戻り値: (n, 3, 3) の頂点座標配列
+    """
+    import DracoPy
+
+    gltf, binary = read_glb(path)
+    buffer_views = gltf.get("bufferViews", [])
+    triangles = []
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            draco = primitive.get("extensions", {}).get("KHR_draco_mesh_compression")
+            if draco is None:
+                continue
+            view = buffer_views[draco["bufferView"]]
+            start = view.get("byteOffset", 0)
+            decoded = DracoPy.decode(binary[start:start + view["byteLength"]])
+            points = np.asarray(decoded.points, dtype=np.float64)
+            faces = np.asarray(decoded.faces, dtype=np.int64).reshape(-1, 3)
+            triangles.append(points[faces])
+    if not triangles:
+        raise ValueError("Draco圧縮メッシュが含まれていません")
+    return np.concatenate(triangles)
+
+
+def glb_encoding(gltf):
+    """glTF JSONの拡張から出力形式を判定"""
+    extensions = set(gltf.get("extensionsUsed", []))
+    if "KHR_draco_mesh_compression" in extensions:
+        return ENCODING_DRACO
+    if "KHR_mesh_quantization" in extensions:
+        return ENCODING_QUANTIZED
+    return ENCODING_PLAIN
@@ -0,0 +1,359 @@
+"""
+FanTestData CSV 一括取り込みコマンド
+試験機から出力したCSV（曲線はJSON配列のセル）を一定行数ずつ読み込み、検証してPostgreSQLのCOPYで登録する
+- 検証は列単位で一括: 必須項目・UUID形式・試験日・配列の解析と点数の一致・温度範囲
+- fanID・Hako・Unit・Hexの存在（参照先のテーブル）と試験IDの重複（FanTestData）は、バッチごとに1回ずつの集合クエリで確認
+- 検証を通った行はバッチごとに1回のCOPY・1トランザクションで登録
+- 不合格の行は理由を付けて別のCSV（既定: <入力ファイル名>_rejected.csv）に書き出す
+- 処理後に件数とスループット（rows/s）を表示
+
+使い方:
+    python ingest_fantestdata.py sample_data/FanTestData_upload_v2.csv
+    python ingest_fantestdata.py data.csv --batch-size 20000 --rejected rejected.csv --refresh-metrics
+"""
+
+import argparse
+import io
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+from curve_store import CurveStore
+from fan_queries import FAN_TABLE, TEST_TABLE
+from fan_test_data import CURVE_COLUMNS, TEST_ID_COLUMN
+from fan_test_metrics import refresh_metrics
+
+# COPYで登録する列（id・created_at はDB側で採番・設定）
+TABLE_COLUMNS = (
+    TEST_ID_COLUMN,
+    "fanID",
+    "FanName",
+    "TestDate",
+    "tested_at",
+    "test_facillity",
+    "comment",
+    "SingleFanTest",
+    "bellmouth",
+    "Unit",
+    "Hako",
+    "Hex",
+    "temp_o_[degC]",
+    "temp_c_[defC]",
+) + CURVE_COLUMNS
+# 値が必須の列（スキーマの NOT NULL）
+REQUIRED_COLUMNS = ("fanID", "TestDate", "SingleFanTest", "bellmouth", "temp_o_[degC]", "temp_c_[defC]", "Ps_[Pa]", "Q_[m3min]")
+TEMPERATURE_COLUMNS = ("temp_o_[degC]", "temp_c_[defC]")
+# 温度として受け付ける範囲 [°C]
+TEMPERATURE_RANGE = (-40.0, 150.0)
+BOOLEAN_VALUES = ("true", "false", "t", "f", "1", "0", "yes", "no")
+UUID_PATTERN = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+# 1回の検証・COPY・トランザクションで処理する行数
+DEFAULT_BATCH_SIZE = 5000
+# 外部キーの参照先テーブル（fanID以外。値が空欄の行は確認しない）
+HAKO_TABLE = '"Hako list"'
+UNIT_TABLE = '"Unit list"'
+HEX_TABLE = "heat_exchanger"
+REFERENCE_LABELS = {
+    "Hako": 'Hakoが"Hako list"に存在しない',
+    "Unit": 'Unitが"Unit list"に存在しない',
+    "Hex": "Hexがheat_exchangerに存在しない",
+}
+REJECT_REASON_COLUMN = "reject_reason"
+LINE_COLUMN = "line"
+
+
+def read_batches(source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    CSVを batch_size 行ずつ読み込む（全列を文字列として読み、空欄は空文字）
+
+    Args:
+        source: ファイルパスまたはファイルオブジェクト
+        batch_size: 1回に読み込む行数
+
+    戻り値: DataFrameのイテレータ（LINE_COLUMN にCSVのデータ行番号（1始まり）を付与）
+    """
+    for chunk in pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=batch_size, encoding="utf-8-sig"):
+        chunk[LINE_COLUMN] = chunk.index + 1
+        yield chunk
+
+
+def _add_reason(reasons, mask, reason):
+    """不合格の理由を該当行に追記"""
+    return reasons.where(~mask, reasons + reason + "; ")
+
+
+def _reference_keys(column, values):
+    """外部キーの値を照合用に正規化（UUIDは小文字、Unitは整数の文字列、Hexはそのまま）"""
+    if column == "Hako":
+        return values.str.lower()
+    if column == "Unit":
+        unit = pd.to_numeric(values, errors="coerce")
+        return unit.map(lambda value: str(int(value)) if pd.notna(value) else "")
+    return values
+
+
+def validate_batch(batch, lookup_fan_ids, lookup_existing_tests, lookup_references=None):
+    """
+    1バッチ分の行を列単位で一括検証
+
+    Args:
+        batch: read_batches が返すDataFrame
+        lookup_fan_ids: 関数（fanIDのリスト → "Fan list" に存在するfanIDの集合）
+        lookup_existing_tests: 関数（試験IDのリスト → FanTestData に登録済みの試験IDの集合）
+        lookup_references: {列名: 関数（値のリスト → 参照先に存在する値の集合）}（Hako・Unit・Hex。省略した列は確認しない）
+
+    戻り値: (登録する行のDataFrame（TABLE_COLUMNS）, 不合格の行のDataFrame（元の列＋REJECT_REASON_COLUMN）)
+    """
+    batch = batch.copy()
+    for column in TABLE_COLUMNS:
+        if column not in batch.columns:
+            batch[column] = ""
+        batch[column] = batch[column].str.strip()
+    reasons = pd.Series("", index=batch.index)
+
+    for column in REQUIRED_COLUMNS:
+        reasons = _add_reason(reasons, batch[column] == "", f"{column}が空")
+
+    # 試験ID（空欄はここで採番）・fanID・Hako のUUID形式
+    missing_id = batch[TEST_ID_COLUMN] == ""
+    batch.loc[missing_id, TEST_ID_COLUMN] = [str(uuid.uuid4()) for _ in range(int(missing_id.sum()))]
+    for column in (TEST_ID_COLUMN, "fanID", "Hako"):
+        invalid = (batch[column] != "") & ~batch[column].str.fullmatch(UUID_PATTERN)
+        reasons = _add_reason(reasons, invalid, f"{column}がUUID形式でない")
+    reasons = _add_reason(reasons, batch[TEST_ID_COLUMN].str.lower().duplicated(keep="first"), "試験IDがファイル内で重複")
+
+    test_date = pd.to_datetime(batch["TestDate"], errors="coerce", format="%Y-%m-%d")
+    reasons = _add_reason(reasons, (batch["TestDate"] != "") & test_date.isna(), "TestDateが日付（YYYY-MM-DD）でない")
+    reasons = _add_reason(
+        reasons,
+        (batch["SingleFanTest"] != "") & ~batch["SingleFanTest"].str.lower().isin(BOOLEAN_VALUES),
+        "SingleFanTestが真偽値でない",
+    )
+    unit = pd.to_numeric(batch["Unit"], errors="coerce")
+    reasons = _add_reason(reasons, (batch["Unit"] != "") & (unit.isna() | (unit % 1 != 0)), "Unitが整数でない")
+
+    for column in TEMPERATURE_COLUMNS:
+        temperature = pd.to_numeric(batch[column], errors="coerce")
+        reasons = _add_reason(reasons, (batch[column] != "") & temperature.isna(), f"{column}が数値でない")
+        out_of_range = (temperature < TEMPERATURE_RANGE[0]) | (temperature > TEMPERATURE_RANGE[1])
+        reasons = _add_reason(reasons, out_of_range, f"{column}が範囲外（{TEMPERATURE_RANGE[0]:g}〜{TEMPERATURE_RANGE[1]:g}）")
+
+    # 曲線: JSON配列として解析でき、数値のみで、風量と同じ点数であること（任意の列は空欄可）
+    store = CurveStore.from_frame(batch.assign(_row=np.arange(len(batch))), "_row", CURVE_COLUMNS)
+    flow_length = store.lengths("Q_[m3min]")
+    for column in CURVE_COLUMNS:
+        lengths = store.lengths(column)
+        filled = (batch[column] != "").to_numpy()
+        empty_array = batch[column].str.fullmatch(r"\[\s*\]").to_numpy()
+        reasons = _add_reason(reasons, filled & (lengths == 0) & ~empty_array, f"{column}がJSON配列でない")
+        offsets = store.offsets[column]
+        non_finite = np.zeros(len(batch), dtype=bool)
+        nonempty = lengths > 0
+        if nonempty.any():
+            non_finite[nonempty] = np.add.reduceat(~np.isfinite(store.values[column]), offsets[:-1][nonempty]) > 0
+        reasons = _add_reason(reasons, non_finite, f"{column}に数値以外の要素がある")
+        if column != "Q_[m3min]":
+            reasons = _add_reason(reasons, filled & (lengths > 0) & (lengths != flow_length), f"{column}の点数がQ_[m3min]と異なる")
+    reasons = _add_reason(reasons, (batch["Q_[m3min]"] != "") & (flow_length == 0), "Q_[m3min]の点数が0")
+
+    # 外部キー・主キーの確認（バッチ内の値をまとめて1回ずつ問い合わせ）
+    checkable = reasons == ""
+    fan_ids = batch.loc[checkable, "fanID"].str.lower()
+    known_fans = {str(fan_id).lower() for fan_id in lookup_fan_ids(sorted(set(fan_ids)))}
+    reasons = _add_reason(reasons, checkable & ~batch["fanID"].str.lower().isin(known_fans), 'fanIDが"Fan list"に存在しない')
+    for column, lookup in (lookup_references or {}).items():
+        keys = _reference_keys(column, batch[column])
+        filled = checkable & (batch[column] != "")
+        found = pd.Series([str(value) for value in lookup(sorted(set(keys[filled])))], dtype=object)
+        known = set(_reference_keys(column, found))
+        reasons = _add_reason(reasons, filled & ~keys.isin(known), REFERENCE_LABELS[column])
+    test_ids = batch.loc[checkable, TEST_ID_COLUMN].str.lower()
+    existing = {str(test_id).lower() for test_id in lookup_existing_tests(sorted(set(test_ids)))}
+    reasons = _add_reason(reasons, checkable & batch[TEST_ID_COLUMN].str.lower().isin(existing), "試験IDが登録済み")
+
+    valid = reasons == ""
+    rejected = batch.loc[~valid].assign(**{REJECT_REASON_COLUMN: reasons[~valid].str.rstrip("; ")})
+    return batch.loc[valid, list(TABLE_COLUMNS)], rejected
+
+
+def copy_sql():
+    """FanTestDataへのCOPY文（CSV形式。引用符なしの空欄はNULL）"""
+    columns = ", ".join('"' + column.replace('"', '""') + '"' for column in TABLE_COLUMNS)
+    return f"COPY {TEST_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+
+def copy_batch(engine, rows):
+    """
+    検証済みの行を1回のCOPY・1トランザクションで登録
+
+    Args:
+        engine: SQLAlchemyのエンジン（psycopg2）
+        rows: TABLE_COLUMNS の列を持つDataFrame
+    """
+    buffer = io.StringIO()
+    rows.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.copy_expert(copy_sql(), buffer)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def _lookup(engine, sql, ids):
+    """値（UUIDなど）のリストを渡して1列の結果を集合で取得"""
+    if not ids:
+        return set()
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(text(sql), {"ids": list(ids)})}
+
+
+def lookup_fan_ids(engine, fan_ids):
+    """"Fan list" に存在するfanIDの集合（1回のクエリ）"""
+    return _lookup(
+        engine,
+        f'SELECT CAST("fanID" AS text) FROM {FAN_TABLE} WHERE "fanID" = ANY(CAST(:ids AS uuid[]));',
+        fan_ids,
+    )
+
+
+def lookup_hako_ids(engine, hako_ids):
+    """"Hako list" に存在するhakoIDの集合（1回のクエリ）"""
+    return _lookup(
+        engine,
+        f'SELECT CAST("hakoID" AS text) FROM {HAKO_TABLE} WHERE "hakoID" = ANY(CAST(:ids AS uuid[]));',
+        hako_ids,
+    )
+
+
+def lookup_unit_ids(engine, unit_ids):
+    """"Unit list" に存在するidの集合（1回のクエリ）"""
+    return _lookup(
+        engine,
+        f"SELECT CAST(id AS text) FROM {UNIT_TABLE} WHERE id = ANY(CAST(:ids AS bigint[]));",
+        unit_ids,
+    )
+
+
+def lookup_hex_ids(engine, hex_ids):
+    """heat_exchanger に存在する熱交_idの集合（1回のクエリ）"""
+    return _lookup(
+        engine,
+        f'SELECT "熱交_id" FROM {HEX_TABLE} WHERE "熱交_id" = ANY(CAST(:ids AS text[]));',
+        hex_ids,
+    )
+
+
+def lookup_existing_tests(engine, test_ids):
+    """FanTestData に登録済みの試験IDの集合（1回のクエリ）"""
+    return _lookup(
+        engine,
+        f'SELECT CAST("{TEST_ID_COLUMN}" AS text) FROM {TEST_TABLE} '
+        f'WHERE "{TEST_ID_COLUMN}" = ANY(CAST(:ids AS uuid[]));',
+        test_ids,
+    )
+
+
+def ingest_csv(engine, source, rejected_path=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    CSVを一定行数ずつ検証してFanTestDataに登録
+
+    COPYに失敗したバッチは、そのバッチの全行を理由付きで不合格として続行する
+
+    Args:
+        engine: SQLAlchemyのエンジン（psycopg2）
+        source: CSVのファイルパスまたはファイルオブジェクト
+        rejected_path: 不合格の行を書き出すCSVのパス（Noneなら書き出さない）
+        batch_size: 1回に処理する行数
+        progress: 進捗通知関数 progress(集計の辞書)（Noneなら通知しない）
+
+    戻り値: 集計の辞書（rows, loaded, rejected, seconds, rows_per_second, rejected_path）
+    """
+    started = time.perf_counter()
+    report = {"rows": 0, "loaded": 0, "rejected": 0, "seconds": 0.0, "rows_per_second": 0.0, "rejected_path": None}
+    rejected_header = True
+
+    for batch in read_batches(source, batch_size):
+        rows, rejected = validate_batch(
+            batch,
+            lambda ids: lookup_fan_ids(engine, ids),
+            lambda ids: lookup_existing_tests(engine, ids),
+            {
+                "Hako": lambda ids: lookup_hako_ids(engine, ids),
+                "Unit": lambda ids: lookup_unit_ids(engine, ids),
+                "Hex": lambda ids: lookup_hex_ids(engine, ids),
+            },
+        )
+        if len(rows) > 0:
+            try:
+                copy_batch(engine, rows)
+            except Exception as e:
+                failed = batch.loc[rows.index].assign(**{REJECT_REASON_COLUMN: f"COPY失敗: {str(e).strip()}"})
+                rejected = pd.concat([rejected, failed]).sort_values(LINE_COLUMN)
+                rows = rows.iloc[0:0]
+
+        if len(rejected) > 0 and rejected_path is not None:
+            rejected.to_csv(rejected_path, mode="w" if rejected_header else "a", header=rejected_header, index=False)
+            rejected_header = False
+            report["rejected_path"] = str(rejected_path)
+
+        report["rows"] += len(batch)
+        report["loaded"] += len(rows)
+        report["rejected"] += len(rejected)
+        report["seconds"] = time.perf_counter() - started
+        report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] > 0 else 0.0
+        if progress is not None:
+            progress(dict(report))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FanTestDataのCSVを検証してCOPYで一括登録")
+    parser.add_argument("csv", help="取り込むCSVファイル")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1回に検証・登録する行数")
+    parser.add_argument("--rejected", default=None, help="不合格の行を書き出すCSV（既定: <入力ファイル名>_rejected.csv）")
+    parser.add_argument("--url", default=None, help="データベースURL（省略時は .streamlit/secrets.toml の postgresql 接続）")
+    parser.add_argument("--refresh-metrics", action="store_true", help="登録後に性能指標（FanTestMetrics）を更新")
+    args = parser.parse_args(argv)
+
+    source = Path(args.csv)
+    if not source.is_file():
+        print(f"ファイルが見つかりません: {source}", file=sys.stderr)
+        return 1
+    rejected_path = Path(args.rejected) if args.rejected else source.with_name(f"{source.stem}_rejected.csv")
+    # 前回の不合格ファイルが残っていれば今回の結果で置き換える
+    rejected_path.unlink(missing_ok=True)
+
+    conn = st.connection("postgresql", type="sql", **({"url": args.url} if args.url else {}))
+    report = ingest_csv(
+        conn.engine,
+        source,
+        rejected_path=rejected_path,
+        batch_size=args.batch_size,
+        progress=lambda r: print(f"  {r['rows']} 行処理（登録 {r['loaded']}、不合格 {r['rejected']}）", flush=True),
+    )
+
+    print()
+    print(f"読み込み: {report['rows']} 行 / 登録: {report['loaded']} 行 / 不合格: {report['rejected']} 行")
+    print(f"処理時間: {report['seconds']:.1f} 秒（{report['rows_per_second']:.0f} rows/s）")
+    if report["rejected_path"]:
+        print(f"不合格の行: {report['rejected_path']}")
+
+    if args.refresh_metrics and report["loaded"] > 0:
+        print(f"性能指標を {refresh_metrics(conn.session)} 件計算しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
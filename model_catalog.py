@@ -0,0 +1,642 @@
+"""
+モデルカタログモジュール
+modelsディレクトリの.glbファイル情報をSQLiteに記録し、再実行ごとのディレクトリ走査を不要にする
+- 変更（サイズ・mtime）のあったファイルだけを再解析する差分更新（JSONチャンクとstatのみ読む）
+- 定期的な再走査・SHA-256・サムネイルの作成はバックグラウンドのスレッドで行い、ページはSQLiteの内容のみを読む
+- 名前・ステム・前方一致による解決はインデックス検索（O(log n)）
+"""
+
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+import streamlit as st
+
+from glb_cache import file_sha256
+from glb_writer import glb_encoding
+from model_lod import base_glb_path, lod_level
+from thumbnails import ensure_thumbnail
+
+CATALOG_FILENAME = ".catalog.sqlite"
+# ディレクトリ再走査の最小間隔（秒）。この間はカタログのみを参照する
+CATALOG_REFRESH_INTERVAL = float(os.environ.get("MODEL_CATALOG_REFRESH_INTERVAL", "30"))
+# バックグラウンドでハッシュ・サムネイルを作成するときに1回で取り出すモデル数
+BACKFILL_BATCH_SIZE = 100
+# 識別子の一括検索で1回のクエリに渡す値の数（SQLiteのパラメータ数の上限以下）
+LOOKUP_CHUNK_SIZE = 500
+
+GLB_MAGIC = 0x46546C67  # "glTF"
+GLB_CHUNK_JSON = 0x4E4F534A  # "JSON"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    stem_lower TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    vertices INTEGER,
+    triangles INTEGER,
+    bbox_min_x REAL, bbox_min_y REAL, bbox_min_z REAL,
+    bbox_max_x REAL, bbox_max_y REAL, bbox_max_z REAL,
+    center_x REAL, center_y REAL, center_z REAL,
+    lods TEXT,
+    encoding TEXT,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_models_name_lower ON models(name_lower);
+CREATE INDEX IF NOT EXISTS idx_models_stem_lower ON models(stem_lower);
+CREATE INDEX IF NOT EXISTS idx_models_sha256 ON models(sha256);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 既存カタログに後から追加した列（列名: 型）
+_ADDED_COLUMNS = {
+    "lods": "TEXT",
+    "encoding": "TEXT",
+}
+
+
+# =======================
+# GLB解析（JSONチャンクのみ読み込む）
+# =======================
+def _identity_matrix():
+    return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def _multiply_matrix(a, b):
+    """列優先4x4行列の積 a * b"""
+    result = [0.0] * 16
+    for col in range(4):
+        for row in range(4):
+            result[col * 4 + row] = sum(a[k * 4 + row] * b[col * 4 + k] for k in range(4))
+    return result
+
+
+def _node_matrix(node):
+    """glTFノードのローカル変換行列（列優先）"""
+    if "matrix" in node:
+        return [float(v) for v in node["matrix"]]
+
+    tx, ty, tz = node.get("translation", [0.0, 0.0, 0.0])
+    qx, qy, qz, qw = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    sx, sy, sz = node.get("scale", [1.0, 1.0, 1.0])
+    return [
+        (1 - 2 * (qy * qy + qz * qz)) * sx, 2 * (qx * qy + qz * qw) * sx, 2 * (qx * qz - qy * qw) * sx, 0.0,
+        2 * (qx * qy - qz * qw) * sy, (1 - 2 * (qx * qx + qz * qz)) * sy, 2 * (qy * qz + qx * qw) * sy, 0.0,
+        2 * (qx * qz + qy * qw) * sz, 2 * (qy * qz - qx * qw) * sz, (1 - 2 * (qx * qx + qy * qy)) * sz, 0.0,
+        tx, ty, tz, 1.0,
+    ]
+
+
+def _transform_point(matrix, point):
+    x, y, z = point
+    return (
+        matrix[0] * x + matrix[4] * y + matrix[8] * z + matrix[12],
+        matrix[1] * x + matrix[5] * y + matrix[9] * z + matrix[13],
+        matrix[2] * x + matrix[6] * y + matrix[10] * z + matrix[14],
+    )
+
+
+def read_glb_json(path):
+    """GLBファイルのJSONチャンクを読み込む（バイナリチャンクは読まない）"""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError("GLBヘッダーが不正です")
+        magic, _version, _length = struct.unpack("<III", header)
+        if magic != GLB_MAGIC:
+            raise ValueError("GLBファイルではありません")
+        chunk_length, chunk_type = struct.unpack("<II", f.read(8))
+        if chunk_type != GLB_CHUNK_JSON:
+            raise ValueError("GLBのJSONチャンクが見つかりません")
+        return json.loads(f.read(chunk_length).decode("utf-8"))
+
+
+def inspect_glb(path):
+    """
+    GLBファイルの頂点数・三角形数・バウンディングボックスを取得
+
+    アクセサのmin/maxとノード変換から計算するため、頂点データは読み込まない
+
+    Args:
+        path: GLBファイルのパス
+
+    戻り値: 解析結果の辞書（vertices, triangles, bbox_min, bbox_max, center, encoding）
+    """
+    gltf = read_glb_json(path)
+    accessors = gltf.get("accessors", [])
+    meshes = gltf.get("meshes", [])
+    nodes = gltf.get("nodes", [])
+
+    vertices = 0
+    triangles = 0
+    for mesh in meshes:
+        for primitive in mesh.get("primitives", []):
+            position_index = primitive.get("attributes", {}).get("POSITION")
+            if position_index is None:
+                continue
+            position_count = accessors[position_index]["count"]
+            vertices += position_count
+            if primitive.get("mode", 4) == 4:
+                if "indices" in primitive:
+                    triangles += accessors[primitive["indices"]]["count"] // 3
+                else:
+                    triangles += position_count // 3
+
+    # シーンのノード階層をたどり、各メッシュのバウンディングボックスをワールド座標に変換
+    bbox_min = [float("inf")] * 3
+    bbox_max = [float("-inf")] * 3
+    scenes = gltf.get("scenes", [])
+    if scenes:
+        root_nodes = scenes[gltf.get("scene", 0)].get("nodes", [])
+    else:
+        root_nodes = list(range(len(nodes)))
+
+    stack = [(index, _identity_matrix()) for index in root_nodes]
+    while stack:
+        node_index, parent_matrix = stack.pop()
+        node = nodes[node_index]
+        world = _multiply_matrix(parent_matrix, _node_matrix(node))
+        if "mesh" in node:
+            for primitive in meshes[node["mesh"]].get("primitives", []):
+                position_index = primitive.get("attributes", {}).get("POSITION")
+                if position_index is None:
+                    continue
+                accessor = accessors[position_index]
+                if "min" not in accessor or "max" not in accessor:
+                    continue
+                lo, hi = accessor["min"], accessor["max"]
+                for corner in ((x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])):
+                    point = _transform_point(world, corner)
+                    for axis in range(3):
+                        bbox_min[axis] = min(bbox_min[axis], point[axis])
+                        bbox_max[axis] = max(bbox_max[axis], point[axis])
+        for child in node.get("children", []):
+            stack.append((child, world))
+
+    if bbox_min[0] == float("inf"):
+        bbox_min = bbox_max = center = [None, None, None]
+    else:
+        center = [(lo + hi) / 2 for lo, hi in zip(bbox_min, bbox_max)]
+
+    return {
+        "vertices": vertices,
+        "triangles": triangles,
+        "bbox_min": bbox_min,
+        "bbox_max": bbox_max,
+        "center": center,
+        "encoding": glb_encoding(gltf),
+    }
+
+
+# =======================
+# カタログ本体
+# =======================
+class ModelCatalog:
+    """
+    modelsディレクトリ単位のモデルカタログ（SQLite）
+
+    Args:
+        models_dir: モデルディレクトリ
+        db_path: カタログファイル（省略時は models_dir/.catalog.sqlite）
+    """
+
+    def __init__(self, models_dir="models", db_path=None):
+        self.models_dir = Path(models_dir)
+        self.db_path = Path(db_path) if db_path else self.models_dir / CATALOG_FILENAME
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._backfill_lock = threading.Lock()
+        self._backfill_thread = None
+        self._rescan_requested = False
+        if self.models_dir.exists():
+            with closing(self._connect()) as conn:
+                self._apply_schema(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _apply_schema(self, conn):
+        """テーブル作成と、古いカタログへの列追加（追加した列を埋めるため全件を再解析させる）"""
+        conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(models)")}
+        added = [column for column in _ADDED_COLUMNS if column not in existing]
+        if added:
+            with conn:
+                for column in added:
+                    conn.execute(f"ALTER TABLE models ADD COLUMN {column} {_ADDED_COLUMNS[column]}")
+                conn.execute("UPDATE models SET mtime_ns = -1")
+
+    # ---------- 更新 ----------
+    def _scan_files(self):
+        """
+        ディレクトリを再帰走査
+
+        戻り値: ({相対パス: (size, mtime_ns)}, {元GLBの相対パス: [(レベル, LODの相対パス, size)]})
+        """
+        found = {}
+        lods = {}
+        stack = [self.models_dir]
+        while stack:
+            directory = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(Path(entry.path))
+                    elif entry.name.lower().endswith(".glb"):
+                        stat_result = entry.stat()
+                        relative = Path(entry.path).relative_to(self.models_dir).as_posix()
+                        level = lod_level(relative)
+                        if level is None:
+                            found[relative] = (stat_result.st_size, stat_result.st_mtime_ns)
+                        else:
+                            # LODファイルはモデル一覧に出さず、元GLBの付属情報として記録
+                            base = base_glb_path(relative).as_posix()
+                            lods.setdefault(base, []).append((level, relative, stat_result.st_size))
+        return found, {base: sorted(entries) for base, entries in lods.items()}
+
+    def _build_lods(self, lod_files):
+        """LODファイル一覧をカタログ保存用のJSONに変換（粗い順）"""
+        if not lod_files:
+            return None
+        lods = []
+        for level, relative, size in sorted(lod_files, reverse=True):
+            try:
+                triangles = inspect_glb(self.models_dir / relative)["triangles"]
+            except (ValueError, KeyError, IndexError, struct.error, UnicodeDecodeError):
+                triangles = None
+            lods.append({"level": level, "path": relative, "size": size, "triangles": triangles})
+        return json.dumps(lods)
+
+    @staticmethod
+    def _lod_signature(lods_json):
+        """LOD情報の比較用キー（レベル・パス・サイズ、粗い順）"""
+        if not lods_json:
+            return []
+        return [(lod["level"], lod["path"], lod["size"]) for lod in json.loads(lods_json)]
+
+    def _build_row(self, relative, size, mtime_ns, lod_files=None):
+        file_path = self.models_dir / relative
+        name = Path(relative).name
+        # SHA-256（ファイル全体の読み込み）とサムネイル（描画）は backfill で後から作成する
+        row = {
+            "path": relative,
+            "name": name,
+            "name_lower": name.lower(),
+            "stem_lower": Path(relative).stem.lower(),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": None,
+            "vertices": None,
+            "triangles": None,
+            "bbox_min_x": None, "bbox_min_y": None, "bbox_min_z": None,
+            "bbox_max_x": None, "bbox_max_y": None, "bbox_max_z": None,
+            "center_x": None, "center_y": None, "center_z": None,
+            "lods": self._build_lods(lod_files),
+            "encoding": None,
+            "scanned_at": time.time(),
+        }
+        try:
+            info = inspect_glb(file_path)
+        except (ValueError, KeyError, IndexError, struct.error, UnicodeDecodeError):
+            # 解析できないGLBもパスは登録する
+            return row
+
+        row["encoding"] = info["encoding"]
+        row["vertices"] = info["vertices"]
+        row["triangles"] = info["triangles"]
+        for axis, (lo, hi, mid) in zip("xyz", zip(info["bbox_min"], info["bbox_max"], info["center"])):
+            row[f"bbox_min_{axis}"] = lo
+            row[f"bbox_max_{axis}"] = hi
+            row[f"center_{axis}"] = mid
+        return row
+
+    def refresh(self, start_backfill=True):
+        """
+        カタログを差分更新（追加・変更されたファイルのみ再解析、削除されたファイルは除去）
+
+        ファイルの読み込みはGLBのJSONチャンクのみ。ハッシュ・サムネイルは更新後にバックグラウンドで作成する
+
+        Args:
+            start_backfill: 更新後にハッシュ・サムネイルの作成をバックグラウンドで開始するか
+
+        戻り値: {'added': n, 'updated': n, 'removed': n}
+        """
+        result = {"added": 0, "updated": 0, "removed": 0}
+        if not self.models_dir.exists():
+            return result
+
+        with self._refresh_lock:
+            found, found_lods = self._scan_files()
+            with closing(self._connect()) as conn:
+                self._apply_schema(conn)
+                known = {}
+                known_lods = {}
+                for row in conn.execute("SELECT path, size, mtime_ns, lods FROM models"):
+                    known[row["path"]] = (row["size"], row["mtime_ns"])
+                    known_lods[row["path"]] = self._lod_signature(row["lods"])
+
+                changed_rows = []
+                lod_updates = []
+                for relative, version in found.items():
+                    lod_files = found_lods.get(relative, [])
+                    if known.get(relative) != version:
+                        changed_rows.append(self._build_row(relative, *version, lod_files))
+                        result["updated" if relative in known else "added"] += 1
+                    elif known_lods[relative] != sorted(lod_files, reverse=True):
+                        # 元GLBはそのままでLODだけが追加・更新された場合
+                        lod_updates.append((self._build_lods(lod_files), relative))
+                        result["updated"] += 1
+                removed = [relative for relative in known if relative not in found]
+                result["removed"] = len(removed)
+
+                if changed_rows or lod_updates or removed:
+                    with conn:
+                        if changed_rows:
+                            columns = list(changed_rows[0].keys())
+                            conn.executemany(
+                                f"INSERT OR REPLACE INTO models ({', '.join(columns)}) "
+                                f"VALUES ({', '.join(':' + c for c in columns)})",
+                                changed_rows,
+                            )
+                        if lod_updates:
+                            conn.executemany("UPDATE models SET lods = ? WHERE path = ?", lod_updates)
+                        if removed:
+                            conn.executemany("DELETE FROM models WHERE path = ?", [(r,) for r in removed])
+                        conn.execute(
+                            "INSERT INTO catalog_meta (key, value) VALUES ('version', '1') "
+                            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+                        )
+
+            self._last_refresh = time.monotonic()
+        if start_backfill:
+            self.start_backfill()
+        return result
+
+    def _run_background(self):
+        """バックグラウンドのスレッドの処理（要求があれば再走査し、その後ハッシュ・サムネイルを作成）"""
+        try:
+            while True:
+                with self._backfill_lock:
+                    rescan = self._rescan_requested
+                    self._rescan_requested = False
+                if rescan:
+                    try:
+                        self.refresh(start_backfill=False)
+                    except OSError:
+                        # 走査中にディレクトリが消えた場合などは次回の要求で再試行する
+                        pass
+                self.backfill()
+                with self._backfill_lock:
+                    if not self._rescan_requested:
+                        self._backfill_thread = None
+                        return
+        finally:
+            # 例外で終了した場合も次の要求で新しいスレッドを開始できるようにする
+            with self._backfill_lock:
+                if self._backfill_thread is threading.current_thread():
+                    self._backfill_thread = None
+
+    def backfill(self):
+        """
+        SHA-256が未計算のモデルのハッシュとサムネイルを順に作成（更新のロックは取らない）
+
+        作成中にファイルが変わったモデルは飛ばす（次回の更新で再び対象になる）
+
+        戻り値: ハッシュを記録したモデル数
+        """
+        done = 0
+        skipped = set()
+        while self.db_path.exists():
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT path, size, mtime_ns FROM models WHERE sha256 IS NULL ORDER BY path LIMIT ?",
+                    (BACKFILL_BATCH_SIZE + len(skipped),),
+                ).fetchall()
+            rows = [row for row in rows if row["path"] not in skipped]
+            if not rows:
+                break
+            for row in rows:
+                file_path = self.models_dir / row["path"]
+                try:
+                    stat_result = file_path.stat()
+                    if (stat_result.st_size, stat_result.st_mtime_ns) != (row["size"], row["mtime_ns"]):
+                        skipped.add(row["path"])
+                        continue
+                    sha256 = file_sha256(file_path)
+                except OSError:
+                    skipped.add(row["path"])
+                    continue
+                # サムネイルはハッシュ単位でキャッシュされるため、変換時に作成済みなら描画しない
+                ensure_thumbnail(file_path, sha256)
+                with closing(self._connect()) as conn, conn:
+                    updated = conn.execute(
+                        "UPDATE models SET sha256 = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+                        (sha256, row["path"], row["size"], row["mtime_ns"]),
+                    ).rowcount
+                if updated:
+                    done += 1
+                else:
+                    skipped.add(row["path"])
+        return done
+
+    def start_backfill(self, rescan=False):
+        """
+        バックグラウンドのスレッドでハッシュ・サムネイルの作成を開始（実行中なら要求だけ追加）
+
+        Args:
+            rescan: Trueなら先にディレクトリを再走査する
+        """
+        with self._backfill_lock:
+            self._rescan_requested = self._rescan_requested or rescan
+            if self._backfill_thread is not None:
+                return
+            self._backfill_thread = threading.Thread(
+                target=self._run_background,
+                name="model-catalog-backfill",
+                daemon=True,
+            )
+            self._backfill_thread.start()
+
+    def wait_background(self, timeout=None):
+        """バックグラウンドの処理の完了を待つ（CLI・テスト用）"""
+        with self._backfill_lock:
+            thread = self._backfill_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def refresh_if_stale(self, max_age=CATALOG_REFRESH_INTERVAL):
+        """前回の走査からmax_age秒以上経過していれば、バックグラウンドで差分更新を開始（完了は待たない）"""
+        if time.monotonic() - self._last_refresh >= max_age:
+            # 走査が終わるまでに次の要求が重ならないよう、開始時点で時刻を進める
+            self._last_refresh = time.monotonic()
+            self.start_backfill(rescan=True)
+
+    # ---------- 参照 ----------
+    @property
+    def version(self):
+        """カタログの更新番号（内容が変わるたびに増える）"""
+        if not self.db_path.exists():
+            return 0
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def _absolute(self, record):
+        record = dict(record)
+        record["file_path"] = self.models_dir / record["path"]
+        record["lods"] = [
+            dict(lod, file_path=self.models_dir / lod["path"])
+            for lod in json.loads(record["lods"] or "[]")
+        ]
+        return record
+
+    @staticmethod
+    def _search_clause(search):
+        """パスの部分一致検索のWHERE句（大文字小文字を区別しない）"""
+        if not search:
+            return "", ()
+        return "WHERE path LIKE ? ESCAPE '\\'", (
+            "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",
+        )
+
+    def list_models(self, limit=None, offset=0, search=None):
+        """
+        登録済みモデルをパス順に取得（各要素は辞書、file_pathにファイルパス）
+
+        Args:
+            limit: 取得件数（Noneなら全件）
+            offset: 先頭から読み飛ばす件数
+            search: パスの部分一致検索文字列（大文字小文字を区別しない）
+
+        戻り値: モデル情報の辞書のリスト
+        """
+        if not self.db_path.exists():
+            return []
+        where, params = self._search_clause(search)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM models {where} ORDER BY path LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else int(limit), int(offset)),
+            ).fetchall()
+        return [self._absolute(row) for row in rows]
+
+    def count_models(self, search=None):
+        """登録済みモデルの件数（search はパスの部分一致検索文字列）"""
+        if not self.db_path.exists():
+            return 0
+        where, params = self._search_clause(search)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM models {where}", params).fetchone()[0]
+
+    def first_paths(self, column, values):
+        """
+        ファイル名・ステム（小文字）ごとに、一致するモデルのうちパス順で先頭のものの相対パスを取得
+
+        Args:
+            column: "name_lower" または "stem_lower"
+            values: 検索する値
+
+        戻り値: {値: 相対パス}（一致しない値は含まない）
+        """
+        if column not in ("name_lower", "stem_lower"):
+            raise ValueError(f"検索できない列です: {column}")
+        values = list(dict.fromkeys(values))
+        if not values or not self.db_path.exists():
+            return {}
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+                rows = conn.execute(
+                    f"SELECT {column} AS value, MIN(path) AS path FROM models "
+                    f"WHERE {column} IN ({', '.join('?' * len(chunk))}) GROUP BY {column}",
+                    chunk,
+                ).fetchall()
+                found.update((row["value"], row["path"]) for row in rows)
+        return found
+
+    def get(self, relative_path):
+        """相対パスでモデル情報を取得（見つからなければNone）"""
+        if not self.db_path.exists():
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM models WHERE path = ?", (relative_path,)).fetchone()
+        return self._absolute(row) if row else None
+
+    def resolve(self, model_identifier):
+        """
+        モデル識別子から.glbを解決（ファイル名 → ステム → ステム前方一致の順）
+
+        Args:
+            model_identifier: ファイル名・ステム・ファン名などの識別子
+
+        戻り値: モデル情報の辞書（見つからなければNone）
+        """
+        if not self.db_path.exists():
+            return None
+
+        raw = Path(str(model_identifier))
+        stem = raw.stem.lower() if raw.suffix.lower() == ".glb" else raw.name.lower()
+        with closing(self._connect()) as conn:
+            row = None
+            if raw.suffix.lower() == ".glb":
+                row = conn.execute(
+                    "SELECT * FROM models WHERE name_lower = ? ORDER BY path LIMIT 1",
+                    (raw.name.lower(),),
+                ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT * FROM models WHERE stem_lower = ? ORDER BY path LIMIT 1",
+                    (stem,),
+                ).fetchone()
+            if row is None and stem:
+                # 前方一致（インデックスの範囲検索）
+                row = conn.execute(
+                    "SELECT * FROM models WHERE stem_lower >= ? AND stem_lower < ? "
+                    "ORDER BY stem_lower, path LIMIT 1",
+                    (stem, stem + "\U0010ffff"),
+                ).fetchone()
+        return self._absolute(row) if row else None
+
+
+@st.cache_resource
+def get_model_catalog(models_dir="models"):
+    """
+    モデルカタログを取得（プロセス内で共有）
+
+    カタログが空（初回起動）の場合のみ登録が終わるまで待ち、それ以外は差分更新をバックグラウンドで行う
+
+    Args:
+        models_dir: モデルディレクトリ
+
+    戻り値: ModelCatalog
+    """
+    catalog = ModelCatalog(models_dir)
+    if catalog.count_models() == 0:
+        catalog.refresh()
+    else:
+        catalog.start_backfill(rescan=True)
+    return catalog
+
+
+def load_model_catalog(models_dir="models"):
+    """カタログを取得し、一定間隔を過ぎていればバックグラウンドで差分更新を開始して返す（待たない）"""
+    catalog = get_model_catalog(str(models_dir))
+    catalog.refresh_if_stale()
+    return catalog
@@ -0,0 +1,89 @@
+"""
+LOD（詳細度）モジュール
+変換時に面数を減らしたGLB（<名前>.lod1.glb, <名前>.lod2.glb ...）を生成し、ビューアは粗いものから順に読み込む
+- 簡略化は trimesh の二次誤差メトリクス（quadric decimation）を使用
+- LODファイルは元GLBと同じディレクトリに置き、命名規則で対応付ける
+"""
+
+import re
+from pathlib import Path
+
+# LODレベルと元メッシュに対する面数の割合（レベル0は元のGLB = 100%）
+LOD_LEVELS = {
+    1: 0.25,
+    2: 0.05,
+}
+# これより少ない面数になるLODは作らない（小さいモデルは元のGLBのみで十分）
+LOD_MIN_FACES = 500
+# 簡略化しても1つ細かいレベルの面数のこの割合を超える場合は、そのレベルを作らない
+LOD_MAX_FACE_RATIO = 0.8
+
+_LOD_SUFFIX = re.compile(r"\.lod(\d+)\.glb$", re.IGNORECASE)
+
+
+def lod_path(glb_path, level):
+    """LODファイルのパス（例: fan.glb → fan.lod1.glb）"""
+    glb_path = Path(glb_path)
+    return glb_path.with_name(f"{glb_path.stem}.lod{level}.glb")
+
+
+def lod_level(path):
+    """LODファイルのレベルを取得（LODファイルでなければNone）"""
+    match = _LOD_SUFFIX.search(Path(path).name)
+    return int(match.group(1)) if match else None
+
+
+def base_glb_path(path):
+    """LODファイルから元GLBのパスを取得"""
+    path = Path(path)
+    return path.with_name(_LOD_SUFFIX.sub(".glb", path.name))
+
+
+def find_lod_paths(glb_path):
+    """
+    存在するLODファイルを取得
+
+    Args:
+        glb_path: 元GLBのパス
+
+    戻り値: [(レベル, パス)] 粗い順（レベルの大きい順）
+    """
+    lods = [(level, lod_path(glb_path, level)) for level in LOD_LEVELS]
+    return sorted(((level, path) for level, path in lods if path.exists()), reverse=True)
+
+
+def generate_lods(mesh, glb_path, writer=None, progress=None):
+    """
+    メッシュからLODファイルを生成
+
+    Args:
+        mesh: trimesh.Trimesh（頂点結合済みのもの）
+        glb_path: 元GLBのパス（LODは同じディレクトリに出力）
+        writer: 書き出し関数 writer(mesh, path)（省略時は trimesh の export）
+        progress: 進捗通知関数 progress(レベル, 面数)（省略可）
+
+    戻り値: [(レベル, パス, 面数)] 生成したLOD
+    """
+    generated = []
+    face_count = len(mesh.faces)
+    previous_faces = face_count
+    for level, ratio in sorted(LOD_LEVELS.items()):
+        target = int(face_count * ratio)
+        path = lod_path(glb_path, level)
+        # 古いLODが残っていると元モデルと食い違うため、作らないレベルは削除
+        path.unlink(missing_ok=True)
+        if target < LOD_MIN_FACES:
+            continue
+        if progress is not None:
+            progress(level, target)
+        simplified = mesh.simplify_quadric_decimation(face_count=target)
+        if len(simplified.faces) > previous_faces * LOD_MAX_FACE_RATIO:
+            # 形状の制約でこれ以上減らせない場合は、同じようなLODを重ねて読み込ませない
+            continue
+        previous_faces = len(simplified.faces)
+        if writer is None:
+            simplified.export(str(path))
+        else:
+            writer(simplified, path)
+        generated.append((level, path, len(simplified.faces)))
+    return generated
@@ -0,0 +1,153 @@
+"""
+試験データ → 3Dモデル解決モジュール
+FanTestDataの各行（モデル列・FanName・fanIDなど）に対応する.glbを一括で解決する
+- データに現れる識別子（ユニーク値）だけをカタログのインデックスで一括検索し、DataFrame全体をベクトル演算で突き合わせる
+- 結果は試験データ・カタログの版ごとにキャッシュされ、ファイルシステムには触れない
+"""
+
+import pandas as pd
+import streamlit as st
+
+from model_catalog import get_model_catalog, load_model_catalog
+
+# モデル識別子として参照する列（優先順）
+MODEL_IDENTIFIER_COLUMNS = [
+    "model",
+    "Model",
+    "model_name",
+    "ModelName",
+    "model_path",
+    "model_glb",
+    "FanModel",
+    "fan_model",
+    "fan_model_name",
+    "FanName",
+    "fanID",
+    "id",
+]
+
+
+def lookup_identifiers(models_dir, names, stems):
+    """
+    ファイル名・ステム（小文字）をカタログで一括検索（カタログ全件は読み込まない）
+
+    Args:
+        models_dir: モデルディレクトリ
+        names: 検索するファイル名（.glb付き）
+        stems: 検索するステム
+
+    戻り値: (ファイル名→パス, ステム→パス) の辞書タプル（一致したもののみ）
+    """
+    catalog = get_model_catalog(models_dir)
+    # 同名が複数ある場合はパス順で先頭のものを採用（カタログ解決と同じ規則）
+    name_map = {
+        name: str(catalog.models_dir / path) for name, path in catalog.first_paths("name_lower", names).items()
+    }
+    stem_map = {
+        stem: str(catalog.models_dir / path) for stem, path in catalog.first_paths("stem_lower", stems).items()
+    }
+    return name_map, stem_map
+
+
+def _normalize_column(values):
+    """識別子列を (元の文字列, 有効な行, 小文字のファイル名, .glbか, ステム) に変換"""
+    text = values.astype("string").str.strip()
+    valid = (values.notna() & text.ne("")).fillna(False).astype(bool)
+
+    lower = text.str.lower().str.rsplit("/", n=1).str[-1]
+    is_glb = lower.str.endswith(".glb").fillna(False).astype(bool)
+    stem = lower.where(~is_glb, lower.str[:-4])
+    return text, valid, lower, is_glb, stem
+
+
+def _resolve_column(values, name_map, stem_map, prefix_lookup):
+    """識別子列を一括でパスに変換（解決できない行はNA）"""
+    text, valid, lower, is_glb, stem = _normalize_column(values)
+
+    paths = lower.where(is_glb).map(name_map)
+    paths = paths.fillna(stem.map(stem_map))
+
+    # 完全一致しなかった識別子のみ、ユニーク値単位で前方一致検索
+    missing = valid & paths.isna()
+    if missing.any():
+        unique_stems = stem[missing].dropna().unique()
+        prefix_map = {value: prefix_lookup(value) for value in unique_stems}
+        paths = paths.fillna(stem.map(prefix_map))
+
+    return text.where(valid), paths.where(valid)
+
+
+@st.cache_data(show_spinner=False)
+def _resolve_model_paths(identifier_df, models_dir, catalog_version):
+    # 全列に現れる識別子のユニーク値だけを検索する
+    names, stems = set(), set()
+    for column in identifier_df.columns:
+        _, valid, lower, is_glb, stem = _normalize_column(identifier_df[column])
+        names.update(lower[valid & is_glb].dropna().unique())
+        stems.update(stem[valid].dropna().unique())
+    name_map, stem_map = lookup_identifiers(models_dir, sorted(names), sorted(stems))
+    catalog = get_model_catalog(models_dir)
+
+    def prefix_lookup(stem):
+        record = catalog.resolve(stem)
+        return str(record['file_path']) if record else None
+
+    identifiers = pd.Series(pd.NA, index=identifier_df.index, dtype="object")
+    first_identifiers = pd.Series(pd.NA, index=identifier_df.index, dtype="object")
+    paths = pd.Series(pd.NA, index=identifier_df.index, dtype="object")
+
+    # 優先順に列を評価し、まだ解決していない行だけを埋める
+    for column in identifier_df.columns:
+        column_identifiers, column_paths = _resolve_column(
+            identifier_df[column], name_map, stem_map, prefix_lookup
+        )
+        first_identifiers = first_identifiers.fillna(column_identifiers.astype("object"))
+        fill = paths.isna() & column_paths.notna()
+        identifiers = identifiers.mask(fill, column_identifiers.astype("object"))
+        paths = paths.mask(fill, column_paths.astype("object"))
+
+    return pd.DataFrame({
+        "model_identifier": identifiers.fillna(first_identifiers),
+        "model_path": paths,
+    })
+
+
+def resolve_model_paths(df, models_dir="models"):
+    """
+    試験データの全行について.glbのパスを解決
+
+    Args:
+        df: 試験データDataFrame
+        models_dir: モデルディレクトリ
+
+    戻り値: dfと同じインデックスのDataFrame（model_identifier, model_path列。未解決はNA）
+    """
+    columns = [column for column in MODEL_IDENTIFIER_COLUMNS if column in df.columns]
+    if len(df) == 0 or not columns:
+        return pd.DataFrame(
+            {"model_identifier": pd.NA, "model_path": pd.NA},
+            index=df.index,
+            dtype="object",
+        )
+
+    catalog = load_model_catalog(models_dir)
+    return _resolve_model_paths(df[columns], str(models_dir), catalog.version)
+
+
+def attach_model_paths(df, models_dir="models"):
+    """
+    試験データにmodel_identifier・model_path列を追加したDataFrameを返す
+
+    Args:
+        df: 試験データDataFrame
+        models_dir: モデルディレクトリ
+
+    戻り値: (列追加済みDataFrame, 未解決行のDataFrame)
+    """
+    resolved = resolve_model_paths(df, models_dir)
+    with_models = df.assign(
+        model_identifier=resolved["model_identifier"],
+        model_path=resolved["model_path"],
+    )
+    unresolved = with_models[with_models["model_path"].isna()]
+    return with_models, unresolved
@@ -0,0 +1,317 @@
+"""
+モデル配信サーバーモジュール
+Streamlitと同じプロセス内で小さなHTTPサーバーを起動し、.glbファイルをURLで配信する
+（Range / ETag 対応。ビューアHTMLにBase64でモデルを埋め込まないための仕組み）
+"""
+
+import os
+import re
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+
+import streamlit as st
+
+from glb_cache import get_glb_cache
+
+# 配信対象ディレクトリ（URLの先頭パス → ディレクトリ）
+SERVED_DIRS = {
+    "models": Path("models"),
+    "glb_files": Path("glb_files"),
+}
+
+# 配信を許可する拡張子（カタログファイルなどは配信しない）
+SERVED_SUFFIXES = {".glb"}
+
+# サーバー設定（環境変数で上書き可能）
+# 既定はこのマシンからのみ接続可能。他のマシンのブラウザから表示する場合は 0.0.0.0 などを明示的に指定する
+MODEL_SERVER_HOST = os.environ.get("MODEL_SERVER_HOST", "127.0.0.1")
+MODEL_SERVER_PORT = int(os.environ.get("MODEL_SERVER_PORT", "8765"))
+# リバースプロキシ配下など、ブラウザから見たURLが異なる場合に指定（例: https://example.com/models-api）
+MODEL_SERVER_PUBLIC_URL = os.environ.get("MODEL_SERVER_PUBLIC_URL", "").rstrip("/")
+# 配信を許可する追加のオリジン（カンマ区切り。Streamlitを開いたオリジンは自動で許可される）
+MODEL_SERVER_ALLOWED_ORIGINS = {
+    origin.strip().rstrip("/")
+    for origin in os.environ.get("MODEL_SERVER_ALLOWED_ORIGINS", "").split(",")
+    if origin.strip()
+}
+
+# ポートが使用中の場合に試す追加ポート数
+PORT_RETRY_COUNT = 10
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# CORSで読み取りを許可するオリジン（Streamlitのセッションが開かれたオリジンを登録する）
+_allowed_origins = set(MODEL_SERVER_ALLOWED_ORIGINS)
+_allowed_origins_lock = threading.Lock()
+
+
+def register_origin(origin):
+    """
+    モデルの読み取りを許可するオリジンを登録
+
+    Args:
+        origin: オリジン（例: "http://localhost:8501"）。Noneや空文字は無視
+    """
+    if origin:
+        with _allowed_origins_lock:
+            _allowed_origins.add(origin.rstrip("/"))
+
+
+def is_allowed_origin(origin):
+    """オリジンがモデルの読み取りを許可されているか"""
+    with _allowed_origins_lock:
+        return origin in _allowed_origins
+
+
+def _streamlit_origin():
+    """
+    現在のセッションでStreamlitを開いているオリジンを取得
+
+    戻り値: "scheme://host[:port]" の文字列。取得できない場合はNone
+    """
+    context = getattr(st, "context", None)
+    if context is None:
+        return None
+    try:
+        url = getattr(context, "url", None)
+        if url:
+            parts = urlsplit(url)
+            if parts.scheme and parts.netloc:
+                return f"{parts.scheme}://{parts.netloc}"
+        headers = context.headers
+        host = headers.get("Host")
+        origin = headers.get("Origin")
+    except Exception:
+        # スクリプト実行コンテキスト外（ベアモードなど）
+        return None
+    if origin:
+        return origin
+    if host:
+        scheme = headers.get("X-Forwarded-Proto", "http").split(",")[0].strip()
+        return f"{scheme}://{host}"
+    return None
+
+
+def parse_range_header(range_header, file_size):
+    """
+    Rangeヘッダーを解析（単一範囲のみ対応）
+
+    Args:
+        range_header: Rangeヘッダー文字列（例: "bytes=0-1023"）
+        file_size: ファイルサイズ
+
+    戻り値: (start, end) の包含範囲。解析不能な場合はNone、範囲外の場合は例外ValueError
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+
+    start_text, end_text = match.groups()
+    if not start_text and not end_text:
+        return None
+
+    if not start_text:
+        # 末尾からNバイト（bytes=-500）
+        suffix_length = int(end_text)
+        if suffix_length == 0:
+            raise ValueError("空の範囲指定です")
+        start = max(file_size - suffix_length, 0)
+        end = file_size - 1
+    else:
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+        end = min(end, file_size - 1)
+
+    if start >= file_size or start > end:
+        raise ValueError("範囲がファイルサイズを超えています")
+
+    return start, end
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    """SERVED_DIRS配下のファイルのみを返す読み取り専用ハンドラー"""
+
+    # ブラウザは毎回ETagで再検証し、変更がなければ304で済ませる
+    cache_control = "no-cache"
+
+    def log_message(self, format, *args):
+        # Streamlitのコンソールをアクセスログで埋めない
+        pass
+
+    def end_headers(self):
+        # Streamlitを開いたオリジンにのみ読み取りを許可（"*" にすると任意のサイトから読めてしまう）
+        origin = self.headers.get("Origin")
+        if origin and is_allowed_origin(origin):
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header(
+                "Access-Control-Expose-Headers",
+                "Accept-Ranges, Content-Length, Content-Range, ETag",
+            )
+        self.send_header("Vary", "Origin")
+        super().end_headers()
+
+    def do_OPTIONS(self):
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Range, If-None-Match, If-Range")
+        self.end_headers()
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def resolve_request_path(self):
+        """URLパスを配信対象ファイルのパスに変換（ディレクトリ外はNone）"""
+        url_path = unquote(urlsplit(self.path).path)
+        parts = [part for part in url_path.split("/") if part]
+        if len(parts) < 2 or parts[0] not in SERVED_DIRS:
+            return None
+
+        base_dir = SERVED_DIRS[parts[0]].resolve()
+        file_path = base_dir.joinpath(*parts[1:]).resolve()
+        if file_path.suffix.lower() not in SERVED_SUFFIXES:
+            return None
+        if base_dir not in file_path.parents or not file_path.is_file():
+            return None
+        return file_path
+
+    def _serve(self, send_body):
+        file_path = self.resolve_request_path()
+        if file_path is None:
+            # ステータス行はlatin-1のため日本語メッセージは付けない
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        # ETagは内容のSHA-256（ファイルが更新されない限り再計算しない）
+        cache = get_glb_cache()
+        stat_result = file_path.stat()
+        file_size = stat_result.st_size
+        etag = f'"{cache.digest_for(file_path, stat_result)}"'
+
+        # 条件付きリクエスト（再読み込み時は本体を送らない）
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", self.cache_control)
+            self.end_headers()
+            return
+
+        byte_range = None
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = parse_range_header(range_header, file_size)
+            except ValueError:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{file_size}")
+                self.end_headers()
+                return
+
+        if byte_range is None:
+            start, end = 0, file_size - 1
+            self.send_response(HTTPStatus.OK)
+        else:
+            start, end = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{file_size}")
+
+        content_length = max(end - start + 1, 0)
+        self.send_header("Content-Type", "model/gltf-binary")
+        self.send_header("Content-Length", str(content_length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", self.cache_control)
+        self.end_headers()
+
+        if not send_body or content_length == 0:
+            return
+
+        # キャッシュ上限以下のモデルは全セッション共通のペイロードキャッシュから返す
+        payload = cache.get(file_path) if file_size <= cache.max_bytes else None
+
+        try:
+            if payload is not None:
+                view = memoryview(payload.data)
+                for offset in range(start, end + 1, COPY_CHUNK_SIZE):
+                    self.wfile.write(view[offset:min(offset + COPY_CHUNK_SIZE, end + 1)])
+                return
+
+            with open(file_path, "rb") as f:
+                f.seek(start)
+                remaining = content_length
+                while remaining > 0:
+                    chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # ブラウザ側で読み込みが中断された
+            pass
+
+
+def _create_server(host, port):
+    """空いているポートを探してサーバーを生成"""
+    last_error = None
+    for candidate in range(port, port + PORT_RETRY_COUNT + 1):
+        try:
+            return ThreadingHTTPServer((host, candidate), ModelRequestHandler)
+        except OSError as e:
+            last_error = e
+    raise last_error
+
+
+@st.cache_resource
+def start_model_server(host=MODEL_SERVER_HOST, port=MODEL_SERVER_PORT):
+    """
+    モデル配信サーバーを起動（プロセス内で1回のみ）
+
+    Args:
+        host: 待ち受けアドレス
+        port: 待ち受けポート（使用中の場合は順に次のポートを試す）
+
+    戻り値: 起動済みのThreadingHTTPServer
+    """
+    server = _create_server(host, port)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever,
+        name="model-server",
+        daemon=True,
+    )
+    thread.start()
+    return server
+
+
+def get_model_url(model_path):
+    """
+    モデルファイルの配信URLを取得（サーバー未起動なら起動する）
+
+    Args:
+        model_path: GLBファイルのパス
+
+    戻り値: (glb_url, server_port)。配信対象外のパスの場合は (None, None)
+    """
+    file_path = Path(model_path).resolve()
+
+    for url_prefix, base_dir in SERVED_DIRS.items():
+        base_dir = base_dir.resolve()
+        if base_dir in file_path.parents:
+            relative = file_path.relative_to(base_dir).as_posix()
+            server = start_model_server()
+            register_origin(_streamlit_origin())
+            glb_url = f"/{url_prefix}/{quote(relative)}"
+            if MODEL_SERVER_PUBLIC_URL:
+                glb_url = MODEL_SERVER_PUBLIC_URL + glb_url
+            return glb_url, server.server_address[1]
+
+    return None, None
+
@@ -0,0 +1,133 @@
+"""
+動作点計算モジュール
+ファンのP-Q曲線と系の抵抗曲線（Ps = k·Q²）の交点（動作点）を、全試験×全抵抗曲線について一括で求める
+- 測定点の間はP-Q曲線を直線とみなし、各区間で抵抗曲線との交点を2次方程式の解として求める
+- 交点が複数ある場合（失速域で曲線が波打つ場合など）は、安定な最大風量側の交点を採用する
+- 動作点の軸動力・騒音は、それぞれの曲線を動作点の風量で補間して求める
+- 交点がない試験（抵抗曲線が測定範囲内で交わらない）はNaN
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from curve_resampling import interpolate, prepare_segments
+
+FLOW_METRIC = "Q_[m3min]"
+PRESSURE_METRIC = "Ps_[Pa]"
+# 動作点で補間する指標
+POINT_METRICS = ("Power_[W]", "SPL_[dbA]")
+
+
+def parse_coefficients(text):
+    """
+    カンマ・空白区切りの抵抗係数の文字列を配列に変換
+
+    Args:
+        text: 例 "0.3, 0.5, 1.0"
+
+    戻り値: 抵抗係数のfloat64配列（重複を除き昇順）
+    """
+    values = [float(value) for value in text.replace(",", " ").split()]
+    if any(not np.isfinite(value) or value < 0 for value in values):
+        raise ValueError("抵抗係数は0以上の数値で指定してください")
+    return np.unique(np.asarray(values, dtype=np.float64))
+
+
+def _operating_flow(segments, coefficients):
+    """
+    全試験×全抵抗係数の動作点の風量
+
+    戻り値: (試験数, 抵抗係数の数) のfloat64配列（交点がなければNaN）
+    """
+    counts = segments["counts"]
+    result = np.full((len(counts), len(coefficients)), np.nan)
+    tests = np.flatnonzero(counts >= 2)
+    if len(tests) == 0 or len(coefficients) == 0:
+        return result
+
+    x, y, test = segments["x"], segments["y"], segments["test"]
+    # P-Q曲線と抵抗曲線の差。区間の左端で0以上・右端で負（または正から0）なら、その区間で交わる
+    # （右端ちょうどの交点: 静圧0まで測定した曲線と k=0 の開放点など）
+    difference = y[None, :] - coefficients[:, None] * (x * x)[None, :]
+    same_test = test[1:] == test[:-1]
+    left_side, right_side = difference[:, :-1], difference[:, 1:]
+    crossing = same_test[None, :] & (left_side >= 0) & ((right_side < 0) | ((right_side == 0) & (left_side > 0)))
+
+    # 試験ごとに最大風量側の交差区間（なければ-1）
+    interval = np.where(crossing, np.arange(len(x) - 1)[None, :], -1)
+    last = np.maximum.reduceat(interval, segments["starts"][tests], axis=1).T
+    found = last >= 0
+    left = np.where(found, last, 0)
+
+    x0, x1 = x[left], x[left + 1]
+    y0, y1 = y[left], y[left + 1]
+    k = np.broadcast_to(coefficients[None, :], left.shape)
+    # 区間内の直線 Ps = y0 + s(Q - x0) と k·Q² の交点（桁落ちしない形の解の公式）
+    slope = (y1 - y0) / (x1 - x0)
+    intercept = y0 - slope * x0
+    root = np.sqrt(np.maximum(slope * slope + 4 * k * intercept, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flow = np.where(slope <= 0, 2 * intercept / (root - slope), (slope + root) / (2 * k))
+    flow = np.clip(flow, x0, x1)
+    result[tests] = np.where(found, flow, np.nan)
+    return result
+
+
+def solve_operating_points(store, coefficients):
+    """
+    全試験×全抵抗曲線の動作点を一括計算
+
+    Args:
+        store: CurveStore
+        coefficients: 抵抗係数 k [Pa/(m³/min)²] の配列
+
+    戻り値: {指標: (試験数, 抵抗係数の数) のfloat64配列}（風量・静圧・軸動力・騒音。交点がなければNaN）
+    """
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    flow = _operating_flow(prepare_segments(store, FLOW_METRIC, PRESSURE_METRIC), coefficients)
+    result = {FLOW_METRIC: flow, PRESSURE_METRIC: coefficients[None, :] * flow * flow}
+    for metric in POINT_METRICS:
+        if metric in store.metrics:
+            result[metric] = interpolate(prepare_segments(store, FLOW_METRIC, metric), flow)
+        else:
+            result[metric] = np.full(flow.shape, np.nan)
+    return result
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _solve_operating_points_cached(_store, store_key, coefficients):
+    result = solve_operating_points(_store, coefficients)
+    # 全セッションで共有するため書き換え不可にする
+    for values in result.values():
+        values.flags.writeable = False
+    return result
+
+
+def solve_operating_points_cached(store, coefficients):
+    """solve_operating_points の結果を（曲線ストアの内容, 抵抗係数）ごとにキャッシュして取得"""
+    return _solve_operating_points_cached(store, store.key, tuple(float(k) for k in coefficients))
+
+
+def operating_point_frame(store, coefficients, result, positions=None):
+    """
+    動作点の計算結果を1行1動作点の表に変換
+
+    Args:
+        store: CurveStore
+        coefficients: 抵抗係数の配列
+        result: solve_operating_points の戻り値
+        positions: 表にする試験のstore内の位置（Noneなら全試験）
+
+    戻り値: DataFrame（試験ID・抵抗係数・各指標。交点のない行は除く）
+    """
+    if positions is None:
+        positions = np.arange(len(store))
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    frame = pd.DataFrame({
+        "fantestdataID": np.repeat(store.test_ids[positions], len(coefficients)),
+        "k": np.tile(coefficients, len(positions)),
+    })
+    for metric, values in result.items():
+        frame[metric] = values[positions].reshape(-1)
+    return frame[frame[FLOW_METRIC].notna()].reset_index(drop=True)
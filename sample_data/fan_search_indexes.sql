@@ -0,0 +1,28 @@
+-- ===============================================
+-- ファン検索ダッシュボード（app06）用の索引
+-- fan_queries.py が生成する WHERE / ORDER BY / 集計に対応
+-- ===============================================
+
+-- カテゴリフィルター（完全一致）・選択肢の取得（SELECT DISTINCT）・集計
+CREATE INDEX IF NOT EXISTS "Fan list_series_idx" ON "Fan list" (series);
+CREATE INDEX IF NOT EXISTS "Fan list_product_type_idx" ON "Fan list" (product_type);
+CREATE INDEX IF NOT EXISTS "Fan list_innerouter_idx" ON "Fan list" (innerouter);
+
+-- 数値範囲フィルター・並べ替え・最小/最大の取得
+CREATE INDEX IF NOT EXISTS "Fan list_diameter_idx" ON "Fan list" (diameter, id);
+CREATE INDEX IF NOT EXISTS "Fan list_year_idx" ON "Fan list" (year, id);
+CREATE UNIQUE INDEX IF NOT EXISTS "Fan list_id_idx" ON "Fan list" (id);
+
+-- キーワード検索（ILIKE '%...%'）はトライグラム索引で
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS "Fan list_series_trgm_idx" ON "Fan list" USING gin (series gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "Fan list_product_type_trgm_idx" ON "Fan list" USING gin (product_type gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "Fan list_innerouter_trgm_idx" ON "Fan list" USING gin (innerouter gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "Fan list_fan_type_trgm_idx" ON "Fan list" USING gin (fan_type gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "Fan list_fanID_trgm_idx" ON "Fan list" USING gin ((CAST("fanID" AS text)) gin_trgm_ops);
+
+-- 選択モデル関連の試験データ（"fanID" IN (...)）。外部キーには索引が自動で作られない
+CREATE INDEX IF NOT EXISTS "FanTestData_fanID_idx" ON "FanTestData" ("fanID");
+
+ANALYZE "Fan list";
+ANALYZE "FanTestData";
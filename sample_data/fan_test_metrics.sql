@@ -0,0 +1,26 @@
+-- ===============================================
+-- 試験ごとの性能指標テーブル（fan_test_metrics.py が計算して書き込む）
+-- app06 のスペック範囲フィルター（性能指標）が参照する
+-- ===============================================
+
+CREATE TABLE IF NOT EXISTS "FanTestMetrics" (
+  "fantestdataID" uuid PRIMARY KEY REFERENCES "FanTestData" ("fantestdataID") ON DELETE CASCADE,
+  "fanID" uuid NOT NULL REFERENCES "Fan list" ("fanID"),
+  point_count integer NOT NULL,                 -- 計算に使った測定点数
+  max_flow double precision,                    -- 最大風量 [m³/min]
+  shutoff_pressure double precision,            -- 締切静圧（最小風量点の静圧） [Pa]
+  peak_efficiency double precision,             -- 最高静圧効率 (Q/60)·Ps/電力 [-]
+  max_spl double precision,                     -- 最大騒音 [dBA]
+  torque_at_peak_efficiency double precision,   -- 最高効率点のトルク [mNm]
+  computed_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 範囲フィルター（"fanID" IN (SELECT "fanID" FROM "FanTestMetrics" WHERE ... BETWEEN ...)）と最小/最大の取得
+CREATE INDEX IF NOT EXISTS "FanTestMetrics_max_flow_idx" ON "FanTestMetrics" (max_flow, "fanID");
+CREATE INDEX IF NOT EXISTS "FanTestMetrics_shutoff_pressure_idx" ON "FanTestMetrics" (shutoff_pressure, "fanID");
+CREATE INDEX IF NOT EXISTS "FanTestMetrics_peak_efficiency_idx" ON "FanTestMetrics" (peak_efficiency, "fanID");
+CREATE INDEX IF NOT EXISTS "FanTestMetrics_max_spl_idx" ON "FanTestMetrics" (max_spl, "fanID");
+CREATE INDEX IF NOT EXISTS "FanTestMetrics_torque_at_peak_efficiency_idx" ON "FanTestMetrics" (torque_at_peak_efficiency, "fanID");
+CREATE INDEX IF NOT EXISTS "FanTestMetrics_fanID_idx" ON "FanTestMetrics" ("fanID");
+
+ANALYZE "FanTestMetrics";
@@ -0,0 +1,100 @@
+"""
+STL読み込みモジュール
+巨大なSTLでもプロセスのメモリを圧迫しないよう、三角形の頂点座標だけを (n, 3, 3) 配列として読み込む
+- バイナリSTL: 50バイト/三角形の構造化dtypeでメモリマップ（ファイルを読み込まず、必要な部分だけOSがページイン）
+- ASCII STL: 一定サイズずつ読み込んで頂点行だけを解析（ファイル全体の文字列を持たない）
+"""
+
+import re
+import struct
+from pathlib import Path
+
+import numpy as np
+
+STL_HEADER_SIZE = 80
+# バイナリSTLの1三角形分（法線・3頂点・属性バイト数）
+STL_RECORD_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute", "<u2"),
+])
+# ASCII STLを読み込む単位（バイト）
+ASCII_CHUNK_SIZE = 16 * 1024 * 1024
+
+_VERTEX_LINE = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+
+
+def is_binary_stl(path):
+    """
+    バイナリSTLか判定
+
+    ASCIIでないバイナリでも先頭が"solid"の場合があるため、三角形数とファイルサイズの整合で判定する
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    if size < STL_HEADER_SIZE + 4:
+        return False
+    with open(path, "rb") as f:
+        f.seek(STL_HEADER_SIZE)
+        (count,) = struct.unpack("<I", f.read(4))
+    return size == STL_HEADER_SIZE + 4 + count * STL_RECORD_DTYPE.itemsize
+
+
+def read_binary_stl(path):
+    """
+    バイナリSTLをメモリマップで読み込む
+
+    戻り値: (n, 3, 3) float32 のメモリマップ配列（ファイルのビューで、コピーは作らない）
+    """
+    if Path(path).stat().st_size == STL_HEADER_SIZE + 4:
+        raise ValueError("STLに三角形が含まれていません")
+    records = np.memmap(path, dtype=STL_RECORD_DTYPE, mode="r", offset=STL_HEADER_SIZE + 4)
+    return records["vertices"]
+
+
+def read_ascii_stl(path, chunk_size=ASCII_CHUNK_SIZE):
+    """
+    ASCII STLを一定サイズずつ読み込んで解析
+
+    戻り値: (n, 3, 3) float32 配列
+    """
+    chunks = []
+    remainder = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            data = remainder + block
+            if block:
+                # 行の途中で切れた部分は次の読み込みに回す
+                cut = data.rfind(b"\n") + 1
+                data, remainder = data[:cut], data[cut:]
+            values = _VERTEX_LINE.findall(data)
+            if values:
+                chunks.append(np.array(values, dtype=np.bytes_).astype(np.float32))
+            if not block:
+                break
+
+    if not chunks:
+        raise ValueError("STLに三角形が含まれていません")
+    vertices = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+    if len(vertices) % 3:
+        raise ValueError("STLの頂点数が3の倍数ではありません")
+    return vertices.reshape(-1, 3, 3)
+
+
+def read_stl_triangles(path):
+    """
+    STL（バイナリ・ASCII）の三角形を読み込む
+
+    Args:
+        path: STLファイルのパス
+
+    戻り値: (n, 3, 3) float32 配列（バイナリの場合はメモリマップ）
+    """
+    if is_binary_stl(path):
+        triangles = read_binary_stl(path)
+    else:
+        triangles = read_ascii_stl(path)
+    if len(triangles) == 0:
+        raise ValueError("STLに三角形が含まれていません")
+    return triangles
@@ -0,0 +1,9 @@
+"""
+テスト共通設定
+- モジュールはリポジトリ直下に置かれているため、直下をインポートパスに追加する
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,138 @@
+"""curve_resampling の一括補間を np.interp・scipy の PCHIP と比較するテスト"""
+
+import numpy as np
+import pytest
+from scipy.interpolate import PchipInterpolator
+
+from curve_resampling import (
+    METHOD_LINEAR,
+    METHOD_PCHIP,
+    flow_grid,
+    interpolate,
+    prepare_segments,
+    resample,
+)
+from curve_store import CurveStore
+
+METRICS = ("Q_[m3min]", "Ps_[Pa]")
+
+
+def make_store(curves):
+    return CurveStore.from_curves(
+        [f"t{i}" for i in range(len(curves))],
+        [{"Q_[m3min]": np.asarray(q, dtype=np.float64), "Ps_[Pa]": np.asarray(p, dtype=np.float64)} for q, p in curves],
+        METRICS,
+    )
+
+
+@pytest.fixture
+def random_curves():
+    """点数・範囲・並び順の異なる曲線（風量の降順・ランダム順を含む）"""
+    rng = np.random.default_rng(42)
+    curves = []
+    for i in range(40):
+        count = int(rng.integers(3, 15))
+        q = np.sort(rng.uniform(0.0, 10.0, count) + rng.uniform(0.0, 5.0))
+        p = 300.0 * (1.0 - (q / 16.0) ** 2) + rng.normal(0.0, 5.0, count)
+        order = rng.permutation(count) if i % 3 == 0 else (np.arange(count)[::-1] if i % 3 == 1 else np.arange(count))
+        curves.append((q[order], p[order]))
+    return curves
+
+
+def test_linear_matches_numpy_interp(random_curves):
+    store = make_store(random_curves)
+    grid = np.linspace(-1.0, 16.0, 120)
+    result = resample(store, grid, method=METHOD_LINEAR)
+
+    for row, (q, p) in zip(result, random_curves):
+        order = np.argsort(q)
+        expected = np.interp(grid, q[order], p[order])
+        inside = (grid >= q.min()) & (grid <= q.max())
+        np.testing.assert_allclose(row[inside], expected[inside], rtol=1e-12, atol=1e-9)
+        assert np.isnan(row[~inside]).all()
+
+
+def test_pchip_matches_scipy(random_curves):
+    store = make_store(random_curves)
+    grid = np.linspace(0.0, 15.0, 200)
+    result = resample(store, grid, method=METHOD_PCHIP)
+
+    for row, (q, p) in zip(result, random_curves):
+        order = np.argsort(q)
+        expected = PchipInterpolator(q[order], p[order], extrapolate=False)(grid)
+        np.testing.assert_allclose(row, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_pchip_preserves_monotonic_and_flat_data():
+    q = np.array([0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+    p = np.array([100.0, 100.0, 80.0, 10.0, 9.0, 0.0])
+    grid = np.linspace(0.0, 5.0, 101)
+    result = resample(make_store([(q, p)]), grid, method=METHOD_PCHIP)[0]
+
+    np.testing.assert_allclose(result, PchipInterpolator(q, p)(grid), atol=1e-9)
+    assert (np.diff(result) <= 1e-12).all()
+    # 平らな区間では行き過ぎない
+    assert result[grid <= 1.0].max() <= 100.0 + 1e-12
+
+
+def test_two_point_pchip_is_linear():
+    grid = np.linspace(1.0, 3.0, 9)
+    result = resample(make_store([([1.0, 3.0], [10.0, 30.0])]), grid, method=METHOD_PCHIP)[0]
+
+    np.testing.assert_allclose(result, 10.0 * grid)
+
+
+def test_duplicate_flows_are_averaged_and_nan_points_dropped():
+    store = make_store([([0.0, 1.0, 1.0, 2.0, np.nan], [10.0, 20.0, 40.0, 50.0, 99.0])])
+    segments = prepare_segments(store)
+
+    np.testing.assert_array_equal(segments["x"], [0.0, 1.0, 2.0])
+    np.testing.assert_array_equal(segments["y"], [10.0, 30.0, 50.0])
+    np.testing.assert_array_equal(segments["counts"], [3])
+
+
+def test_mismatched_lengths_use_shorter_curve():
+    store = make_store([([0.0, 1.0, 2.0, 3.0], [5.0, 4.0])])
+    segments = prepare_segments(store)
+
+    np.testing.assert_array_equal(segments["x"], [0.0, 1.0])
+
+
+def test_curves_with_fewer_than_two_points_are_nan():
+    store = make_store([([1.0], [5.0]), ([], []), ([0.0, 2.0], [0.0, 2.0])])
+    result = resample(store, [0.0, 1.0, 2.0])
+
+    assert np.isnan(result[:2]).all()
+    np.testing.assert_allclose(result[2], [0.0, 1.0, 2.0])
+
+
+def test_interpolate_per_test_queries(random_curves):
+    store = make_store(random_curves)
+    segments = prepare_segments(store)
+    rng = np.random.default_rng(0)
+    queries = rng.uniform(0.0, 15.0, (len(store), 5))
+    queries[0, 0] = np.nan
+    result = interpolate(segments, queries)
+
+    for row, query, (q, p) in zip(result, queries, random_curves):
+        order = np.argsort(q)
+        inside = (query >= q.min()) & (query <= q.max())
+        np.testing.assert_allclose(row[inside], np.interp(query[inside], q[order], p[order]), atol=1e-9)
+        assert np.isnan(row[~inside]).all()
+
+
+def test_interpolate_rejects_unknown_method(random_curves):
+    segments = prepare_segments(make_store(random_curves))
+
+    with pytest.raises(ValueError):
+        interpolate(segments, np.zeros((len(random_curves), 1)), method="cubic")
+
+
+def test_flow_grid_covers_all_tests(random_curves):
+    store = make_store(random_curves)
+    grid = flow_grid(store, 50)
+    flows = np.concatenate([q for q, _ in random_curves])
+
+    assert len(grid) == 50
+    assert grid[0] == flows.min() and grid[-1] == flows.max()
+    assert flow_grid(make_store([([], [])])).size == 0
@@ -0,0 +1,119 @@
+"""curve_store の曲線の解析・列指向の保持・集計のテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from curve_store import CurveStore, parse_curve
+
+METRICS = ("Q_[m3min]", "Ps_[Pa]")
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "fantestdataID": ["a", "b", "c", "d"],
+        "Q_[m3min]": ["[0, 1, 2]", [0.0, 2.0], None, "[0, 1.5, null, 3]"],
+        "Ps_[Pa]": ["[30, 20, 5]", "[40, 0]", "not json", "[9, 8, 7, 6]"],
+    })
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("[1, 2.5, 3]", [1.0, 2.5, 3.0]),
+        (b"[1, 2]", [1.0, 2.0]),
+        ([4, 5], [4.0, 5.0]),
+        ("[1, null]", [1.0, np.nan]),
+        (None, []),
+        (float("nan"), []),
+        ("not json", []),
+        ('["a"]', []),
+    ],
+)
+def test_parse_curve(value, expected):
+    np.testing.assert_array_equal(parse_curve(value), np.asarray(expected, dtype=np.float64))
+
+
+def test_from_frame_flattens_each_metric(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+
+    assert len(store) == 4
+    assert store.metrics == METRICS
+    np.testing.assert_array_equal(store.lengths("Q_[m3min]"), [3, 2, 0, 4])
+    np.testing.assert_array_equal(store.lengths("Ps_[Pa]"), [3, 2, 0, 4])
+    np.testing.assert_array_equal(store.offsets["Q_[m3min]"], [0, 3, 5, 5, 9])
+    np.testing.assert_array_equal(store.curve("Ps_[Pa]", "b"), [40.0, 0.0])
+    np.testing.assert_array_equal(store.curve("Q_[m3min]", "d"), [0.0, 1.5, np.nan, 3.0])
+    assert store.curve("Q_[m3min]", "missing").size == 0
+
+
+def test_from_frame_fills_missing_metric_columns(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS + ("SPL_[dbA]",))
+
+    assert store.lengths("SPL_[dbA]").tolist() == [0, 0, 0, 0]
+
+
+def test_from_curves_matches_from_frame(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+    rebuilt = CurveStore.from_curves(
+        store.test_ids, [{metric: store.curve(metric, test_id) for metric in METRICS} for test_id in store.test_ids], METRICS
+    )
+
+    assert rebuilt.key == store.key
+
+
+def test_positions_and_contains(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+
+    assert "c" in store and "z" not in store
+    assert store.position("c") == 2
+    np.testing.assert_array_equal(store.positions(["d", "z", "a"]), [3, -1, 0])
+
+
+def test_reduce_skips_nan_and_fills_empty(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+
+    np.testing.assert_array_equal(store.reduce("Q_[m3min]", np.fmax), [2.0, 2.0, np.nan, 3.0])
+    np.testing.assert_array_equal(store.reduce("Ps_[Pa]", np.add, empty=0.0), [55.0, 40.0, 0.0, 30.0])
+
+
+def test_subset_keeps_requested_order_and_drops_unknown(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+    subset = store.subset(["d", "missing", "a"])
+
+    assert subset.test_ids.tolist() == ["d", "a"]
+    np.testing.assert_array_equal(subset.curve("Ps_[Pa]", "a"), [30.0, 20.0, 5.0])
+    np.testing.assert_array_equal(subset.curve("Q_[m3min]", "d"), store.curve("Q_[m3min]", "d"))
+
+
+def test_key_changes_with_content(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+    same = CurveStore.from_frame(frame.copy(), "fantestdataID", METRICS)
+    changed = frame.copy()
+    changed.loc[1, "Ps_[Pa]"] = "[41, 0]"
+
+    assert store.key == same.key
+    assert store.key != CurveStore.from_frame(changed, "fantestdataID", METRICS).key
+
+
+def test_row_keys_change_only_for_modified_tests(frame):
+    store = CurveStore.from_frame(frame, "fantestdataID", METRICS)
+    changed = frame.copy()
+    changed.loc[1, "Ps_[Pa]"] = "[41, 0]"
+    keys = store.row_keys()
+    changed_keys = CurveStore.from_frame(changed, "fantestdataID", METRICS).row_keys()
+
+    assert (keys != changed_keys).tolist() == [False, True, False, False]
+    # 対象外の指標の変更はキーに影響しない
+    np.testing.assert_array_equal(
+        store.row_keys(["Q_[m3min]"]), CurveStore.from_frame(changed, "fantestdataID", METRICS).row_keys(["Q_[m3min]"])
+    )
+
+
+def test_row_keys_distinguish_split_points():
+    # 連結すると同じ値でも、区切り位置が違えば別の内容
+    first = CurveStore.from_curves(["a"], [{"Q_[m3min]": np.array([1.0, 2.0]), "Ps_[Pa]": np.array([3.0])}], METRICS)
+    second = CurveStore.from_curves(["a"], [{"Q_[m3min]": np.array([1.0]), "Ps_[Pa]": np.array([2.0, 3.0])}], METRICS)
+
+    assert first.row_keys()[0] != second.row_keys()[0]
@@ -0,0 +1,134 @@
+"""fan_laws の相似則による換算のテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fan_laws
+from curve_store import CurveStore
+
+METRICS = ("Q_[m3min]", "Ps_[Pa]", "Torque_[mNm]", "Power_[W]", "SPL_[dbA]")
+
+
+def make_test(rpm, points=5):
+    """回転数 rpm で測定した曲線（電力 = トルク × 角速度）"""
+    q = np.linspace(0.0, 10.0, points)
+    torque = 200.0 + 20.0 * q  # mNm
+    power = torque / 1000.0 * rpm * 2 * np.pi / 60.0
+    return {
+        "Q_[m3min]": q,
+        "Ps_[Pa]": 300.0 - 3.0 * q * q,
+        "Torque_[mNm]": torque,
+        "Power_[W]": power,
+        "SPL_[dbA]": 50.0 + q,
+    }
+
+
+@pytest.fixture
+def store():
+    return CurveStore.from_curves(["a", "b"], [make_test(3000.0), make_test(1500.0)], METRICS)
+
+
+def conditions_for(store, temperature, diameter):
+    return {
+        "temperature": np.asarray(temperature, dtype=np.float64),
+        "diameter": np.asarray(diameter, dtype=np.float64),
+        "speed": fan_laws.test_speed(store),
+    }
+
+
+def test_air_density_at_standard_conditions():
+    assert fan_laws.air_density(20.0) == pytest.approx(1.2041, abs=1e-4)
+    np.testing.assert_allclose(fan_laws.air_density([0.0, 40.0]), [1.2922, 1.1272], atol=1e-4)
+
+
+def test_speed_is_power_over_torque(store):
+    np.testing.assert_allclose(fan_laws.test_speed(store), [3000.0, 1500.0])
+
+
+def test_speed_uses_median_and_skips_invalid_points():
+    curve = make_test(2400.0, points=5)
+    curve["Power_[W]"] = curve["Power_[W]"].copy()
+    curve["Power_[W]"][0] *= 10.0  # 外れ値
+    curve["Torque_[mNm]"] = curve["Torque_[mNm]"].copy()
+    curve["Torque_[mNm]"][1] = 0.0  # 回転数を求められない点
+    no_torque = dict(make_test(1000.0), **{"Torque_[mNm]": np.array([])})
+    store = CurveStore.from_curves(["a", "b"], [curve, no_torque], METRICS)
+
+    speed = fan_laws.test_speed(store)
+    assert speed[0] == pytest.approx(2400.0)
+    assert np.isnan(speed[1])
+
+
+def test_normalize_speed_follows_fan_laws(store):
+    conditions = conditions_for(store, [20.0, 20.0], [np.nan, np.nan])
+    normalized = fan_laws.normalize(store, conditions, {"speed": 3000.0})
+
+    # a は基準回転数と同じため変わらない
+    for metric in METRICS:
+        np.testing.assert_allclose(normalized.curve(metric, "a"), store.curve(metric, "a"))
+    # b は回転数比 2: Q×2、Ps×4、トルク×4、電力×8、騒音 +50·log10(2)
+    ratio = {"Q_[m3min]": 2.0, "Ps_[Pa]": 4.0, "Torque_[mNm]": 4.0, "Power_[W]": 8.0}
+    for metric, factor in ratio.items():
+        np.testing.assert_allclose(normalized.curve(metric, "b"), store.curve(metric, "b") * factor)
+    np.testing.assert_allclose(normalized.curve("SPL_[dbA]", "b"), store.curve("SPL_[dbA]", "b") + 50 * np.log10(2.0))
+
+
+def test_normalize_diameter_and_density(store):
+    conditions = conditions_for(store, [40.0, 20.0], [200.0, 400.0])
+    normalized = fan_laws.normalize(store, conditions, {"temperature": 20.0, "diameter": 400.0})
+
+    density = fan_laws.air_density(20.0) / fan_laws.air_density(40.0)
+    np.testing.assert_allclose(normalized.curve("Q_[m3min]", "a"), store.curve("Q_[m3min]", "a") * 8.0)
+    np.testing.assert_allclose(normalized.curve("Ps_[Pa]", "a"), store.curve("Ps_[Pa]", "a") * density * 4.0)
+    np.testing.assert_allclose(normalized.curve("Power_[W]", "a"), store.curve("Power_[W]", "a") * density * 32.0)
+    np.testing.assert_allclose(
+        normalized.curve("SPL_[dbA]", "a"),
+        store.curve("SPL_[dbA]", "a") + 70 * np.log10(2.0) + 20 * np.log10(density),
+    )
+    for metric in METRICS:
+        np.testing.assert_allclose(normalized.curve(metric, "b"), store.curve(metric, "b"))
+
+
+def test_normalize_round_trip(store):
+    conditions = conditions_for(store, [35.0, 5.0], [250.0, 315.0])
+    reference = {"temperature": 25.0, "diameter": 300.0, "speed": 2000.0}
+    normalized = fan_laws.normalize(store, conditions, reference)
+
+    # 換算後の条件から元の条件へ戻すと元の曲線になる
+    back_conditions = {name: np.full(len(store), value) for name, value in reference.items()}
+    original = {"temperature": 35.0, "diameter": 250.0, "speed": 3000.0}
+    restored = fan_laws.normalize(normalized, back_conditions, original)
+    for metric in METRICS:
+        np.testing.assert_allclose(restored.curve(metric, "a"), store.curve(metric, "a"), rtol=1e-12)
+
+
+def test_unknown_conditions_give_nan_curves(store):
+    conditions = conditions_for(store, [np.nan, 20.0], [np.nan, 300.0])
+    normalized = fan_laws.normalize(store, conditions, {"diameter": 300.0})
+
+    # 羽根径が不明な試験は換算できない（温度が不明な場合は基準温度とみなす）
+    assert np.isnan(normalized.curve("Q_[m3min]", "a")).all()
+    np.testing.assert_allclose(normalized.curve("Q_[m3min]", "b"), store.curve("Q_[m3min]", "b"))
+
+
+def test_align_conditions_orders_rows_by_store(store):
+    frame = pd.DataFrame({
+        "fantestdataID": ["b", "a", "a"],
+        "fanID": ["fan-2", "fan-1", "fan-1"],
+        "temp_c_[defC]": [None, 30.0, 30.0],
+        "temp_o_[degC]": [25.0, 10.0, 10.0],
+    })
+    conditions = fan_laws.align_conditions(store, frame, {"fan-1": 200, "fan-2": "300"})
+
+    # 吸込温度（temp_c）を優先し、なければ吐出温度
+    np.testing.assert_array_equal(conditions["temperature"], [30.0, 25.0])
+    np.testing.assert_array_equal(conditions["diameter"], [200.0, 300.0])
+    np.testing.assert_allclose(conditions["speed"], [3000.0, 1500.0])
+
+
+def test_align_conditions_missing_tests_are_nan(store):
+    conditions = fan_laws.align_conditions(store, pd.DataFrame({"fantestdataID": ["a"], "fanID": ["x"]}))
+
+    assert np.isnan(conditions["temperature"]).all()
+    assert np.isnan(conditions["diameter"]).all()
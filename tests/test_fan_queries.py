@@ -0,0 +1,115 @@
+"""fan_queries のフィルター→SQL変換（パラメータ化・LIKEのエスケープ・列の許可リスト）のテスト"""
+
+import sqlite3
+
+import pytest
+
+from fan_queries import (
+    CATEGORY_COLUMNS,
+    METRIC_RANGE_COLUMNS,
+    SORTABLE_COLUMNS,
+    build_fan_filter,
+    fan_count_query,
+    fan_group_count_query,
+    fan_options_query,
+    fan_page_query,
+    related_test_query,
+)
+
+INJECTION = "x'; DROP TABLE \"Fan list\"; --"
+
+
+def like_matches(pattern, values):
+    """LIKE ... ESCAPE '\\' でパターンに一致する値（PostgreSQLのILIKEと同じエスケープ規則）"""
+    with sqlite3.connect(":memory:") as conn:
+        conn.execute("CREATE TABLE t (v TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(value,) for value in values])
+        rows = conn.execute("SELECT v FROM t WHERE v LIKE ? ESCAPE '\\' ORDER BY v", (pattern,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def test_empty_filters_have_no_where_clause():
+    assert build_fan_filter({}) == ("", {})
+    assert build_fan_filter({"text": "   ", "series": None, "diameter": None}) == ("", {})
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("50%", ["50%"]),
+        ("a_b", ["a_b"]),
+        ("c\\d", ["c\\d"]),
+        ("SERIES", ["series-a"]),
+    ],
+)
+def test_text_search_escapes_like_wildcards(text, expected):
+    where, params = build_fan_filter({"text": text})
+
+    assert "ILIKE :text" in where
+    values = ["50%", "500", "a_b", "axb", "c\\d", "cxd", "series-a"]
+    assert like_matches(params["text"], values) == expected
+
+
+def test_values_are_bound_not_embedded():
+    filters = {"text": INJECTION, "series": INJECTION, "diameter": (100, 200), "max_flow": (1.5, 3.0)}
+    where, params = build_fan_filter(filters)
+
+    assert INJECTION not in where
+    assert "DROP" not in where
+    assert params["series"] == INJECTION
+    assert params["diameter_min"] == 100 and params["diameter_max"] == 200
+    assert params["max_flow_min"] == 1.5 and params["max_flow_max"] == 3.0
+    assert '"diameter" BETWEEN :diameter_min AND :diameter_max' in where
+    assert '"fanID" IN (SELECT "fanID" FROM "FanTestMetrics" WHERE "max_flow" BETWEEN' in where
+
+
+def test_metric_filters_share_one_subquery():
+    filters = {column: (0, 1) for column in METRIC_RANGE_COLUMNS}
+    where, params = build_fan_filter(filters)
+
+    # 1つの試験が全条件を満たすファンに絞り込む
+    assert where.count('FROM "FanTestMetrics"') == 1
+    assert all(f'"{column}" BETWEEN' in where for column in METRIC_RANGE_COLUMNS)
+
+
+def test_unknown_filter_keys_are_ignored():
+    where, params = build_fan_filter({"fan_type; DROP": "x", "id": 5})
+
+    assert (where, params) == ("", {})
+
+
+def test_page_query_orders_by_allowed_column_with_id_tiebreak():
+    sql, params = fan_page_query({"series": "A"}, sort_by="diameter", ascending=False, limit="25", offset=50)
+
+    assert 'ORDER BY "diameter" DESC, id DESC LIMIT :limit OFFSET :offset' in sql
+    assert params == {"series": "A", "limit": 25, "offset": 50}
+    assert 'ORDER BY "id" ASC LIMIT' in fan_page_query({}, sort_by="id")[0]
+
+
+@pytest.mark.parametrize("sort_by", ["fanID", "id; DROP TABLE x", "diameter DESC", ""])
+def test_page_query_rejects_columns_outside_allowlist(sort_by):
+    assert sort_by not in SORTABLE_COLUMNS
+    with pytest.raises(ValueError):
+        fan_page_query({}, sort_by=sort_by)
+
+
+def test_options_and_group_queries_use_allowlists():
+    for column in CATEGORY_COLUMNS:
+        assert f'SELECT DISTINCT "{column}"' in fan_options_query(column)[0]
+    with pytest.raises(ValueError):
+        fan_options_query("diameter")
+    with pytest.raises(ValueError):
+        fan_group_count_query({}, "fanID")
+    sql, params = fan_group_count_query({"year": (2020, 2022)}, "diameter")
+    assert 'GROUP BY "diameter"' in sql and params == {"year_min": 2020, "year_max": 2022}
+
+
+def test_count_and_related_queries_share_the_filter():
+    filters = {"text": "abc", "innerouter": "Inner"}
+    where, params = build_fan_filter(filters)
+    count_sql, count_params = fan_count_query(filters)
+    related_sql, related_params = related_test_query(filters, columns='"fantestdataID"')
+
+    assert count_sql == f'SELECT COUNT(*) AS count FROM "Fan list" {where};'
+    assert related_sql.startswith('SELECT "fantestdataID" FROM "FanTestData" WHERE "fanID" IN (SELECT "fanID" FROM "Fan list" WHERE')
+    assert count_params == related_params == params
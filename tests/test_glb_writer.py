@@ -0,0 +1,198 @@
+"""glb_writer の頂点結合・量子化GLBの書き出しと読み込みのテスト"""
+
+import io
+
+import numpy as np
+import pytest
+import trimesh
+
+from glb_writer import (
+    ENCODING_PLAIN,
+    ENCODING_QUANTIZED,
+    POSITION_LEVELS,
+    UNSIGNED_INT,
+    glb_encoding,
+    pack_quantized_glb,
+    plain_glb_size,
+    read_glb,
+    weld_mesh,
+    write_geometry_glb,
+    write_glb,
+)
+
+
+def box_triangles(extents=(2.0, 3.0, 4.0), offset=(10.0, -5.0, 1.0)):
+    """直方体の三角形（STLと同じく頂点を共有しない (12, 3, 3) 配列）"""
+    box = trimesh.creation.box(extents=extents)
+    box.apply_translation(offset)
+    return np.asarray(box.triangles, dtype=np.float32)
+
+
+def decode_quantized(path):
+    """量子化GLBを読み込み、ノード変換を適用した三角形配列と法線を返す"""
+    gltf, binary = read_glb(path)
+    primitive = gltf["meshes"][0]["primitives"][0]
+    node = gltf["nodes"][0]
+
+    def accessor_data(index, dtype, width):
+        accessor = gltf["accessors"][index]
+        view = gltf["bufferViews"][accessor["bufferView"]]
+        stride = view.get("byteStride", np.dtype(dtype).itemsize * width)
+        raw = np.frombuffer(binary, dtype=np.uint8, count=view["byteLength"], offset=view["byteOffset"])
+        if width == 1:
+            return raw.view(dtype)[:accessor["count"]]
+        rows = raw[:accessor["count"] * stride].reshape(accessor["count"], stride)
+        return rows[:, :np.dtype(dtype).itemsize * width].copy().view(dtype).reshape(-1, width)
+
+    index_dtype = np.uint16 if gltf["accessors"][primitive["indices"]]["componentType"] == 5123 else np.uint32
+    indices = accessor_data(primitive["indices"], index_dtype, 1)
+    positions = accessor_data(primitive["attributes"]["POSITION"], np.uint16, 3)
+    vertices = np.asarray(node["translation"]) + positions * np.asarray(node["scale"])
+    normals = None
+    if "NORMAL" in primitive["attributes"]:
+        normals = accessor_data(primitive["attributes"]["NORMAL"], np.int8, 3) / 127.0
+    return gltf, vertices[indices].reshape(-1, 3, 3), normals, positions
+
+
+def max_triangle_error(decoded, triangles):
+    """各入力三角形と最も近い出力三角形の頂点の最大誤差（三角形の順序・頂点の巡回順に依存しない）"""
+    rotations = np.stack([np.roll(decoded, shift, axis=1) for shift in range(3)], axis=1)
+    errors = np.abs(rotations[None] - triangles[:, None, None]).max(axis=(3, 4))
+    return errors.min(axis=(1, 2)).max()
+
+
+def test_weld_box_merges_shared_corners():
+    geometry = weld_mesh(box_triangles())
+
+    assert geometry["input_vertices"] == 36
+    assert geometry["welded_vertices"] == 8
+    assert len(geometry["welded_faces"]) == 12
+    # 90°の角は折り目角（30°）を超えるため、各頂点は接する3面ごとに法線が分かれる
+    assert len(geometry["positions"]) == 24
+    assert len(geometry["indices"]) == 36
+    lengths = np.linalg.norm(geometry["normals"] / 127.0, axis=1)
+    np.testing.assert_allclose(lengths, 1.0, atol=0.02)
+
+
+def test_weld_without_normals_keeps_welded_vertices():
+    geometry = weld_mesh(box_triangles(), normals=False)
+
+    assert geometry["normals"] is None
+    assert len(geometry["positions"]) == geometry["welded_vertices"] == 8
+    np.testing.assert_array_equal(geometry["indices"], geometry["welded_faces"].reshape(-1))
+
+
+def test_weld_drops_degenerate_triangles():
+    triangles = box_triangles()
+    degenerate = np.repeat(triangles[:1, :1], 3, axis=1)
+    geometry = weld_mesh(np.concatenate([triangles, degenerate]))
+
+    assert len(geometry["welded_faces"]) == 12
+
+
+def test_weld_smooths_below_crease_angle():
+    sphere = trimesh.creation.icosphere(subdivisions=2)
+    geometry = weld_mesh(sphere.triangles)
+
+    # 隣接面の角度は折り目角より小さいため、頂点は分割されない
+    assert len(geometry["positions"]) == geometry["welded_vertices"] == len(sphere.vertices)
+    vertices = geometry["translation"] + geometry["positions"] * geometry["scale"]
+    radial = vertices / np.linalg.norm(vertices, axis=1, keepdims=True)
+    cosine = np.einsum("ij,ij->i", radial, geometry["normals"] / 127.0)
+    assert cosine.min() > 0.99
+
+
+@pytest.mark.parametrize("normals", [True, False])
+def test_quantized_round_trip(tmp_path, normals):
+    triangles = box_triangles()
+    path = tmp_path / "box.glb"
+    stats = write_geometry_glb(weld_mesh(triangles, normals=normals), path, ENCODING_QUANTIZED)
+
+    gltf, decoded, decoded_normals, positions = decode_quantized(path)
+    assert glb_encoding(gltf) == ENCODING_QUANTIZED
+    assert "KHR_mesh_quantization" in gltf["extensionsRequired"]
+    assert stats["bytes"] == path.stat().st_size
+    assert stats["triangles"] == 12
+    assert (decoded_normals is not None) == normals
+    # 量子化誤差は最大寸法の 1/(2*POSITION_LEVELS) 以下
+    tolerance = 4.0 / POSITION_LEVELS
+    assert len(decoded) == len(triangles)
+    assert max_triangle_error(decoded, triangles) <= tolerance
+
+
+def test_quantized_bounds_match_input(tmp_path):
+    triangles = box_triangles(extents=(1.0, 5.0, 0.25), offset=(-3.0, 7.5, 100.0))
+    path = tmp_path / "box.glb"
+    write_geometry_glb(weld_mesh(triangles), path)
+
+    gltf, decoded, _, positions = decode_quantized(path)
+    accessor = gltf["accessors"][gltf["meshes"][0]["primitives"][0]["attributes"]["POSITION"]]
+    np.testing.assert_array_equal(accessor["min"], positions.min(axis=0))
+    np.testing.assert_array_equal(accessor["max"], positions.max(axis=0))
+    # 最大寸法の軸は量子化範囲全体を使う
+    assert positions[:, 1].max() == POSITION_LEVELS
+    corners = triangles.reshape(-1, 3)
+    np.testing.assert_allclose(decoded.reshape(-1, 3).min(axis=0), corners.min(axis=0), atol=5.0 / POSITION_LEVELS)
+    np.testing.assert_allclose(decoded.reshape(-1, 3).max(axis=0), corners.max(axis=0), atol=5.0 / POSITION_LEVELS)
+
+
+def test_pack_uses_32bit_indices_for_large_meshes(tmp_path):
+    count = 70002
+    geometry = {
+        "positions": np.zeros((count, 3), dtype=np.uint16),
+        "translation": np.zeros(3),
+        "scale": 1.0,
+        "normals": None,
+        "indices": np.arange(count, dtype=np.int64),
+    }
+    path = tmp_path / "large.glb"
+    path.write_bytes(pack_quantized_glb(geometry))
+
+    gltf, _ = read_glb(path)
+    assert gltf["accessors"][1]["componentType"] == UNSIGNED_INT
+
+
+@pytest.mark.parametrize(
+    "mesh",
+    [trimesh.creation.box(), trimesh.creation.icosphere(subdivisions=3), trimesh.creation.cylinder(1.0, 2.0)],
+    ids=["box", "icosphere", "cylinder"],
+)
+def test_plain_glb_size_is_a_lower_bound(mesh):
+    buffer = io.BytesIO()
+    mesh.export(buffer, file_type="glb")
+    estimate = plain_glb_size(len(mesh.vertices), len(mesh.faces))
+
+    assert estimate <= len(buffer.getvalue())
+    assert estimate >= 0.95 * len(buffer.getvalue()) - 100
+
+
+def test_write_glb_falls_back_to_plain_when_not_smaller(tmp_path):
+    path = tmp_path / "box.glb"
+    encoding = write_glb(trimesh.creation.box(), path, ENCODING_QUANTIZED)
+
+    assert encoding == ENCODING_PLAIN
+    assert glb_encoding(read_glb(path)[0]) == ENCODING_PLAIN
+
+
+def test_write_glb_writes_quantized_when_smaller(tmp_path):
+    mesh = trimesh.creation.icosphere(subdivisions=4)
+    path = tmp_path / "sphere.glb"
+    encoding = write_glb(mesh, path, ENCODING_QUANTIZED, normals=False)
+
+    assert encoding == ENCODING_QUANTIZED
+    assert path.stat().st_size < plain_glb_size(len(mesh.vertices), len(mesh.faces))
+    _, decoded, normals, _ = decode_quantized(path)
+    assert normals is None
+    assert len(decoded) == len(mesh.faces)
+
+
+def test_write_glb_rejects_unknown_encoding(tmp_path):
+    with pytest.raises(ValueError):
+        write_glb(trimesh.creation.box(), tmp_path / "box.glb", "meshopt")
+
+
+def test_read_glb_rejects_other_files(tmp_path):
+    path = tmp_path / "not.glb"
+    path.write_bytes(b"\x00" * 32)
+    with pytest.raises(ValueError):
+        read_glb(path)
@@ -0,0 +1,161 @@
+"""ingest_fantestdata の一括検証（列単位の検証・参照先の確認・行番号）のテスト"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from fan_test_data import TEST_ID_COLUMN
+from ingest_fantestdata import (
+    LINE_COLUMN,
+    REJECT_REASON_COLUMN,
+    TABLE_COLUMNS,
+    copy_sql,
+    read_batches,
+    validate_batch,
+)
+
+FAN_ID = "11111111-2222-3333-4444-555555555555"
+HAKO_ID = "aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee"
+TEST_ID = "99999999-8888-7777-6666-555555555555"
+BASE_ROW = {
+    "fanID": FAN_ID,
+    "TestDate": "2024-01-01",
+    "SingleFanTest": "true",
+    "bellmouth": "true",
+    "temp_o_[degC]": "20",
+    "temp_c_[defC]": "20",
+    "Ps_[Pa]": "[1,2]",
+    "Q_[m3min]": "[0,1]",
+}
+
+
+def make_batch(*overrides):
+    """BASE_ROW を1行ずつ上書きしたバッチ（read_batches と同じく空欄は空文字・行番号付き）"""
+    batch = pd.DataFrame([{**BASE_ROW, **override} for override in overrides]).fillna("")
+    batch[LINE_COLUMN] = batch.index + 1
+    return batch
+
+
+def validate(batch, fans=(FAN_ID,), existing=(), references=None):
+    """固定の集合を返す問い合わせ関数で検証（問い合わせた値も記録）"""
+    calls = {}
+
+    def lookup(name, found):
+        def query(values):
+            calls[name] = list(values)
+            return set(found)
+
+        return query
+
+    lookup_references = {column: lookup(column, found) for column, found in (references or {}).items()}
+    rows, rejected = validate_batch(batch, lookup("fanID", fans), lookup("existing", existing), lookup_references)
+    return rows, rejected, calls
+
+
+def reasons(rejected):
+    return rejected[REJECT_REASON_COLUMN].tolist()
+
+
+def test_valid_row_is_accepted_and_gets_test_id():
+    rows, rejected, calls = validate(make_batch({}))
+
+    assert rejected.empty
+    assert list(rows.columns) == list(TABLE_COLUMNS)
+    assert len(rows.iloc[0][TEST_ID_COLUMN]) == 36
+    assert calls["fanID"] == [FAN_ID]
+
+
+@pytest.mark.parametrize(
+    "override, reason",
+    [
+        ({"fanID": ""}, "fanIDが空"),
+        ({"Ps_[Pa]": "  "}, "Ps_[Pa]が空"),
+        ({"fanID": "fan-1"}, "fanIDがUUID形式でない"),
+        ({TEST_ID_COLUMN: "123"}, f"{TEST_ID_COLUMN}がUUID形式でない"),
+        ({"Hako": "hako"}, "HakoがUUID形式でない"),
+        ({"TestDate": "2024/01/01"}, "TestDateが日付（YYYY-MM-DD）でない"),
+        ({"SingleFanTest": "maybe"}, "SingleFanTestが真偽値でない"),
+        ({"Unit": "1.5"}, "Unitが整数でない"),
+        ({"temp_o_[degC]": "warm"}, "temp_o_[degC]が数値でない"),
+        ({"temp_c_[defC]": "151"}, "temp_c_[defC]が範囲外（-40〜150）"),
+        ({"Ps_[Pa]": "1,2"}, "Ps_[Pa]がJSON配列でない"),
+        ({"Ps_[Pa]": "[1,null]"}, "Ps_[Pa]に数値以外の要素がある"),
+        ({"Ps_[Pa]": "[1,NaN]"}, "Ps_[Pa]に数値以外の要素がある"),
+        ({"Power_[W]": "[1,2,3]"}, "Power_[W]の点数がQ_[m3min]と異なる"),
+        ({"Q_[m3min]": "[]", "Ps_[Pa]": "[]"}, "Q_[m3min]の点数が0"),
+    ],
+)
+def test_invalid_values_are_rejected_with_reason(override, reason):
+    rows, rejected, _ = validate(make_batch({}, override))
+
+    assert len(rows) == 1
+    assert rejected[LINE_COLUMN].tolist() == [2]
+    assert reason in reasons(rejected)[0].split("; ")
+
+
+def test_all_reasons_are_reported_together():
+    _, rejected, _ = validate(make_batch({"TestDate": "", "SingleFanTest": "x", "temp_o_[degC]": "-41"}))
+
+    assert reasons(rejected) == ["TestDateが空; SingleFanTestが真偽値でない; temp_o_[degC]が範囲外（-40〜150）"]
+
+
+def test_optional_curve_may_be_empty_array():
+    rows, rejected, _ = validate(make_batch({"SPL_[dbA]": "[]", "Torque_[mNm]": ""}))
+
+    assert rejected.empty and len(rows) == 1
+
+
+def test_duplicate_test_ids_keep_first_row():
+    upper = TEST_ID.upper()
+    rows, rejected, _ = validate(make_batch({TEST_ID_COLUMN: TEST_ID}, {TEST_ID_COLUMN: upper}))
+
+    assert rows[TEST_ID_COLUMN].tolist() == [TEST_ID]
+    assert reasons(rejected) == ["試験IDがファイル内で重複"]
+
+
+def test_unknown_fan_and_registered_test_are_rejected():
+    other_fan = "00000000-0000-0000-0000-000000000000"
+    batch = make_batch({TEST_ID_COLUMN: TEST_ID.upper()}, {"fanID": other_fan}, {"fanID": FAN_ID.upper()})
+    rows, rejected, calls = validate(batch, existing=(TEST_ID,))
+
+    assert len(rows) == 1 and rows.iloc[0]["fanID"] == FAN_ID.upper()
+    assert reasons(rejected) == ["試験IDが登録済み", 'fanIDが"Fan list"に存在しない']
+    # 問い合わせはバッチごとに1回（小文字で重複なし）
+    assert calls["fanID"] == sorted({FAN_ID, other_fan})
+
+
+def test_references_are_checked_only_for_filled_valid_rows():
+    batch = make_batch(
+        {"Hako": HAKO_ID.upper(), "Unit": "3.0", "Hex": "HX-1"},
+        {"Hako": "bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb", "Unit": "4", "Hex": "HX-2"},
+        {},
+        {"Unit": "5", "TestDate": ""},
+    )
+    references = {"Hako": [HAKO_ID], "Unit": [3], "Hex": ["HX-1"]}
+    rows, rejected, calls = validate(batch, references=references)
+
+    assert len(rows) == 2
+    assert reasons(rejected) == [
+        'Hakoが"Hako list"に存在しない; Unitが"Unit list"に存在しない; Hexがheat_exchangerに存在しない',
+        "TestDateが空",
+    ]
+    assert calls["Unit"] == ["3", "4"]
+    assert calls["Hako"] == ["aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee", "bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb"]
+
+
+def test_read_batches_numbers_lines_across_chunks():
+    source = io.StringIO("﻿fanID,comment\n" + "".join(f"{i},\n" for i in range(5)))
+    batches = list(read_batches(source, batch_size=2))
+
+    assert [batch[LINE_COLUMN].tolist() for batch in batches] == [[1, 2], [3, 4], [5]]
+    assert batches[0].columns[0] == "fanID"
+    assert batches[0]["comment"].tolist() == ["", ""]
+
+
+def test_copy_sql_quotes_every_column():
+    sql = copy_sql()
+
+    assert sql.startswith('COPY "FanTestData" ("fantestdataID", "fanID"')
+    assert '"temp_c_[defC]"' in sql and '"SPL_[dbA]"' in sql
+    assert sql.endswith("FROM STDIN WITH (FORMAT csv)")
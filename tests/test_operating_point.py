@@ -0,0 +1,117 @@
+"""operating_point の動作点（ファン曲線と抵抗曲線 Ps = k·Q² の交点）のテスト"""
+
+import numpy as np
+import pytest
+
+from curve_store import CurveStore
+from operating_point import (
+    FLOW_METRIC,
+    PRESSURE_METRIC,
+    operating_point_frame,
+    parse_coefficients,
+    solve_operating_points,
+)
+
+METRICS = (FLOW_METRIC, PRESSURE_METRIC, "Power_[W]", "SPL_[dbA]")
+
+
+def make_store(curves):
+    return CurveStore.from_curves(
+        [f"t{i}" for i in range(len(curves))],
+        [{metric: np.asarray(curve.get(metric, []), dtype=np.float64) for metric in METRICS} for curve in curves],
+        METRICS,
+    )
+
+
+def quadratic_fan(shutoff, b, max_flow, points):
+    """二次のファン曲線 Ps = shutoff - b·Q² の測定点"""
+    q = np.linspace(0.0, max_flow, points)
+    return {FLOW_METRIC: q, PRESSURE_METRIC: shutoff - b * q * q, "Power_[W]": 100.0 + 10.0 * q}
+
+
+def test_linear_fan_curve_is_exact():
+    # 測定点の間は直線とみなすため、直線のファン曲線では2次方程式の解と一致する
+    shutoff, max_flow = 400.0, 20.0
+    store = make_store([{FLOW_METRIC: [0.0, max_flow], PRESSURE_METRIC: [shutoff, 0.0]}])
+    k = np.array([0.5, 1.0, 4.0])
+    result = solve_operating_points(store, k)
+
+    s = shutoff / max_flow
+    expected = (-s + np.sqrt(s * s + 4 * k * shutoff)) / (2 * k)
+    np.testing.assert_allclose(result[FLOW_METRIC][0], expected, rtol=1e-12)
+    np.testing.assert_allclose(result[PRESSURE_METRIC][0], k * expected**2, rtol=1e-12)
+
+
+def test_quadratic_fan_curve_matches_closed_form():
+    shutoff, b = 300.0, 1.2
+    store = make_store([quadratic_fan(shutoff, b, max_flow=np.sqrt(shutoff / b), points=2001)])
+    k = np.array([0.3, 1.0, 3.0])
+    result = solve_operating_points(store, k)
+
+    # shutoff - b·Q² = k·Q² → Q = sqrt(shutoff / (b + k))
+    expected = np.sqrt(shutoff / (b + k))
+    np.testing.assert_allclose(result[FLOW_METRIC][0], expected, rtol=1e-5)
+    np.testing.assert_allclose(result["Power_[W]"][0], 100.0 + 10.0 * result[FLOW_METRIC][0], rtol=1e-12)
+    assert np.isnan(result["SPL_[dbA]"]).all()
+
+
+def test_zero_resistance_gives_free_delivery():
+    store = make_store([quadratic_fan(200.0, 2.0, max_flow=10.0, points=50)])
+    result = solve_operating_points(store, [0.0])
+
+    np.testing.assert_allclose(result[FLOW_METRIC][0, 0], 10.0, rtol=1e-9)
+    assert result[PRESSURE_METRIC][0, 0] == 0.0
+
+
+def test_multiple_crossings_take_the_highest_flow():
+    # 失速域で波打つ曲線: k=1 の抵抗曲線と Q=2〜3 と Q=5〜6 で交わる
+    store = make_store([{FLOW_METRIC: [0, 1, 2, 3, 4, 5, 6], PRESSURE_METRIC: [20, 15, 5, 14, 30, 28, 0]}])
+    flow = solve_operating_points(store, [1.0])[FLOW_METRIC][0, 0]
+
+    assert 5.0 < flow < 6.0
+
+
+def test_no_crossing_and_short_curves_are_nan():
+    store = make_store([
+        # 抵抗曲線が測定範囲内で交わらない（範囲の終わりでも静圧が残る）
+        {FLOW_METRIC: [0.0, 1.0, 2.0], PRESSURE_METRIC: [500.0, 490.0, 480.0]},
+        {FLOW_METRIC: [1.0], PRESSURE_METRIC: [10.0]},
+        {},
+    ])
+    result = solve_operating_points(store, [1.0])
+
+    assert np.isnan(result[FLOW_METRIC]).all()
+
+
+def test_unsorted_points_give_the_same_result():
+    curve = quadratic_fan(250.0, 1.0, max_flow=15.0, points=30)
+    order = np.random.default_rng(1).permutation(30)
+    shuffled = {metric: values[order] for metric, values in curve.items()}
+    k = [0.2, 0.8]
+
+    np.testing.assert_allclose(
+        solve_operating_points(make_store([shuffled]), k)[FLOW_METRIC],
+        solve_operating_points(make_store([curve]), k)[FLOW_METRIC],
+    )
+
+
+def test_operating_point_frame_drops_missing_points():
+    store = make_store([
+        quadratic_fan(300.0, 1.0, max_flow=np.sqrt(300.0), points=100),
+        {FLOW_METRIC: [0.0, 1.0], PRESSURE_METRIC: [500.0, 490.0]},
+    ])
+    k = np.array([0.5, 2.0])
+    frame = operating_point_frame(store, k, solve_operating_points(store, k))
+
+    assert frame["fantestdataID"].tolist() == ["t0", "t0"]
+    assert frame["k"].tolist() == [0.5, 2.0]
+    assert frame[FLOW_METRIC].notna().all()
+
+
+def test_parse_coefficients():
+    np.testing.assert_array_equal(parse_coefficients("1.0, 0.5 0.5,2"), [0.5, 1.0, 2.0])
+    assert parse_coefficients("").size == 0
+    with pytest.raises(ValueError):
+        parse_coefficients("1, -2")
+    with pytest.raises(ValueError):
+        parse_coefficients("abc")
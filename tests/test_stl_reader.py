@@ -0,0 +1,83 @@
+"""stl_reader のバイナリ・ASCII STL 読み込みのテスト"""
+
+import numpy as np
+import pytest
+import trimesh
+
+from stl_reader import STL_HEADER_SIZE, is_binary_stl, read_ascii_stl, read_binary_stl, read_stl_triangles
+
+
+@pytest.fixture
+def mesh():
+    return trimesh.creation.icosphere(subdivisions=2)
+
+
+def write_binary(path, mesh, header=b""):
+    data = trimesh.exchange.stl.export_stl(mesh)
+    if header:
+        data = header.ljust(STL_HEADER_SIZE, b" ") + data[STL_HEADER_SIZE:]
+    path.write_bytes(data)
+    return path
+
+
+def write_ascii(path, mesh):
+    path.write_text(trimesh.exchange.stl.export_stl_ascii(mesh))
+    return path
+
+
+def test_binary_matches_trimesh(tmp_path, mesh):
+    path = write_binary(tmp_path / "sphere.stl", mesh)
+
+    assert is_binary_stl(path)
+    triangles = read_stl_triangles(path)
+    assert isinstance(triangles, np.memmap) or isinstance(triangles.base, np.memmap)
+    assert triangles.shape == (len(mesh.faces), 3, 3)
+    np.testing.assert_allclose(triangles, mesh.triangles, atol=1e-6)
+
+
+def test_binary_starting_with_solid_is_detected_by_size(tmp_path, mesh):
+    path = write_binary(tmp_path / "solid.stl", mesh, header=b"solid exported by cad")
+
+    assert is_binary_stl(path)
+    np.testing.assert_allclose(read_stl_triangles(path), mesh.triangles, atol=1e-6)
+
+
+def test_ascii_matches_trimesh(tmp_path, mesh):
+    path = write_ascii(tmp_path / "sphere.stl", mesh)
+
+    assert not is_binary_stl(path)
+    triangles = read_stl_triangles(path)
+    assert triangles.dtype == np.float32
+    np.testing.assert_allclose(triangles, mesh.triangles, atol=1e-5)
+
+
+def test_ascii_chunks_split_inside_lines(tmp_path, mesh):
+    path = write_ascii(tmp_path / "sphere.stl", mesh)
+
+    # 行の途中で区切られる小さな読み込み単位でも結果は同じ
+    np.testing.assert_array_equal(read_ascii_stl(path, chunk_size=37), read_ascii_stl(path))
+
+
+def test_empty_binary_raises(tmp_path):
+    path = tmp_path / "empty.stl"
+    path.write_bytes(b"\x00" * STL_HEADER_SIZE + (0).to_bytes(4, "little"))
+
+    assert is_binary_stl(path)
+    with pytest.raises(ValueError):
+        read_binary_stl(path)
+
+
+def test_ascii_without_vertices_raises(tmp_path):
+    path = tmp_path / "empty.stl"
+    path.write_text("solid empty\nendsolid empty\n")
+
+    with pytest.raises(ValueError):
+        read_stl_triangles(path)
+
+
+def test_ascii_with_incomplete_facet_raises(tmp_path):
+    path = tmp_path / "broken.stl"
+    path.write_text("solid broken\nfacet normal 0 0 1\nouter loop\nvertex 0 0 0\nvertex 1 0 0\nendloop\nendfacet\nendsolid\n")
+
+    with pytest.raises(ValueError):
+        read_stl_triangles(path)
@@ -0,0 +1,265 @@
+"""
+サムネイル生成モジュール
+GLB/STLモデルの小さなPNGサムネイルをCPU（numpyのソフトウェアラスタライザ）で描画する
+- GPU・ブラウザ不要のため、変換ジョブやカタログ更新の中で生成できる
+- モデルと同じディレクトリの .thumbs/<SHA-256>.png にキャッシュし、内容が変わればハッシュで無効化
+"""
+
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from glb_cache import file_sha256
+from glb_writer import ENCODING_DRACO, glb_encoding, read_draco_triangles, read_glb
+
+THUMBNAIL_DIRNAME = ".thumbs"
+THUMBNAIL_SIZE = 256
+# アンチエイリアス用の縮小前倍率
+SUPERSAMPLE = 2
+# 1回のラスタライズで評価する候補画素数の上限（メモリ使用量の目安）
+MAX_CANDIDATE_PIXELS = 2_000_000
+
+MODEL_COLOR = np.array([74, 144, 217], dtype=np.float64)  # #4A90D9
+# 視線方向（カメラ位置側、Y軸が上）と光源方向
+VIEW_DIRECTION = np.array([1.0, 0.8, 1.0])
+LIGHT_DIRECTION = np.array([0.5, 1.0, 0.8])
+
+
+# =======================
+# メッシュ読み込み
+# =======================
+def load_triangles(model_path):
+    """
+    モデルファイルを三角形配列として読み込む（シーンのノード変換は適用済み）
+
+    Args:
+        model_path: GLB/STLファイルのパス
+
+    戻り値: (n, 3, 3) の頂点座標配列
+    """
+    import trimesh
+
+    if Path(model_path).suffix.lower() == ".glb" and glb_encoding(read_glb(model_path)[0]) == ENCODING_DRACO:
+        return read_draco_triangles(model_path)
+
+    mesh = trimesh.load(str(model_path), force="mesh")
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    faces = np.asarray(mesh.faces, dtype=np.int64)
+    if len(faces) == 0:
+        raise ValueError("三角形が含まれていません")
+    return vertices[faces]
+
+
+# =======================
+# ラスタライズ
+# =======================
+def _view_basis():
+    """視線方向からカメラ座標系（右・上・手前）を作成"""
+    forward = VIEW_DIRECTION / np.linalg.norm(VIEW_DIRECTION)
+    right = np.cross([0.0, 1.0, 0.0], forward)
+    right /= np.linalg.norm(right)
+    up = np.cross(forward, right)
+    return np.stack([right, up, forward])
+
+
+def _next_pow2(values):
+    return np.left_shift(1, np.ceil(np.log2(np.maximum(values, 1))).astype(np.int64))
+
+
+def rasterize(triangles, size):
+    """
+    三角形をフラットシェーディングで描画（平行投影・Zバッファ）
+
+    三角形はバウンディングボックスの大きさ（2のべき乗に切り上げ）でグループ化し、
+    同じ大きさの三角形をまとめてベクトル演算で塗る
+
+    Args:
+        triangles: (n, 3, 3) の頂点座標配列
+        size: 出力画像の一辺（ピクセル）
+
+    戻り値: (shade, coverage) いずれも (size, size) 配列。shadeは0〜1の明るさ、coverageは描画有無
+    """
+    basis = _view_basis()
+    projected = triangles @ basis.T  # (n, 3, 3): x=右, y=上, z=手前
+
+    # 面法線による明るさ（STLは向きが揃っていないことがあるため両面扱い）
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths > 0
+    light = LIGHT_DIRECTION / np.linalg.norm(LIGHT_DIRECTION)
+    shade_all = np.zeros(len(triangles))
+    shade_all[valid] = 0.25 + 0.75 * np.abs(normals[valid] @ light) / lengths[valid]
+
+    # 画像に収まるよう正規化（余白5%）、画像の行は下向きのためyを反転
+    xy = projected[:, :, :2]
+    lo = xy.reshape(-1, 2).min(axis=0)
+    hi = xy.reshape(-1, 2).max(axis=0)
+    extent = max(float((hi - lo).max()), 1e-12)
+    scale = size * 0.9 / extent
+    offset = (size - (hi - lo) * scale) / 2
+    px = (xy[:, :, 0] - lo[0]) * scale + offset[0]
+    py = size - ((xy[:, :, 1] - lo[1]) * scale + offset[1])
+    depth = -projected[:, :, 2]  # 小さいほど手前
+
+    area = (px[:, 1] - px[:, 0]) * (py[:, 2] - py[:, 0]) - (px[:, 2] - px[:, 0]) * (py[:, 1] - py[:, 0])
+    keep = valid & (np.abs(area) > 1e-12)
+    px, py, depth, area, shade_all = px[keep], py[keep], depth[keep], area[keep], shade_all[keep]
+
+    min_x = np.clip(np.floor(px.min(axis=1)), 0, size - 1).astype(np.int64)
+    min_y = np.clip(np.floor(py.min(axis=1)), 0, size - 1).astype(np.int64)
+    max_x = np.clip(np.ceil(px.max(axis=1)), 0, size).astype(np.int64)
+    max_y = np.clip(np.ceil(py.max(axis=1)), 0, size).astype(np.int64)
+    box_w = _next_pow2(max_x - min_x)
+    box_h = _next_pow2(max_y - min_y)
+
+    zbuffer = np.full(size * size, np.inf)
+    shade = np.zeros(size * size)
+
+    bucket_keys = box_w * (size * 2) + box_h
+    for key in np.unique(bucket_keys):
+        members = np.flatnonzero(bucket_keys == key)
+        width, height = int(box_w[members[0]]), int(box_h[members[0]])
+        grid_x, grid_y = np.meshgrid(np.arange(width), np.arange(height))
+        grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+        chunk = max(1, MAX_CANDIDATE_PIXELS // (width * height))
+
+        for start in range(0, len(members), chunk):
+            tri = members[start:start + chunk]
+            ix = min_x[tri, None] + grid_x
+            iy = min_y[tri, None] + grid_y
+            cx = ix + 0.5
+            cy = iy + 0.5
+
+            x0, x1, x2 = (px[tri, i, None] for i in range(3))
+            y0, y1, y2 = (py[tri, i, None] for i in range(3))
+            inv_area = 1.0 / area[tri, None]
+            w0 = ((x1 - cx) * (y2 - cy) - (x2 - cx) * (y1 - cy)) * inv_area
+            w1 = ((x2 - cx) * (y0 - cy) - (x0 - cx) * (y2 - cy)) * inv_area
+            w2 = 1.0 - w0 - w1
+
+            inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0) & (ix < max_x[tri, None]) & (iy < max_y[tri, None])
+            if not inside.any():
+                continue
+            z = w0 * depth[tri, 0, None] + w1 * depth[tri, 1, None] + w2 * depth[tri, 2, None]
+
+            rows, _ = np.nonzero(inside)
+            pixels = (iy * size + ix)[inside]
+            z = z[inside]
+            values = shade_all[tri][rows]
+
+            # 同じ画素の候補から最も手前のものだけを残し、Zバッファと比較して書き込む
+            order = np.lexsort((z, pixels))
+            pixels, z, values = pixels[order], z[order], values[order]
+            first = np.ones(len(pixels), dtype=bool)
+            first[1:] = pixels[1:] != pixels[:-1]
+            pixels, z, values = pixels[first], z[first], values[first]
+            nearer = z < zbuffer[pixels]
+            zbuffer[pixels[nearer]] = z[nearer]
+            shade[pixels[nearer]] = values[nearer]
+
+    coverage = np.isfinite(zbuffer)
+    return shade.reshape(size, size), coverage.reshape(size, size)
+
+
+def render_thumbnail_rgba(triangles, size=THUMBNAIL_SIZE):
+    """三角形配列からRGBA画像（(size, size, 4) uint8、背景は透明）を描画"""
+    render_size = size * SUPERSAMPLE
+    shade, coverage = rasterize(triangles, render_size)
+
+    rgb = shade[:, :, None] * MODEL_COLOR
+    alpha = coverage.astype(np.float64)
+    # 縮小（画素平均）でアンチエイリアス。色は描画画素のみで平均する
+    blocks = (size, SUPERSAMPLE, size, SUPERSAMPLE)
+    alpha_sum = alpha.reshape(blocks).sum(axis=(1, 3))
+    rgb_sum = (rgb * alpha[:, :, None]).reshape(*blocks, 3).sum(axis=(1, 3))
+    rgb = rgb_sum / np.maximum(alpha_sum, 1)[:, :, None]
+    alpha = alpha_sum / (SUPERSAMPLE * SUPERSAMPLE) * 255
+
+    image = np.dstack([rgb, alpha])
+    return np.clip(np.rint(image), 0, 255).astype(np.uint8)
+
+
+# =======================
+# PNG書き出し（Pillow不要）
+# =======================
+def _png_chunk(tag, data):
+    return (
+        struct.pack(">I", len(data))
+        + tag
+        + data
+        + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    )
+
+
+def encode_png(image):
+    """
+    RGBA画像をPNGバイト列に変換
+
+    Args:
+        image: (height, width, 4) uint8配列
+
+    戻り値: PNGファイルの内容
+    """
+    height, width, _ = image.shape
+    # 各行の先頭にフィルタ種別0（なし）を付ける
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, -1)], axis=1)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+# =======================
+# キャッシュ
+# =======================
+def thumbnail_path(model_path, sha256):
+    """モデルに対応するサムネイルのキャッシュパス（モデルと同じディレクトリの.thumbs配下）"""
+    return Path(model_path).parent / THUMBNAIL_DIRNAME / f"{sha256}.png"
+
+
+def ensure_thumbnail(model_path, sha256=None, size=THUMBNAIL_SIZE, triangles=None, source_path=None):
+    """
+    サムネイルを取得（未生成なら描画してキャッシュ）
+
+    Args:
+        model_path: GLB/STLファイルのパス
+        sha256: モデルのSHA-256（カタログなどで計算済みなら指定）
+        size: 画像の一辺（ピクセル）
+        triangles: 読み込み済みの三角形配列（変換直後など。省略時はファイルから読み込む）
+        source_path: 描画に使う別ファイル（面数の少ないLODなど。省略時はmodel_path）
+
+    戻り値: PNGファイルのパス（描画できないモデルの場合はNone）
+    """
+    model_path = Path(model_path)
+    if sha256 is None:
+        sha256 = file_sha256(model_path)
+    path = thumbnail_path(model_path, sha256)
+    if path.exists():
+        return path
+
+    try:
+        if triangles is None:
+            triangles = load_triangles(source_path or model_path)
+        png = encode_png(render_thumbnail_rgba(np.asarray(triangles, dtype=np.float64), size))
+    except Exception:
+        return None
+
+    path.parent.mkdir(exist_ok=True)
+    # 並行して生成された場合も壊れたファイルが見えないよう、一時ファイル経由で置き換える
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(png)
+    tmp_path.replace(path)
+    return path
+
+
+def find_thumbnail(model_path, sha256):
+    """キャッシュ済みサムネイルのパスを取得（未生成ならNone、描画はしない）"""
+    path = thumbnail_path(model_path, sha256)
+    return path if path.exists() else None
@@ -6,7 +6,26 @@ StreamlitアプリケーションのThree.js 3Dビューア機能をモジュー
 import streamlit as st
 import streamlit.components.v1 as components
 from pathlib import Path
-import base64
+
+from glb_cache import get_glb_cache
+from model_catalog import get_model_catalog, load_model_catalog
+from model_lod import find_lod_paths
+from model_resolution import attach_model_paths
+from model_server import get_model_url
+from thumbnails import ensure_thumbnail, find_thumbnail
+
+# Three.jsビューアのカスタムコンポーネント
+# iframeは再実行をまたいで維持され、設定変更は差分として送られる（モデルの再読み込みなし）
+_VIEWER_COMPONENT_DIR = Path(__file__).parent / "three_html" / "viewer_component"
+_threejs_viewer_component = components.declare_component(
+    "threejs_viewer",
+    path=str(_VIEWER_COMPONENT_DIR),
+)
+
+# モデル選択のサムネイル一覧の1ページあたりの件数
+THUMBNAIL_PAGE_SIZE = 12
+# モデル選択ボックスの1ページあたりの件数
+MODEL_SELECT_PAGE_SIZE = 100
 
 
 def render_viewer_sidebar():
@@ -47,6 +66,70 @@ def render_viewer_controls():
     return controls
 
 
+def _page_count(total, page_size):
+    return max((total + page_size - 1) // page_size, 1)
+
+
+def render_catalog_model_picker(models_dir, key, label="利用可能なモデルから選択", container=None, format_func=None):
+    """
+    モデルカタログから1件を選択するUI（パスの部分一致検索とページ単位の取得。全件は読み込まない）
+
+    選択中のモデルは、検索・ページを変えても選択肢に残す
+
+    Args:
+        models_dir: モデルディレクトリ
+        key: 選択ボックスのkey（値はカタログの相対パス。サムネイル一覧などから直接設定してよい）
+        label: 選択ボックスのラベル
+        container: 表示先（st.sidebar など。省略時はメインエリア）
+        format_func: 選択肢の表示関数 format_func(相対パス)（省略時は相対パスのまま）
+
+    戻り値: 選択したモデルのファイルパス（モデルがなければNone）
+    """
+    container = container or st
+    catalog = load_model_catalog(models_dir)
+    page_key = f"{key}_page"
+
+    def reset_page():
+        st.session_state.pop(page_key, None)
+
+    search = container.text_input("モデル名で検索", key=f"{key}_search", on_change=reset_page)
+    total = catalog.count_models(search)
+
+    # 選択中のモデルが削除されていれば選択を解除
+    selected = st.session_state.get(key)
+    if selected is not None and catalog.get(selected) is None:
+        st.session_state.pop(key)
+        selected = None
+
+    page_count = _page_count(total, MODEL_SELECT_PAGE_SIZE)
+    # 件数が減った場合も範囲内に収める
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    page = 1
+    if page_count > 1:
+        page = container.number_input(
+            f"ページ（全 {page_count} ページ / {total} 件）",
+            min_value=1,
+            max_value=page_count,
+            key=page_key,
+        )
+    options = [
+        model['path']
+        for model in catalog.list_models(
+            limit=MODEL_SELECT_PAGE_SIZE, offset=(page - 1) * MODEL_SELECT_PAGE_SIZE, search=search
+        )
+    ]
+    if selected is not None and selected not in options:
+        options.insert(0, selected)
+    if not options:
+        if search:
+            container.info(f"「{search}」に一致するモデルはありません")
+        return None
+
+    path = container.selectbox(label, options, format_func=format_func or str, key=key)
+    return catalog.models_dir / path
+
+
 def render_model_selector(models_dir="models", key_suffix=""):
     """
     モデル選択UI
@@ -57,31 +140,101 @@ def render_model_selector(models_dir="models", key_suffix=""):
     
     戻り値: (selected_model_path, model_display_name)
     """
-    models_path = Path(models_dir)
-    
-    if not models_path.exists():
+    if not Path(models_dir).exists():
         st.error(f"{models_dir}ディレクトリが見つかりません")
         return None, "No Model"
     
-    glb_files = list(models_path.glob("*.glb"))
-    
-    if not glb_files:
+    # ディレクトリは走査せず、モデルカタログ（差分更新）の件数・1ページ分のみを取得
+    catalog = load_model_catalog(models_dir)
+    if catalog.count_models() == 0:
         st.error(f"{models_dir}ディレクトリに.glbファイルがありません")
         return None, "No Model"
     
-    model_index = st.selectbox(
-        "利用可能なモデルから選択",
-        options=range(len(glb_files)),
-        format_func=lambda i: glb_files[i].name,
-        key=f"model_selector_{key_suffix}"
-    )
+    selector_key = f"model_selector_{key_suffix}"
+    
+    # サムネイル一覧（折りたたんだexpanderでも中身は毎回実行されるため、表示するときだけ1ページ分を生成）
+    if st.checkbox("🖼️ サムネイル一覧を表示", key=f"{selector_key}_show_thumbnails"):
+        def select_model(path):
+            st.session_state[selector_key] = path
+        
+        search = st.session_state.get(f"{selector_key}_search")
+        total = catalog.count_models(search)
+        page_count = _page_count(total, THUMBNAIL_PAGE_SIZE)
+        page_key = f"{selector_key}_thumbnail_page"
+        # モデルが減った場合も範囲内に収める
+        if st.session_state.get(page_key, 1) > page_count:
+            st.session_state[page_key] = page_count
+        page = st.number_input(
+            f"ページ（全 {page_count} ページ / {total} 件）",
+            min_value=1,
+            max_value=page_count,
+            key=page_key,
+        )
+        render_thumbnail_grid(
+            [
+                {
+                    'thumbnail': find_thumbnail(model['file_path'], model['sha256']) if model['sha256'] else None,
+                    'caption': model['path'],
+                    'value': model['path'],
+                }
+                for model in catalog.list_models(
+                    limit=THUMBNAIL_PAGE_SIZE, offset=(page - 1) * THUMBNAIL_PAGE_SIZE, search=search
+                )
+            ],
+            on_select=select_model,
+            key_prefix=selector_key,
+        )
     
-    selected_path = glb_files[model_index]
+    selected_path = render_catalog_model_picker(models_dir, selector_key)
+    if selected_path is None:
+        return None, "No Model"
     display_name = f"Manual: {selected_path.stem}"
     
     return selected_path, display_name
 
 
+def get_model_thumbnail(model_path):
+    """
+    モデルのサムネイルを取得（未生成なら描画してキャッシュ）
+    ハッシュはプロセス共通キャッシュで記憶し、ファイルが変わらない限り再計算しない
+    
+    Args:
+        model_path: GLB/STLファイルのパス
+    
+    戻り値: PNGファイルのパス（描画できない場合はNone）
+    """
+    if not Path(model_path).exists():
+        return None
+    return ensure_thumbnail(model_path, get_glb_cache().digest_for(model_path))
+
+
+def render_thumbnail_grid(items, on_select, key_prefix, columns=4, button_label="🔍 表示"):
+    """
+    サムネイルをグリッド表示し、ボタンで選択できるようにする
+    
+    Args:
+        items: {'thumbnail': PNGパスまたはNone, 'caption': 表示名, 'value': 選択時に渡す値} のリスト
+        on_select: ボタン押下時に呼ばれる関数 on_select(value)
+        key_prefix: ボタンのkey識別用プレフィックス
+        columns: 1行あたりの列数
+        button_label: 選択ボタンのラベル
+    """
+    for start in range(0, len(items), columns):
+        for column, item in zip(st.columns(columns), items[start:start + columns]):
+            with column:
+                if item['thumbnail']:
+                    st.image(str(item['thumbnail']))
+                else:
+                    st.caption("（サムネイルなし）")
+                st.caption(item['caption'])
+                st.button(
+                    button_label,
+                    key=f"{key_prefix}_thumb_{item['value']}",
+                    on_click=on_select,
+                    args=(item['value'],),
+                )
+
+
 def render_test_data_selector(df, test_options, key_suffix=""):
     """
     試験データ選択UI
@@ -109,53 +262,76 @@ def render_test_data_selector(df, test_options, key_suffix=""):
 
 def load_glb_model(model_path):
     """
-    GLBモデルファイルを読み込みBase64エンコード
+    GLBモデルの配信URLを取得
+    （モデル本体はHTMLに埋め込まず、ブラウザがモデル配信サーバーから直接取得する）
+    モデル内容は配信サーバーが最初のリクエスト時にプロセス共通キャッシュへ登録し、全セッションで1つだけ保持する
     
     Args:
         model_path: GLBファイルのパス
     
-    戻り値: (glb_base64_data, file_size_bytes)
+    戻り値: (model_source, file_size_bytes)
+        model_source: {'glb_url': 配信URL, 'model_server_port': 配信ポート,
+                       'lod_urls': LODの配信URL（粗い順、なければ空）}
     """
     try:
-        with open(model_path, 'rb') as f:
-            glb_data = f.read()
-            glb_base64 = base64.b64encode(glb_data).decode()
-        return glb_base64, len(glb_data)
+        glb_url, server_port = get_model_url(model_path)
+        if glb_url is None:
+            st.error(f"モデルファイル '{model_path}' は配信対象ディレクトリの外にあります")
+            return None, 0
+        # モデル内容は読み込まない（キャッシュへの登録はブラウザからの最初の配信リクエスト時に行われる）
+        file_size = Path(model_path).stat().st_size
+        model_source = {
+            'glb_url': glb_url,
+            'model_server_port': server_port,
+            'lod_urls': [get_model_url(path)[0] for _, path in find_lod_paths(model_path)],
+        }
+        return model_source, file_size
     except Exception as e:
         st.error(f"モデルファイルの読み込みエラー: {str(e)}")
         return None, 0
 
 
-def render_threejs_viewer(glb_base64, settings, template_path="three_html/viewer01.html"):
+def render_threejs_viewer(model_source, settings, key="threejs_viewer"):
     """
     Three.js 3Dビューアを描画
     
+    同じkeyで呼び出す限りビューア（Three.jsシーン）は維持され、
+    サイズ・背景色・グリッド・自動回転などの変更はメッセージとして差分反映される
+    
     Args:
-        glb_base64: Base64エンコードされたGLBデータ
-        settings: ビューア設定辞書
-        template_path: Three.jsテンプレートファイルのパス
+        model_source: load_glb_modelが返すモデル配信情報
+        settings: ビューア設定辞書（'reset_token' を変えるとカメラをリセット）
+        key: ビューアを識別するキー（再実行をまたいで固定すること）
     
     戻り値: 描画成功/失敗のブール値
     """
-    template_file = Path(template_path)
-    
-    if not template_file.exists():
-        st.error(f"Three.jsテンプレートファイル '{template_path}' が見つかりません。")
+    if not _VIEWER_COMPONENT_DIR.exists():
+        st.error(f"Three.jsビューアコンポーネント '{_VIEWER_COMPONENT_DIR}' が見つかりません。")
         return False
     
     try:
-        template = template_file.read_text(encoding="utf-8")
-        threejs_html = template.format(
-            bg_color=settings['bg_color'],
+        viewer_state = _threejs_viewer_component(
+            glb_url=model_source['glb_url'],
+            lod_urls=model_source.get('lod_urls', []),
+            model_server_port=model_source['model_server_port'],
             width=settings['width'],
             height=settings['height'],
-            auto_rotate=str(settings['auto_rotate']).lower(),
-            show_grid=str(settings['show_grid']).lower(),
-            glb_base64=glb_base64,
+            bg_color=settings['bg_color'],
+            show_grid=settings['show_grid'],
+            auto_rotate=settings['auto_rotate'],
+            reset_token=settings.get('reset_token', 0),
+            key=key,
+            default=None,
         )
         
-        # Three.js ビューア埋め込み
-        components.html(threejs_html, height=settings['height'] + 20, scrolling=False)
+        # 値はビューアが読み込みエラー時のみ返す（別モデルのものは無視）
+        if (
+            viewer_state
+            and viewer_state.get('status') == 'error'
+            and viewer_state.get('glb_url') == model_source['glb_url']
+        ):
+            st.error(f"モデルの読み込みエラー: {viewer_state.get('message')}")
+            return False
         return True
         
     except Exception as e:
@@ -164,6 +340,36 @@ def render_threejs_viewer(glb_base64, settings, template_path="three_html/viewer
         return False
 
 
+def get_reset_token(key_suffix=""):
+    """カメラリセット用トークンを取得（セッション内で保持）"""
+    return st.session_state.get(f"viewer_reset_token_{key_suffix}", 0)
+
+
+def request_camera_reset(key_suffix=""):
+    """カメラリセットを要求（トークンを進めるとビューアがカメラを初期位置に戻す）"""
+    token_key = f"viewer_reset_token_{key_suffix}"
+    st.session_state[token_key] = st.session_state.get(token_key, 0) + 1
+
+
+def render_cache_stats():
+    """
+    GLBペイロードキャッシュの統計を表示
+    """
+    stats = get_glb_cache().stats()
+    with st.expander("🗄️ モデルキャッシュ統計", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("ヒット率", f"{stats['hit_rate'] * 100:.1f} %")
+        with col2:
+            st.metric("ヒット / ミス", f"{stats['hits']} / {stats['misses']}")
+        with col3:
+            st.metric("保持モデル数", stats['entries'])
+        st.caption(
+            f"使用量: {stats['total_bytes'] / 1024 / 1024:.1f} MB / "
+            f"{stats['max_bytes'] / 1024 / 1024:.0f} MB（破棄: {stats['evictions']} 件）"
+        )
+
+
 def render_viewer_guide():
     """
     ビューア操作ガイドを表示
@@ -206,19 +412,32 @@ def render_complete_3d_viewer(df=None, test_options=None, models_dir="models", k
     controls = render_viewer_controls()
     
     # リセット・リロード処理
-    if controls.get('reset') or controls.get('reload'):
+    if controls.get('reset'):
+        request_camera_reset(key_suffix)
+    if controls.get('reload'):
+        get_model_catalog(models_dir).refresh()
         st.rerun()
+    settings['reset_token'] = get_reset_token(key_suffix)
     
     # タブ形式のモデル選択
     if df is not None and len(df) > 0:
         viewer_tab1, viewer_tab2 = st.tabs(["📊 試験データから選択", "🎛️ 直接モデル選択"])
         
         with viewer_tab1:
-            viewer_index, target_row = render_test_data_selector(df, test_options, key_suffix + "_test")
+            # 全行のモデルを一括解決し、モデルが見つかった試験データのみ選択肢にする
+            df_with_models, unresolved_tests = attach_model_paths(df, models_dir)
+            resolvable = [i for i, path in enumerate(df_with_models['model_path'].notna()) if path]
+            if len(unresolved_tests) > 0:
+                st.caption(f"モデル未解決の試験データ: {len(unresolved_tests)} 件")
+            
+            viewer_index, target_row = render_test_data_selector(
+                df_with_models.iloc[resolvable],
+                [test_options[i] for i in resolvable],
+                key_suffix + "_test"
+            )
             if target_row is not None:
-                # モデル識別子の解決処理をここに実装
-                # （元のpick_model_identifier、resolve_glb_path関数を使用）
-                pass
+                viewer_model_path = Path(target_row['model_path'])
+                fan_name = target_row.get('FanName') or target_row['model_identifier']
         
         with viewer_tab2:
             viewer_model_path, fan_name = render_model_selector(models_dir, key_suffix + "_manual")
@@ -229,9 +448,9 @@ def render_complete_3d_viewer(df=None, test_options=None, models_dir="models", k
     
     # 3Dビューア表示
     if 'viewer_model_path' in locals() and viewer_model_path and Path(viewer_model_path).exists():
-        glb_base64, file_size = load_glb_model(viewer_model_path)
+        model_source, file_size = load_glb_model(viewer_model_path)
         
-        if glb_base64:
+        if model_source:
             # ビューア情報表示
             col1, col2 = st.columns([3, 1])
             with col1:
@@ -240,10 +459,11 @@ def render_complete_3d_viewer(df=None, test_options=None, models_dir="models", k
                 st.write(f"**ファイルサイズ**: {file_size / 1024:.1f} KB")
             
             # Three.jsビューア描画
-            success = render_threejs_viewer(glb_base64, settings)
+            success = render_threejs_viewer(model_source, settings, key=f"viewer_{key_suffix}")
             
             if success:
                 render_viewer_guide()
+                render_cache_stats()
                 st.caption(f"📁 使用モデル: `{viewer_model_path}`")
                 return True
     
@@ -4,13 +4,10 @@
 """
 
 import streamlit as st
-from pathlib import Path
 import pandas as pd
 
 # カスタム3Dビューアコンポーネントをインポート
 from viewer_components import (
-    render_viewer_sidebar,
-    render_viewer_controls, 
     render_model_selector,
     render_threejs_viewer,
     render_viewer_guide,
@@ -18,9 +15,6 @@ from viewer_components import (
     load_glb_model
 )
 
-# モデル識別子解決関数（既存のものを使用）
-from app06_TestDataExtractWith3dModel import pick_model_identifier, resolve_glb_path
-
 st.set_page_config(
     page_title="モジュール化3Dビューア例",
     page_icon="🎯",
@@ -73,9 +67,9 @@ if st.checkbox("個別コンポーネント表示", key="individual_mode"):
         
         # Three.jsビューア部分のみ
         if st.button("3Dビューアを表示", key="show_individual"):
-            glb_base64, file_size = load_glb_model(selected_path)
+            model_source, file_size = load_glb_model(selected_path)
             
-            if glb_base64:
+            if model_source:
                 # 固定設定でビューア表示
                 settings = {
                     'width': 800,
@@ -85,7 +79,7 @@ if st.checkbox("個別コンポーネント表示", key="individual_mode"):
                     'auto_rotate': False
                 }
                 
-                success = render_threejs_viewer(glb_base64, settings)
+                success = render_threejs_viewer(model_source, settings, key="individual_viewer")
                 if success:
                     render_viewer_guide()
 
@@ -117,13 +111,13 @@ with col2:
     st.subheader("カスタム3Dビューア")
     
     if custom_path:
-        glb_base64, file_size = load_glb_model(custom_path)
+        model_source, file_size = load_glb_model(custom_path)
         
-        if glb_base64:
+        if model_source:
             st.write(f"**表示中**: {custom_name}")
             st.write(f"**サイズ**: {file_size / 1024:.1f} KB")
             
-            success = render_threejs_viewer(glb_base64, custom_settings)
+            success = render_threejs_viewer(model_source, custom_settings, key="custom_viewer")
 
 # =======================
 # フッター